@@ -0,0 +1,88 @@
+from functools import cached_property
+
+from repositories.mongodb_adapter import MongoDBAdapter
+from repositories.user_repository import UserRepository
+from repositories.board_repository import BoardRepository
+from repositories.task_repository import TaskRepository
+from repositories.licence_repository import LicenceRepository
+from services.auth_services import AuthService
+from services.board_services import BoardService
+from services.task_service import TaskService
+from services.search_service import SearchService
+from services.licence_service import LicenceService
+from services.session_service import SessionService
+from services.user_import_service import UserImportService
+from services.board_transfer_service import BoardTransferService
+from utils.command_stats import CommandStats
+
+#-----------------Application Context-----------------#
+# Repositories and services shared by every command of one CLI process.
+# Each is created on first use and then reused, so the indexes a repository ensures in its
+# constructor are checked once per process instead of once per command, and all of them share
+# one adapter. The REPL, one-shot commands and scripts all run through the same context.
+# Example:
+#   context = AppContext()
+#   context.task_service.create_task(...)
+class AppContext:
+
+    def __init__(self, adapter: MongoDBAdapter = None):
+        self._adapter = adapter
+        # Commands that reported an error, used for the exit status of one-shot and script runs
+        self.failed_commands = 0
+        # Latency and database cost of the commands run so far, for the stats command
+        self.command_stats = CommandStats()
+
+    @cached_property
+    def adapter(self) -> MongoDBAdapter:
+        return self._adapter or MongoDBAdapter()
+
+    #----------------Repositories-----------------#
+    @cached_property
+    def user_repo(self) -> UserRepository:
+        return UserRepository(self.adapter)
+
+    @cached_property
+    def board_repo(self) -> BoardRepository:
+        return BoardRepository(self.adapter)
+
+    @cached_property
+    def task_repo(self) -> TaskRepository:
+        return TaskRepository(self.adapter)
+
+    @cached_property
+    def licence_repo(self) -> LicenceRepository:
+        return LicenceRepository(self.adapter)
+
+    #----------------Services-----------------#
+    @cached_property
+    def licence_service(self) -> LicenceService:
+        return LicenceService(self.licence_repo)
+
+    @cached_property
+    def auth_service(self) -> AuthService:
+        return AuthService(self.user_repo, self.licence_service)
+
+    @cached_property
+    def board_service(self) -> BoardService:
+        return BoardService(self.board_repo, self.task_repo, self.user_repo)
+
+    @cached_property
+    def task_service(self) -> TaskService:
+        return TaskService(self.task_repo, self.board_repo)
+
+    @cached_property
+    def search_service(self) -> SearchService:
+        return SearchService(self.task_repo, self.board_repo)
+
+    @cached_property
+    def import_service(self) -> UserImportService:
+        return UserImportService(self.user_repo, self.licence_service)
+
+    @cached_property
+    def transfer_service(self) -> BoardTransferService:
+        return BoardTransferService(self.board_repo, self.task_repo)
+
+    # Resuming a session must not touch the database, so the user repository is only passed when it exists
+    @property
+    def session_service(self) -> SessionService:
+        return SessionService(self.__dict__.get("user_repo"))
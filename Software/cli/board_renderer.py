@@ -0,0 +1,87 @@
+import shutil
+import sys
+from models.entities import format_due_date
+
+#-----------------Board Renderer-----------------#
+# Draws a board as a grid (one column per board column, one card per cell) while the tasks arrive.
+# Column widths come from the terminal size instead of measuring every cell like tabulate does, so each
+# row is written as soon as one card of every column has been read and nothing but the current row
+# is kept in memory. Titles longer than a column are cut with "…".
+# Example:
+#   BoardRenderer(max_rows=50).render("Sprint", ["TODO", "DOING", "DONE"], {"TODO": task_iterator, ...})
+class BoardRenderer:
+
+    MIN_COLUMN_WIDTH = 12
+    DEFAULT_WIDTH = 100
+    ELLIPSIS = "…"
+
+    # width defaults to the terminal width, max_rows=None draws every row
+    def __init__(self, width: int = None, max_rows: int = None, out=None):
+        self.width = width or shutil.get_terminal_size((self.DEFAULT_WIDTH, 24)).columns
+        self.max_rows = max_rows
+        self.out = out
+
+    # Render a board, tasks_by_column maps each column to a list or an iterator of tasks
+    # totals optionally gives the number of tasks per column, so hidden tasks need not be read to be counted
+    # Returns the number of rows drawn
+    def render(self, board_name: str, columns: list, tasks_by_column: dict, totals: dict = None) -> int:
+        out = self.out or sys.stdout
+        cell_width = max(self.MIN_COLUMN_WIDTH, (self.width - 1) // max(1, len(columns)) - 3)
+        table_width = len(columns) * (cell_width + 3) + 1
+        border = "+" + "+".join("-" * (cell_width + 2) for _ in columns) + "+\n"
+
+        out.write(f"\n{'=' * table_width}\n{'BOARD':^{table_width}}\n{self._fit(board_name, table_width):^{table_width}}\n{'=' * table_width}\n\n")
+        iterators = [iter(tasks_by_column.get(column, ())) for column in columns]
+        shown = [0] * len(columns)
+        rows = 0
+        while self.max_rows is None or rows < self.max_rows:
+            cards = [next(iterator, None) for iterator in iterators]
+            if all(card is None for card in cards):
+                break
+            if rows == 0:
+                out.write(border + self._line(columns, cell_width) + border.replace("-", "="))
+            first_lines, second_lines = [], []
+            for index, card in enumerate(cards):
+                if card is None:
+                    first_lines.append("")
+                    second_lines.append("")
+                    continue
+                shown[index] += 1
+                # A line break in a title would break the grid
+                first_lines.append(f"• {card.title}".replace("\n", " "))
+                second_lines.append(self._details(card))
+            out.write(self._line(first_lines, cell_width) + self._line(second_lines, cell_width) + border)
+            rows += 1
+
+        if rows == 0:
+            out.write("No tasks in this board.\n\n")
+            return 0
+        hidden = self._hidden(columns, iterators, shown, totals)
+        if any(hidden):
+            out.write(self._line([f"… {count} more" if count else "" for count in hidden], cell_width) + border)
+        out.write("\n")
+        return rows
+
+    #----------------Helper Functions-----------------#
+    # One grid line, every cell padded or cut to the column width
+    def _line(self, cells: list, cell_width: int) -> str:
+        return "| " + " | ".join(self._fit(cell, cell_width).ljust(cell_width) for cell in cells) + " |\n"
+
+    def _fit(self, text: str, width: int) -> str:
+        return text if len(text) <= width else text[:width - 1] + self.ELLIPSIS
+
+    @staticmethod
+    def _details(task) -> str:
+        details = f"  [{task.priority.upper()}]" if task.priority else ""
+        if task.due_date:
+            details += f" | Due: {format_due_date(task.due_date)}"
+        return details
+
+    # Tasks per column that did not fit in max_rows, read from totals or counted without rendering them
+    def _hidden(self, columns: list, iterators: list, shown: list, totals: dict) -> list:
+        if self.max_rows is None:
+            return [0] * len(columns)
+        if totals is not None:
+            return [max(0, totals.get(column, 0) - count) for column, count in zip(columns, shown)]
+        # The rest of each column is counted, not rendered
+        return [sum(1 for _ in iterator) for iterator in iterators]
@@ -1,69 +1,64 @@
+import sys
 from tabulate import tabulate
+from models.entities import format_due_date
+from cli.board_renderer import BoardRenderer
+from cli.record_writer import RecordWriter
+from utils.unit_of_work import timed_output
 
 # Format output for the CLI Kanban application
+# Every print method is timed as output time of the running command (see utils/unit_of_work.py)
 class OutputFormatter:
     
-    # Print board as a ASCII table
+    # Print board as a ASCII table, streamed row by row (see cli/board_renderer.py)
+    # tasks_by_column values may be lists or iterators; max_rows caps the rows with an "N more" footer
     @staticmethod
-    def print_board_view(board_name: str, columns: list, tasks_by_column: dict):
-        print(f"\n{'='*100}")
-        print(f"{'BOARD':^100}")
-        print(f"{board_name:^100}")
-        print(f"{'='*100}\n")
-        
-        # Create table rows
-        table_data = []
-        max_rows = max(
-            [len(tasks_by_column.get(col, [])) for col in columns],
-            default=0
-        )
-        
-        if max_rows == 0:
-            print("No tasks in this board.\n")
-            return
-        
-        for row_idx in range(max_rows):
-            row = []
-            for col in columns:
-                tasks = tasks_by_column.get(col, [])
-                if row_idx < len(tasks):
-                    task = tasks[row_idx]
-                    # Format: Title (Priority)
-                    # Due date if exists
-                    task_str = f"• {task.title}\n"
-                    if task.priority:
-                        task_str += f"  [{task.priority.upper()}]"
-                    if task.due_date:
-                        task_str += f" | Due: {task.due_date}"
-                    row.append(task_str)
-                else:
-                    row.append("")
-            table_data.append(row)
-        
-        print(tabulate(table_data, headers=columns, tablefmt="grid"))
-        print()
+    @timed_output
+    def print_board_view(board_name: str, columns: list, tasks_by_column: dict, max_rows: int = None, totals: dict = None):
+        BoardRenderer(max_rows=max_rows).render(board_name, columns, tasks_by_column, totals)
+    
+    # Print records as json, jsonl or csv for scripts, streamed from any iterable (see cli/record_writer.py)
+    # Returns the number of records written
+    @staticmethod
+    @timed_output
+    def print_records(records, output: str, fields: list = None) -> int:
+        return RecordWriter(output, fields).write_all(records)
+    
+    # Print a single record, a JSON object rather than an array for json
+    @staticmethod
+    @timed_output
+    def print_record(record: dict, output: str, fields: list = None):
+        RecordWriter(output, fields).write_one(record)
     
     # Print tasks as table
+    # board_names maps board_id to name and adds a Board column, for listings spanning several boards
     @staticmethod
-    def print_task_list(tasks: list):
+    @timed_output
+    def print_task_list(tasks: list, board_names: dict = None):
         data = []
         for task in tasks:
-            data.append([
+            row = [
                 str(task._id)[:8],
                 task.title,
                 task.column,
                 task.priority,
-                task.due_date or "N/A"
-            ])
+                format_due_date(task.due_date) or "N/A"
+            ]
+            if board_names is not None:
+                row.insert(1, board_names.get(task.board_id, "?"))
+            data.append(row)
         
+        headers = ["ID", "Title", "Column", "Priority", "Due Date"]
+        if board_names is not None:
+            headers.insert(1, "Board")
         print(tabulate(
             data,
-            headers=["ID", "Title", "Column", "Priority", "Due Date"],
+            headers=headers,
             tablefmt="grid"
         ))
     
     # Print task details
     @staticmethod
+    @timed_output
     def print_task_details(task):
         print(f"\n{'='*80}")
         print(f"{'TASK DETAILS':^80}")
@@ -72,17 +67,175 @@ class OutputFormatter:
         print(f"ID:          {str(task._id)}")
         print(f"Column:      {task.column}")
         print(f"Priority:    {task.priority.upper()}")
-        print(f"Due Date:    {task.due_date or 'N/A'}")
+        print(f"Due Date:    {format_due_date(task.due_date) or 'N/A'}")
         print(f"Description: {task.description or 'N/A'}")
         print(f"{'='*80}\n")
     
+    # Print cache statistics, one table row per cache
+    @staticmethod
+    @timed_output
+    def print_cache_stats(stats_by_cache: dict):
+        data = []
+        for name, stats in stats_by_cache.items():
+            data.append([
+                name,
+                f"{stats['size']}/{stats['max_size']}",
+                stats["hits"],
+                stats["misses"],
+                stats["evictions"],
+                stats["expirations"],
+                f"{stats['hit_ratio']:.1%}",
+            ])
+        
+        print(tabulate(
+            data,
+            headers=["Cache", "Entries", "Hits", "Misses", "Evictions", "Expired", "Hit Ratio"],
+            tablefmt="grid"
+        ))
+    
+    # Print latency and database cost percentiles per command, times in milliseconds
+    @staticmethod
+    @timed_output
+    def print_command_stats(stats_by_command: dict):
+        if not stats_by_command:
+            print("No commands recorded yet.")
+            return
+        data = []
+        for command, stats in stats_by_command.items():
+            wall, trips = stats["wall_ms"], stats["round_trips"]
+            data.append([
+                command,
+                stats["count"],
+                stats["failed"],
+                f"{wall['p50']:.1f}",
+                f"{wall['p95']:.1f}",
+                f"{wall['p99']:.1f}",
+                f"{stats['database_ms']['p95']:.1f}",
+                f"{stats['decode_ms']['p95']:.1f}",
+                f"{stats['output_ms']['p95']:.1f}",
+                f"{trips['p50']:.0f}/{trips['p95']:.0f}/{trips['p99']:.0f}",
+                f"{stats['documents']['p95']:.0f}",
+                f"{stats['bytes_decoded']['p95'] / 1024:.1f}",
+            ])
+        
+        print(tabulate(
+            data,
+            headers=["Command", "Runs", "Failed", "p50 ms", "p95 ms", "p99 ms", "DB p95", "Decode p95",
+                     "Output p95", "Round Trips p50/p95/p99", "Docs p95", "KiB p95"],
+            tablefmt="grid"
+        ))
+    
+    # Print a histogram summary as one bar per non-empty bucket, e.g. the wall time of one command
+    @staticmethod
+    @timed_output
+    def print_histogram(title: str, summary: dict, unit: str = "ms", width: int = 40):
+        print(f"\n{title} ({summary['count']} runs, mean {summary['mean']:.1f} {unit}, max {summary['max']:.1f} {unit}):")
+        largest = max((count for _, count in summary["buckets"]), default=0)
+        for upper_bound, count in summary["buckets"]:
+            bar = "#" * max(1, round(count / largest * width))
+            print(f"  <= {upper_bound:>10.3g} {unit} | {bar} {count}")
+    
+    # Print hit/miss counters of one cache broken down by calling function
+    @staticmethod
+    @timed_output
+    def print_call_site_stats(cache_name: str, stats_by_site: dict):
+        data = []
+        for site, counts in sorted(stats_by_site.items()):
+            lookups = counts["hits"] + counts["misses"]
+            data.append([site, counts["hits"], counts["misses"], f"{counts['hits'] / lookups:.1%}" if lookups else "N/A"])
+        
+        print(f"\n{cache_name} cache by call site:")
+        print(tabulate(
+            data,
+            headers=["Call Site", "Hits", "Misses", "Hit Ratio"],
+            tablefmt="grid"
+        ))
+    
+    # Print size and accuracy of a Bloom filter, plus how many lookups it answered without a query
+    @staticmethod
+    @timed_output
+    def print_filter_stats(filter_name: str, stats: dict):
+        print(f"\n{filter_name} filter:")
+        print(tabulate(
+            [[
+                f"{stats.get('items', 0)}/{stats.get('capacity', 0)}",
+                f"{stats.get('size_bytes', 0) / 1024:.1f} KiB",
+                stats.get("hash_count", 0),
+                f"{stats.get('target_error_rate', 0):.3%}",
+                f"{stats.get('estimated_error_rate', 0):.3%}",
+                stats["rejected"],
+                stats["passed"],
+            ]],
+            headers=["Keys", "Memory", "Hashes", "Target FP Rate", "Estimated FP Rate", "Rejected", "Passed"],
+            tablefmt="grid"
+        ))
+    
+    # Print the per-row results of a user import followed by the throughput
+    # only_failed limits the table to failed rows, e.g. when the full report went to a file
+    @staticmethod
+    @timed_output
+    def print_import_report(results: list, seconds: float, only_failed: bool = False):
+        shown = [result for result in results if result["status"] != "created"] if only_failed else results
+        show_passwords = any(result["password"] for result in shown)
+        data = []
+        for result in shown:
+            row = [result["row"], result["username"] or "", result["role"] or "", result["status"], result["message"]]
+            if show_passwords:
+                row.append(result["password"] or "")
+            data.append(row)
+        
+        headers = ["Row", "Username", "Role", "Status", "Message"]
+        if show_passwords:
+            headers.append("Generated Password")
+        if data:
+            print(tabulate(data, headers=headers, tablefmt="grid"))
+        created = sum(1 for result in results if result["status"] == "created")
+        rate = len(results) / seconds if seconds else 0
+        print(f"Imported {created} of {len(results)} users in {seconds:.2f}s ({rate:,.0f} rows/s)")
+    
+    # Print claimed/unclaimed licence counts per role
+    @staticmethod
+    @timed_output
+    def print_licence_stats(stats_by_role: dict):
+        data = []
+        for role, stats in stats_by_role.items():
+            total = stats["claimed"] + stats["unclaimed"]
+            data.append([
+                role,
+                stats["claimed"],
+                stats["unclaimed"],
+                stats["reserved"],
+                total,
+                f"{stats['claimed'] / total:.1%}" if total else "N/A",
+            ])
+        
+        print(tabulate(
+            data,
+            headers=["Role", "Claimed", "Unclaimed", "Reserved", "Total", "Claimed %"],
+            tablefmt="grid"
+        ))
+    
     # Print success message
     @staticmethod
+    @timed_output
     def print_success(message: str):
 
         print(f"✓ {message}")
     
     # Print error message
+    # errors_printed counts every error, so one-shot and script runs can tell whether a command failed
+    # errors_to_stderr is set while a command writes json, jsonl or csv, so errors stay out of its records
+    errors_printed = 0
+    errors_to_stderr = False
+
+    @classmethod
+    @timed_output
+    def print_error(cls, message: str):
+        cls.errors_printed += 1
+        print(f"✗ Error: {message}", file=sys.stderr if cls.errors_to_stderr else sys.stdout)
+    
+    # Print debug message, only shown when KANBAN_DEBUG is set
     @staticmethod
-    def print_error(message: str):
-        print(f"✗ Error: {message}")
\ No newline at end of file
+    @timed_output
+    def print_debug(message: str):
+        print(f"[debug] {message}")
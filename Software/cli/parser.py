@@ -25,18 +25,39 @@ def create_parser():
     
     signout_parser = subparsers.add_parser("signout", help="Sign out from the system")
     
+    import_users = subparsers.add_parser("import-users", help="Create many users from a CSV or NDJSON file (Boss only)")
+    import_users.add_argument("--file", required=True, help="CSV with a header row, or JSON/NDJSON, with username, email, licence and optional password and role")
+    import_users.add_argument("--batch-size", type=int, default=500, help="Users created per batch (default: 500)")
+    import_users.add_argument("--workers", type=int, default=None, help="Password hashing processes (default: CPU count)")
+    import_users.add_argument("--report", help="Also write the per-row results to this CSV file")
+    
     # Board commands
     create_board = subparsers.add_parser("create-board", help="Create a new board (Boss only)")
     create_board.add_argument("--name", required=True, help="Board name")
     
     list_boards = subparsers.add_parser("list-boards", help="List all boards")
+    add_output_argument(list_boards)
     
     view_board = subparsers.add_parser("view-board", help="View tasks in a board")
     view_board.add_argument("--board", required=True, help="Board name")
+    view_board.add_argument("--sort", default="rank", choices=["rank", "created", "priority", "due"], help="Order of tasks within each column (default: rank, the manual order)")
+    view_board.add_argument("--max-rows", type=int, help="Show at most this many cards per column, with a count of the rest")
+    add_output_argument(view_board)
     
     delete_board = subparsers.add_parser("delete-board", help="Delete a board (Boss only)")
     delete_board.add_argument("--name", required=True, help="Board name")
     
+    export_board = subparsers.add_parser("export-board", help="Export boards and their tasks to NDJSON files")
+    export_board.add_argument("--board", action="append", required=True, help="Board name, repeat to export several boards in parallel")
+    export_board.add_argument("--out", help="Output file for one board, directory for several (default: <board>.ndjson in the current directory)")
+    export_board.add_argument("--compress", choices=["none", "gzip", "zstd"], help="Compression (default: from the file extension, .gz or .zst)")
+    export_board.add_argument("--workers", type=int, help="Processes exporting boards in parallel (default: CPU count)")
+    
+    import_board = subparsers.add_parser("import-board", help="Create a board from an export file (Boss only)")
+    import_board.add_argument("--file", required=True, help="Export file (.ndjson, .ndjson.gz or .ndjson.zst)")
+    import_board.add_argument("--name", help="Name of the new board (default: the exported board's name)")
+    import_board.add_argument("--batch-size", type=int, default=1000, help="Tasks per insert (default: 1000)")
+    
     # Task commands
     add_task = subparsers.add_parser("add-task", help="Add a task (Hashira or Boss)")
     add_task.add_argument("--board", required=True, help="Board name")
@@ -59,6 +80,13 @@ def create_parser():
     move_task.add_argument("--title", required=True, help="Task title")
     move_task.add_argument("--to", required=True, choices=["TODO", "DOING", "DONE"], help="Target column")
     
+    reorder_task = subparsers.add_parser("reorder-task", help="Place a task before or after another task (Hashira or Boss)")
+    reorder_task.add_argument("--board", required=True, help="Board name")
+    reorder_task.add_argument("--title", required=True, help="Title of the task to move")
+    reorder_position = reorder_task.add_mutually_exclusive_group(required=True)
+    reorder_position.add_argument("--before", help="Title of the task to place it before")
+    reorder_position.add_argument("--after", help="Title of the task to place it after")
+    
     delete_task = subparsers.add_parser("delete-task", help="Delete a task (Hashira or Boss)")
     delete_task.add_argument("--board", required=True, help="Board name")
     delete_task.add_argument("--title", required=True, help="Task title")
@@ -66,10 +94,83 @@ def create_parser():
     view_task = subparsers.add_parser("view-task", help="View task details")
     view_task.add_argument("--board", required=True, help="Board name")
     view_task.add_argument("--title", required=True, help="Task title")
+    add_output_argument(view_task)
     
     # Search/Filter commands
     search = subparsers.add_parser("search", help="Search tasks")
     search.add_argument("--board", required=True, help="Board name")
     search.add_argument("--keyword", required=True, help="Search keyword")
+    search_mode = search.add_mutually_exclusive_group()
+    search_mode.add_argument("--prefix", dest="mode", action="store_const", const="prefix", help="Match titles starting with the keyword (index-backed)")
+    search_mode.add_argument("--regex", dest="mode", action="store_const", const="regex", help="Treat the keyword as a regular expression")
+    add_output_argument(search)
+    search.set_defaults(mode="literal")
+    
+    filter_tasks = subparsers.add_parser("filter", help="Filter tasks by column, priority, assignee and due date")
+    filter_tasks.add_argument("--board", required=True, help="Board name")
+    filter_tasks.add_argument("--column", choices=["TODO", "DOING", "DONE"], help="Only tasks in this column")
+    filter_tasks.add_argument("--priority", choices=["high", "medium", "low"], help="Only tasks with this priority")
+    filter_tasks.add_argument("--assignee", help="Only tasks assigned to this username")
+    filter_tasks.add_argument("--due-from", help="Earliest due date (YYYY-MM-DD, inclusive)")
+    filter_tasks.add_argument("--due-to", help="Latest due date (YYYY-MM-DD, inclusive)")
+    filter_tasks.add_argument("--sort", default="created", choices=["created", "priority", "due", "title"], help="Sort order (default: created)")
+    filter_tasks.add_argument("--page", type=int, default=1, help="Page number (default: 1)")
+    filter_tasks.add_argument("--page-size", type=int, default=50, help="Tasks per page (default: 50)")
+    
+    # Bulk task commands: one server-side write for every task matching the filters
+    move_tasks = subparsers.add_parser("move-tasks", help="Move all tasks matching filters to a column (Hashira or Boss)")
+    add_bulk_filter_arguments(move_tasks)
+    move_tasks.add_argument("--to", required=True, choices=["TODO", "DOING", "DONE"], help="Target column")
+    
+    edit_tasks = subparsers.add_parser("edit-tasks", help="Edit all tasks matching filters (Hashira or Boss)")
+    add_bulk_filter_arguments(edit_tasks)
+    edit_tasks.add_argument("--set-desc", help="New description")
+    edit_tasks.add_argument("--set-priority", choices=["high", "medium", "low"], help="New priority")
+    edit_tasks.add_argument("--set-due", help="New due date (YYYY-MM-DD)")
+    
+    delete_tasks = subparsers.add_parser("delete-tasks", help="Delete all tasks matching filters (Hashira or Boss)")
+    add_bulk_filter_arguments(delete_tasks)
     
-    return parser
\ No newline at end of file
+    due_soon = subparsers.add_parser("due-soon", help="List open tasks due within the next days on all visible boards")
+    due_soon.add_argument("--days", type=int, default=7, help="How many days ahead to look (default: 7)")
+    due_soon.add_argument("--limit", type=int, default=50, help="Maximum number of tasks (default: 50)")
+    
+    overdue = subparsers.add_parser("overdue", help="List open tasks past their due date on all visible boards")
+    overdue.add_argument("--limit", type=int, default=50, help="Maximum number of tasks (default: 50)")
+    
+    # Backup commands
+    dump = subparsers.add_parser("dump", help="Back up the whole workspace to a raw BSON archive (Boss only)")
+    dump.add_argument("--out", required=True, help="Archive file to write")
+    restore = subparsers.add_parser("restore", help="Restore the whole workspace from an archive (Boss only)")
+    restore.add_argument("--file", required=True, help="Archive file written by dump")
+    restore.add_argument("--drop", action="store_true", help="Replace collections that already hold documents")
+    
+    # Diagnostics commands
+    cache_stats = subparsers.add_parser("cache-stats", help="Show hit/miss/eviction statistics of the in-process caches")
+    stats = subparsers.add_parser("stats", help="Show latency and database round-trip percentiles of the commands run in this session")
+    stats.add_argument("--command", dest="stats_command", help="Only this command, with its latency histogram, e.g. view-board")
+    stats.add_argument("--json", action="store_true", help="Print the statistics as JSON, histogram buckets included")
+    stats.add_argument("--out", help="Also write the statistics as JSON to this file")
+    stats.add_argument("--reset", action="store_true", help="Clear the statistics after showing them")
+    calibrate_hash = subparsers.add_parser("calibrate-hash", help="Find the password hash cost that takes a target time on this machine")
+    calibrate_hash.add_argument("--scheme", default="scrypt", choices=["scrypt", "pbkdf2_sha256"], help="Hash scheme to calibrate (default: scrypt)")
+    calibrate_hash.add_argument("--target-ms", type=float, default=250, help="Target time per hash in milliseconds (default: 250)")
+    licence_stats = subparsers.add_parser("licence-stats", aliases=["license-stats"], help="Show claimed and unclaimed licences per role (Boss only)")
+    
+    return parser
+
+# Filters shared by the bulk task commands, at least one of them has to be given
+def add_bulk_filter_arguments(subparser):
+    subparser.add_argument("--board", required=True, help="Board name")
+    subparser.add_argument("--column", choices=["TODO", "DOING", "DONE"], help="Only tasks in this column")
+    subparser.add_argument("--priority", choices=["high", "medium", "low"], help="Only tasks with this priority")
+    subparser.add_argument("--assignee", help="Only tasks assigned to this username")
+    subparser.add_argument("--due-from", help="Earliest due date (YYYY-MM-DD, inclusive)")
+    subparser.add_argument("--due-to", help="Latest due date (YYYY-MM-DD, inclusive)")
+    subparser.add_argument("--title-contains", help="Only tasks whose title contains this text (case-insensitive)")
+    subparser.add_argument("--dry-run", action="store_true", help="Only count the matching tasks, change nothing")
+
+
+# Machine-readable output for scripts and dashboards, streamed record by record
+def add_output_argument(subparser):
+    subparser.add_argument("--output", default="table", choices=["table", "json", "jsonl", "csv"], help="Output format (default: table)")
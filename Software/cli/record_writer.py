@@ -0,0 +1,127 @@
+import csv
+import json
+import sys
+from datetime import datetime
+from bson import ObjectId
+from models.entities import format_due_date
+
+# Output formats of --output, "table" is the human output of OutputFormatter
+OUTPUT_FORMATS = ("table", "json", "jsonl", "csv")
+TASK_FIELDS = ["id", "board_id", "board", "title", "column", "priority", "due_date", "description", "assigned_to", "rank"]
+BOARD_FIELDS = ["id", "name", "owner_id", "columns", "version"]
+
+
+# A task as a flat record of plain values: ids as hex strings, the due date as "YYYY-MM-DD"
+def task_record(task, board_name: str = None) -> dict:
+    return {
+        "id": str(task._id) if task._id else None,
+        "board_id": str(task.board_id),
+        "board": board_name,
+        "title": task.title,
+        "column": task.column,
+        "priority": task.priority,
+        "due_date": format_due_date(task.due_date),
+        "description": task.description,
+        "assigned_to": str(task.assigned_to) if task.assigned_to else None,
+        "rank": task.rank,
+    }
+
+
+def board_record(board) -> dict:
+    return {
+        "id": str(board._id),
+        "name": board.name,
+        "owner_id": str(board.owner_id),
+        "columns": board.columns,
+        "version": board.version,
+    }
+
+
+#-----------------Record Writer-----------------#
+# Writes records (dicts) for scripts and dashboards as JSON, JSON Lines or CSV, one record at a time,
+# so a large board starts coming out while its cursor is still being read and no table is built.
+# json writes an array (or a single object with write_one), jsonl one object per line, csv a header row
+# then one row per record. Values that JSON cannot represent (ObjectId, datetime) are converted by default.
+# Example:
+#   RecordWriter("jsonl").write_all(task_record(task) for task in tasks)
+class RecordWriter:
+
+    # Flush after this many records, so a reader at the other end of a pipe sees output early
+    FLUSH_EVERY = 1000
+
+    def __init__(self, output: str, fields: list = None, out=None):
+        if output not in OUTPUT_FORMATS or output == "table":
+            raise ValueError(f"Invalid output format. Must be one of {list(OUTPUT_FORMATS[1:])}")
+        self.output = output
+        self.fields = fields
+        self.out = out
+        # One encoder for every record, the C implementation handles plain values on its own
+        self._encoder = json.JSONEncoder(default=_json_default, ensure_ascii=False, separators=(",", ":"))
+
+    # Write every record of an iterable as it arrives, returns the number of records
+    def write_all(self, records) -> int:
+        out = self.out or sys.stdout
+        count = 0
+        if self.output == "csv":
+            writer = None
+            for record in records:
+                if writer is None:
+                    writer = self._csv_writer(out, record)
+                writer.writerow(self._csv_row(record))
+                count += 1
+                self._flush(out, count)
+            if writer is None and self.fields:
+                self._csv_writer(out, {})
+        elif self.output == "jsonl":
+            for record in records:
+                out.write(self._encoder.encode(record) + "\n")
+                count += 1
+                self._flush(out, count)
+        else:
+            out.write("[")
+            try:
+                for record in records:
+                    out.write(("," if count else "") + "\n" + self._encoder.encode(record))
+                    count += 1
+                    self._flush(out, count)
+            finally:
+                # Closed even when reading the records fails, the error itself goes to stderr
+                out.write("\n]\n" if count else "]\n")
+        out.flush()
+        return count
+
+    # Write one record on its own, as an object rather than an array for json
+    def write_one(self, record: dict):
+        if self.output == "json":
+            out = self.out or sys.stdout
+            out.write(self._encoder.encode(record) + "\n")
+            out.flush()
+        else:
+            self.write_all([record])
+
+    #----------------Helper Functions-----------------#
+    def _csv_writer(self, out, first_record: dict):
+        writer = csv.DictWriter(out, fieldnames=self.fields or list(first_record), extrasaction="ignore", lineterminator="\n")
+        writer.writeheader()
+        return writer
+
+    # Lists become "a;b;c", everything else its string form, None an empty cell
+    @staticmethod
+    def _csv_row(record: dict) -> dict:
+        return {
+            key: ";".join(map(str, value)) if isinstance(value, list) else value
+            for key, value in record.items()
+        }
+
+    # The first record is flushed right away, then every FLUSH_EVERY records
+    def _flush(self, out, count: int):
+        if count == 1 or count % self.FLUSH_EVERY == 0:
+            out.flush()
+
+
+def _json_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -1,3 +1,4 @@
+import hashlib
 import os
 from pymongo import MongoClient
 
@@ -6,6 +7,66 @@ from pymongo import MongoClient
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "cli-kanban")
 
+# Search result cache: maximum number of cached searches and their time-to-live in seconds
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "256"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+# Server-side time limit for opt-in regular expression searches, in milliseconds
+SEARCH_REGEX_MAX_TIME_MS = int(os.getenv("SEARCH_REGEX_MAX_TIME_MS", "2000"))
+
+# Board lookup cache: size, time-to-live in seconds, and whether each hit is confirmed with a cheap version check
+BOARD_CACHE_SIZE = int(os.getenv("BOARD_CACHE_SIZE", "256"))
+BOARD_CACHE_TTL = float(os.getenv("BOARD_CACHE_TTL", "60"))
+BOARD_CACHE_VALIDATE = os.getenv("BOARD_CACHE_VALIDATE", "false").lower() in ("1", "true", "yes")
+
+# User lookup cache: size, time-to-live in seconds, and whether password hashes may be kept in memory
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "512"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "120"))
+USER_CACHE_PASSWORD_HASHES = os.getenv("USER_CACHE_PASSWORD_HASHES", "false").lower() in ("1", "true", "yes")
+
+# Manual task ordering: rebalance a column once a rank key grows longer than this many characters
+RANK_REBALANCE_LENGTH = int(os.getenv("RANK_REBALANCE_LENGTH", "24"))
+
+# On-disk cache of recently viewed boards, so view-board can render without reloading unchanged tasks
+# Least recently viewed boards are evicted beyond either limit, VIEW_CACHE_MAX_BOARDS=0 disables it
+VIEW_CACHE_DIR = os.getenv("VIEW_CACHE_DIR") or os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "cli-kanban"
+)
+VIEW_CACHE_MAX_BOARDS = int(os.getenv("VIEW_CACHE_MAX_BOARDS", "32"))
+VIEW_CACHE_MAX_BYTES = int(os.getenv("VIEW_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Optional Bloom filter of known licence keys, so mistyped or guessed keys are rejected without a query
+# Capacity is the expected number of keys, beyond it the error rate rises (see cache-stats)
+# The snapshot file lets the next start skip the full scan, keys added since are caught up every REFRESH seconds
+LICENCE_FILTER_ENABLED = os.getenv("LICENCE_FILTER_ENABLED", "false").lower() in ("1", "true", "yes")
+LICENCE_FILTER_CAPACITY = int(os.getenv("LICENCE_FILTER_CAPACITY", "1000000"))
+LICENCE_FILTER_ERROR_RATE = float(os.getenv("LICENCE_FILTER_ERROR_RATE", "0.001"))
+LICENCE_FILTER_REFRESH = float(os.getenv("LICENCE_FILTER_REFRESH", "60"))
+# The default snapshot name includes the server, a filter of another deployment would reject valid keys
+LICENCE_FILTER_SNAPSHOT = os.getenv("LICENCE_FILTER_SNAPSHOT") or os.path.join(
+    VIEW_CACHE_DIR, f"licences-{DATABASE_NAME}-{hashlib.sha256(MONGO_URI.encode()).hexdigest()[:12]}.bloom"
+)
+
+# Password hashing: scrypt or pbkdf2_sha256, and its cost as "name=value,..." (empty uses the scheme's default)
+# Run calibrate-hash to find a cost that hits a target login latency on this machine;
+# stored hashes with another scheme or cost are upgraded on the next successful login
+PASSWORD_HASH_SCHEME = os.getenv("PASSWORD_HASH_SCHEME", "scrypt")
+PASSWORD_HASH_PARAMS = os.getenv("PASSWORD_HASH_PARAMS", "")
+
+# Saved login: login writes a signed session token here, later runs of the CLI resume it without logging in
+# The token expires after SESSION_TTL seconds; every SESSION_REVALIDATE seconds one query checks
+# that the user still exists with the same role. SESSION_SECRET signs tokens, by default a random
+# key is generated next to the session file. SESSION_TTL=0 disables saved sessions.
+SESSION_FILE = os.getenv("SESSION_FILE") or os.path.join(VIEW_CACHE_DIR, f"session-{DATABASE_NAME}.token")
+SESSION_SECRET = os.getenv("SESSION_SECRET", "")
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(12 * 60 * 60)))
+SESSION_REVALIDATE = float(os.getenv("SESSION_REVALIDATE", "300"))
+
+# Debug output, e.g. the number of database round trips each command made
+KANBAN_DEBUG = os.getenv("KANBAN_DEBUG", "false").lower() in ("1", "true", "yes")
+
+# Latency and round-trip histograms per command for the stats command, kept in memory by each process
+COMMAND_STATS_ENABLED = os.getenv("COMMAND_STATS_ENABLED", "true").lower() in ("1", "true", "yes")
+
 # Get or create a singleton MongoClient instance
 def get_mongo_client():
     return MongoClient(MONGO_URI)
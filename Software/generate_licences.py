@@ -0,0 +1,167 @@
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+
+from services.licence_service import LicenceService
+from repositories.licence_repository import LicenceRepository
+from utils.bloom_filter import BloomFilter
+from setup_schema import ensure_schema
+
+# Keys generated per worker task, keys inserted per round trip, and how often progress is printed
+CHUNK_SIZE = 50000
+BATCH_SIZE = 1000
+PROGRESS_EVERY = 1000000
+# False positives only cost a regenerated key, so the dedup filter can stay small
+DEDUP_ERROR_RATE = 0.001
+
+# Crockford base32: digits and capitals without I, L, O and U, so keys are easy to read out loud
+# 32 symbols let one random byte pick a symbol without bias, 16 symbols give 80 random bits per key
+KEY_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_BYTE_TO_SYMBOL = bytes(ord(KEY_ALPHABET[value & 31]) for value in range(256))
+
+
+# Mint count new licence keys for a role
+# Keys are generated by a process pool, deduplicated in memory with a Bloom filter and inserted in
+# unordered batches; keys that already exist in the database are replaced, so count keys are stored.
+# manifest_path writes the stored keys as NDJSON ({key, role} per line, readable by setup_license_keys)
+# With insert=False nothing is stored and the keys only go to the manifest
+def generate_licences(count: int, role: str = "Members", workers: int = None, batch_size: int = BATCH_SIZE,
+                      manifest_path: str = None, insert: bool = True, progress_every: int = PROGRESS_EVERY) -> Dict[str, float]:
+    if count <= 0:
+        raise ValueError("Count must be a positive number")
+    if role not in LicenceService.VALID_ROLES:
+        raise ValueError(f"Invalid role. Must be one of {list(LicenceService.VALID_ROLES)}")
+    if not insert and not manifest_path:
+        raise ValueError("Keys that are not inserted must be written to a manifest")
+
+    service = None
+    if insert:
+        try:
+            ensure_schema()
+        except Exception as e:
+            print(f"Warning: Schema setup failed before generating: {e}", file=sys.stderr)
+        service = LicenceService(LicenceRepository())  # ensures the unique key index
+
+    summary = {"generated": 0, "stored": 0, "duplicates": 0, "seconds": 0.0}
+    seen = BloomFilter(capacity=count, error_rate=DEDUP_ERROR_RATE)
+    workers = workers or os.cpu_count() or 1
+    manifest = open(manifest_path, "w", encoding="utf-8") if manifest_path else None
+    started = time.perf_counter()
+    next_report = progress_every
+    batch = []
+
+    def flush():
+        stored = batch
+        if service is not None:
+            result = service.create_licences([service.build_licence(key, role=role) for key in batch])
+            # A key minted elsewhere already has this value, it is replaced by a new one
+            summary["duplicates"] += result["duplicates"]
+            skipped = set(result["duplicate_indexes"])
+            stored = [key for index, key in enumerate(batch) if index not in skipped]
+        if manifest is not None:
+            # Keys and roles never need escaping, so the JSON lines are formatted directly
+            manifest.writelines(f'{{"key": "{key}", "role": "{role}"}}\n' for key in stored)
+        summary["stored"] += len(stored)
+        batch.clear()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Refill until count keys are stored, replacing duplicates from the filter and the database
+            while summary["stored"] < count:
+                needed = count - summary["stored"]
+                sizes = [CHUNK_SIZE] * (needed // CHUNK_SIZE)
+                if needed % CHUNK_SIZE:
+                    sizes.append(needed % CHUNK_SIZE)
+                chunks = iter(sizes)
+                # Keep a few chunks in flight, so finished chunks never pile up in memory
+                pending = deque(pool.submit(_generate_keys, size) for size in islice(chunks, workers * 2))
+                while pending:
+                    keys = pending.popleft().result()
+                    size = next(chunks, None)
+                    if size is not None:
+                        pending.append(pool.submit(_generate_keys, size))
+                    summary["generated"] += len(keys)
+                    for key in keys:
+                        if not seen.add(key):
+                            summary["duplicates"] += 1
+                            continue
+                        batch.append(key)
+                        if len(batch) >= batch_size:
+                            flush()
+                    if progress_every and summary["generated"] >= next_report:
+                        _print_progress(summary, started)
+                        next_report += progress_every
+                flush()
+    finally:
+        if manifest is not None:
+            manifest.close()
+
+    summary["seconds"] = time.perf_counter() - started
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="generate-licences",
+        description="Mint new licence keys in the AAAA-BBBB-CCCC-DDDD format and store them in the database.",
+    )
+    parser.add_argument("--count", type=int, required=True, help="Number of keys to create")
+    parser.add_argument("--role", default="Members", choices=list(LicenceService.VALID_ROLES), help="Role granted by the keys")
+    parser.add_argument("--workers", type=int, default=None, help="Generator processes (default: CPU count)")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help=f"Keys inserted per round trip (default: {BATCH_SIZE})",
+    )
+    parser.add_argument("--manifest", help="Write the created keys to this NDJSON file")
+    parser.add_argument(
+        "--no-insert",
+        action="store_true",
+        help="Only write the manifest, without connecting to the database",
+    )
+
+    args = parser.parse_args()
+
+    try:
+        summary = generate_licences(
+            args.count,
+            role=args.role,
+            workers=args.workers,
+            batch_size=max(1, args.batch_size),
+            manifest_path=args.manifest,
+            insert=not args.no_insert,
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    rate = summary["stored"] / summary["seconds"] if summary["seconds"] else 0
+    print(
+        f"\nSummary: stored={summary['stored']} generated={summary['generated']} duplicates={summary['duplicates']} "
+        f"in {summary['seconds']:.1f}s ({rate:,.0f} keys/s)"
+    )
+
+
+#----------------Helper Functions-----------------#
+# Worker task: count random keys, 16 symbols from os.urandom split into four groups of four
+def _generate_keys(count: int) -> list:
+    symbols = os.urandom(count * 16).translate(_BYTE_TO_SYMBOL).decode("ascii")
+    return [
+        f"{symbols[i:i + 4]}-{symbols[i + 4:i + 8]}-{symbols[i + 8:i + 12]}-{symbols[i + 12:i + 16]}"
+        for i in range(0, count * 16, 16)
+    ]
+
+
+def _print_progress(summary: Dict[str, float], started: float):
+    elapsed = time.perf_counter() - started
+    rate = summary["stored"] / elapsed if elapsed else 0
+    print(f"Generated {summary['generated']} keys: stored={summary['stored']} duplicates={summary['duplicates']} ({rate:,.0f} keys/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,42 +6,58 @@ it meets the project requirements, specifications, and design.
 Comments with # are written by the students to explain the code. 
 """
 
+import csv
+import json
+import os
 import shlex
+import sys
+import time
 from cli.parser import create_parser
 from cli.formatter import OutputFormatter
-from services.auth_services import AuthService
-from services.board_services import BoardService
-from services.task_service import TaskService
-from services.search_service import SearchService
+from cli.app_context import AppContext
+from cli.record_writer import task_record, board_record, TASK_FIELDS, BOARD_FIELDS
+from services.user_import_service import iter_user_rows
+from services.board_transfer_service import detect_compression, export_file_name
 from bson import ObjectId
 from setup_schema import ensure_schema
+from workspace_dump import dump_workspace, restore_workspace
+from utils.unit_of_work import UnitOfWork
+from utils.view_cache import LocalViewCache
+from utils.password_hasher import PasswordHasher, calibrate
+from config import KANBAN_DEBUG, COMMAND_STATS_ENABLED
 
 # Session storage, holds the currently logged-in user
 current_user = None
+# Services and repositories shared by every command of this process
+context = AppContext()
+# Consecutive add-task lines of a script are created together, up to this many per insert
+SCRIPT_BATCH_SIZE = 1000
+_parser = None
 
 # Execute a command line
 def execute_command(command_line: str):
-    global current_user
-    
     # Parse the command line
     try:
         args = shlex.split(command_line)
     except ValueError as e:
-        print(f"✗ Error: Invalid command syntax - {e}")
-        return
-    
+        OutputFormatter.print_error(f"Invalid command syntax - {e}")
+        return True
+    return execute_args(args)
+
+# Execute an already split command line, returns False when the command asks to quit
+def execute_args(args: list):
     if not args or args[0] in ["quit", "exit", "q"]:
         return False
     
+    parser = get_parser()
     if args[0] == "help":
-        parser = create_parser()
         parser.print_help()
         return True
 
-    parser = create_parser()
     try:
         parsed_args = parser.parse_args(args)
     except SystemExit:
+        context.failed_commands += 1
         return True
     
     formatter = OutputFormatter()
@@ -50,10 +66,62 @@ def execute_command(command_line: str):
         parser.print_help()
         return True
 
+    # Machine-readable output keeps stdout for its records
+    OutputFormatter.errors_to_stderr = getattr(parsed_args, "output", "table") != "table"
+    try:
+        run_in_unit_of_work(parsed_args.command, lambda: run_command(parsed_args, formatter))
+    finally:
+        OutputFormatter.errors_to_stderr = False
+    return True
+
+# One unit of work per command: repeated loads share objects,
+# and what the command cost is recorded for the stats command
+# A command that printed an error counts as failed, for the exit status of one-shot and script runs
+def run_in_unit_of_work(command: str, action):
+    formatter = OutputFormatter()
+    errors_before = OutputFormatter.errors_printed
+    unit_of_work = UnitOfWork()
+    started = time.perf_counter()
+    try:
+        with unit_of_work:
+            action()
+    except Exception as e:
+        formatter.print_error(f"Command failed: {e}")
+    finally:
+        wall_seconds = time.perf_counter() - started
+        failed = OutputFormatter.errors_printed > errors_before
+        if failed:
+            context.failed_commands += 1
+        record_command(command, unit_of_work, wall_seconds, failed)
+        if KANBAN_DEBUG:
+            formatter.print_debug(
+                f"{command}: {unit_of_work.round_trips} database round trips, "
+                f"{unit_of_work.identity_hits} loads served from the identity map, "
+                f"{unit_of_work.documents} documents ({unit_of_work.bytes_decoded / 1024:.1f} KiB) read, "
+                f"{wall_seconds * 1000:.1f}ms of which database {unit_of_work.database_seconds * 1000:.1f}ms, "
+                f"decode {unit_of_work.decode_seconds * 1000:.1f}ms, output {unit_of_work.output_seconds * 1000:.1f}ms"
+            )
+
+# Add what a command cost to the statistics of the stats command
+def record_command(command: str, unit_of_work: UnitOfWork, wall_seconds: float, failed: bool):
+    if COMMAND_STATS_ENABLED:
+        context.command_stats.record(command, unit_of_work.measurements(wall_seconds), failed)
+
+# The parser is built once, building it for every line would dominate long scripts
+def get_parser():
+    global _parser
+    if _parser is None:
+        _parser = create_parser()
+    return _parser
+
+# Run a parsed command, errors are reported through the formatter
+def run_command(parsed_args, formatter: OutputFormatter):
+    global current_user
+
     try:
         # Auth commands (no user required)
         if parsed_args.command == "signup":
-            auth_service = AuthService()
+            auth_service = context.auth_service
             user_id, resolved_role = auth_service.signup(
                 parsed_args.username,
                 parsed_args.password,
@@ -64,11 +132,16 @@ def execute_command(command_line: str):
             formatter.print_success(f"User '{parsed_args.username}' created as '{resolved_role}'")
         
         elif parsed_args.command == "login":
-            auth_service = AuthService()
+            auth_service = context.auth_service
             current_user = auth_service.login(parsed_args.username, parsed_args.password)
+            # Later runs of the CLI resume this login from the session file
+            context.session_service.start(current_user)
             formatter.print_success(f"Logged in as '{current_user.username}' ({current_user.role})")
         
         elif parsed_args.command == "signout":
+            session_service = context.session_service
+            current_user = current_user or session_service.resume()
+            session_service.end()
             if current_user:
                 username = current_user.username
                 current_user = None
@@ -76,45 +149,167 @@ def execute_command(command_line: str):
             else:
                 formatter.print_error("No user is currently logged in")
         
-        # All other commands require login
-        elif current_user is None:
+        # Benchmarks this machine only, so it needs no login
+        elif parsed_args.command == "calibrate-hash":
+            params, milliseconds = calibrate(parsed_args.scheme, parsed_args.target_ms)
+            formatter.print_success(
+                f"{parsed_args.scheme} with {PasswordHasher.format_params(params)} takes {milliseconds:.1f}ms per hash "
+                f"(target {parsed_args.target_ms:.0f}ms)"
+            )
+            print(f"Use it with: PASSWORD_HASH_SCHEME={parsed_args.scheme} PASSWORD_HASH_PARAMS={PasswordHasher.format_params(params)}")
+        
+        # Statistics of this process only, so they need no login either
+        elif parsed_args.command == "stats":
+            command_stats = context.command_stats
+            snapshot = command_stats.snapshot(parsed_args.stats_command)
+            if parsed_args.json or parsed_args.out:
+                document = json.dumps({"since": command_stats.started_at, "commands": snapshot}, indent=2)
+                if parsed_args.out:
+                    with open(parsed_args.out, "w", encoding="utf-8") as f:
+                        f.write(document + "\n")
+                    formatter.print_success(f"Statistics of {len(snapshot)} commands written to {parsed_args.out}")
+                if parsed_args.json:
+                    print(document)
+            if not parsed_args.json:
+                if not COMMAND_STATS_ENABLED:
+                    print("Command statistics are off, set COMMAND_STATS_ENABLED=true to collect them.")
+                formatter.print_command_stats(snapshot)
+                if parsed_args.stats_command in snapshot:
+                    formatter.print_histogram(f"{parsed_args.stats_command} wall time", snapshot[parsed_args.stats_command]["wall_ms"])
+            if parsed_args.reset:
+                command_stats.reset()
+        
+        # All other commands require login, a saved session from an earlier run counts
+        elif current_user is None and not resume_session():
             formatter.print_error("You must login first. Use: login --username <user> --password <pass>")
         
+        # User management commands
+        elif parsed_args.command == "import-users":
+            import_service = context.import_service
+            started = time.perf_counter()
+            results = list(import_service.import_users(
+                iter_user_rows(parsed_args.file),
+                current_user.role,
+                batch_size=parsed_args.batch_size,
+                workers=parsed_args.workers,
+            ))
+            seconds = time.perf_counter() - started
+            if parsed_args.report:
+                write_import_report(parsed_args.report, results)
+                formatter.print_success(f"Report written to {parsed_args.report}")
+            formatter.print_import_report(results, seconds, only_failed=bool(parsed_args.report))
+        
         # Board commands
         elif parsed_args.command == "create-board":
-            board_service = BoardService()
+            board_service = context.board_service
             board_service.create_board(parsed_args.name, current_user._id, current_user.role)
             formatter.print_success(f"Board '{parsed_args.name}' created")
         
         elif parsed_args.command == "list-boards":
-            board_service = BoardService()
+            board_service = context.board_service
             boards = board_service.list_boards_for_user(current_user._id, current_user.role)
-            if boards:
+            if parsed_args.output != "table":
+                formatter.print_records((board_record(board) for board in boards), parsed_args.output, BOARD_FIELDS)
+            elif boards:
                 for board in boards:
                     print(f"  - {board.name} (columns: {', '.join(board.columns)})")
             else:
                 print("No boards found")
         
         elif parsed_args.command == "view-board":
-            board_service = BoardService()
-            board = board_service.get_board_visible_to_user(parsed_args.board, current_user._id, current_user.role)
-            task_service = TaskService()
-            # Group tasks by column
-            tasks_by_column = {}
-            for col in board.columns:
-                tasks_by_column[col] = task_service.list_tasks_in_column(board._id, col)
-            formatter.print_board_view(board.name, board.columns, tasks_by_column)
+            board_service = context.board_service
+            max_rows = parsed_args.max_rows
+            if max_rows is not None and max_rows < 1:
+                raise ValueError("Max rows must be a positive number")
+            if parsed_args.output != "table":
+                board = board_service.get_board_visible_to_user(parsed_args.board, current_user._id, current_user.role)
+                task_service = context.task_service
+                # Columns stream one after the other straight from their cursors into the output
+                records = (
+                    task_record(task, board.name)
+                    for col in board.columns
+                    for task in task_service.iter_tasks_in_column(board._id, col, parsed_args.sort, limit=max_rows or 0)
+                )
+                formatter.print_records(records, parsed_args.output, TASK_FIELDS)
+            else:
+                # Access is checked on every view, the identity map and board cache keep it cheap
+                board = board_service.get_board_visible_to_user(parsed_args.board, current_user._id, current_user.role)
+                view_cache = LocalViewCache()
+                cached = view_cache.get(board._id, parsed_args.sort)
+                # A cached view is used only if the board is still at the version it was read at
+                if cached and board_service.get_board_version(board._id) == cached[0].version:
+                    cached_board, tasks_by_column = cached
+                    formatter.print_board_view(board.name, cached_board.columns, tasks_by_column, max_rows=max_rows)
+                else:
+                    task_service = context.task_service
+                    if max_rows:
+                        # Only the shown cards are read, the rest of each column is counted on the server
+                        tasks_by_column = {
+                            col: task_service.iter_tasks_in_column(board._id, col, parsed_args.sort, limit=max_rows)
+                            for col in board.columns
+                        }
+                        totals = task_service.count_tasks_by_column(board._id)
+                        formatter.print_board_view(board.name, board.columns, tasks_by_column, max_rows=max_rows, totals=totals)
+                    else:
+                        # Rows are drawn while the columns stream in, the tasks are kept for the view cache
+                        tasks_by_column = {col: [] for col in board.columns}
+                        streams = {
+                            col: collect_into(task_service.iter_tasks_in_column(board._id, col, parsed_args.sort), tasks_by_column[col])
+                            for col in board.columns
+                        }
+                        formatter.print_board_view(board.name, board.columns, streams)
+                        view_cache.put(board, parsed_args.sort, tasks_by_column)
         
         elif parsed_args.command == "delete-board":
-            board_service = BoardService()
+            board_service = context.board_service
+            # Looked up first for its id, delete_board finds it again in the board cache
+            board = board_service.get_board_by_name(parsed_args.name, current_user._id) if current_user.role == "Boss" else None
             board_service.delete_board(parsed_args.name, current_user._id, current_user.role)
+            if board:
+                LocalViewCache().invalidate(board._id)
             formatter.print_success(f"Board '{parsed_args.name}' deleted")
         
+        elif parsed_args.command == "export-board":
+            board_service = context.board_service
+            boards = [
+                board_service.get_board_visible_to_user(name, current_user._id, current_user.role)
+                for name in parsed_args.board
+            ]
+            transfer_service = context.transfer_service
+            started = time.perf_counter()
+            if len(boards) == 1 and not (parsed_args.out and os.path.isdir(parsed_args.out)):
+                compression = parsed_args.compress or (detect_compression(parsed_args.out) if parsed_args.out else "none")
+                path = parsed_args.out or export_file_name(boards[0].name, compression)
+                counts = {boards[0].name: transfer_service.export_board(boards[0], path, compression)}
+                location = path
+            else:
+                location = parsed_args.out or "."
+                counts = transfer_service.export_boards(boards, location, parsed_args.compress or "none", workers=parsed_args.workers)
+            seconds = time.perf_counter() - started
+            total = sum(counts.values())
+            formatter.print_success(
+                f"Exported {len(counts)} boards ({total} tasks) to {location} in {seconds:.2f}s "
+                f"({total / max(seconds, 1e-9):,.0f} tasks/s)"
+            )
+        
+        elif parsed_args.command == "import-board":
+            transfer_service = context.transfer_service
+            started = time.perf_counter()
+            _, imported = transfer_service.import_board(
+                parsed_args.file,
+                current_user._id,
+                current_user.role,
+                name=parsed_args.name,
+                batch_size=parsed_args.batch_size,
+            )
+            seconds = time.perf_counter() - started
+            formatter.print_success(f"Imported {imported} tasks from {parsed_args.file} in {seconds:.2f}s")
+        
         # Task commands
         elif parsed_args.command == "add-task":
-            board_service = BoardService()
+            board_service = context.board_service
             board = board_service.get_board_by_name(parsed_args.board, current_user._id)
-            task_service = TaskService()
+            task_service = context.task_service
             task_id = task_service.create_task(
                 title=parsed_args.title,
                 board_id=board._id,
@@ -127,15 +322,15 @@ def execute_command(command_line: str):
             formatter.print_success(f"Task '{parsed_args.title}' created on board '{board.name}' (id: {str(task_id)[:8]})")
         
         elif parsed_args.command == "edit-task":
-            board_service = BoardService()
+            board_service = context.board_service
             board = board_service.get_board_by_name(parsed_args.board, current_user._id)
-            task_service = TaskService()
+            task_service = context.task_service
             # Find task by title in the board
             tasks = task_service.task_repo.find_task_by_board(board._id)
             task = next((t for t in tasks if t.title == parsed_args.title), None)
             if not task:
                 formatter.print_error(f"Task '{parsed_args.title}' not found in board '{parsed_args.board}'")
-                return True
+                return
             
             updates = {
                 key: value
@@ -149,89 +344,400 @@ def execute_command(command_line: str):
             }
             if not updates:
                 formatter.print_error("No updates provided")
-                return True
+                return
 
             task_service.edit_task(task._id, updates, current_user.role)
             formatter.print_success(f"Task '{parsed_args.title}' updated")
         
         elif parsed_args.command == "move-task":
-            board_service = BoardService()
+            board_service = context.board_service
             board = board_service.get_board_by_name(parsed_args.board, current_user._id)
-            task_service = TaskService()
+            task_service = context.task_service
             # Find task by title in the board
             tasks = task_service.task_repo.find_task_by_board(board._id)
             task = next((t for t in tasks if t.title == parsed_args.title), None)
             if not task:
                 formatter.print_error(f"Task '{parsed_args.title}' not found in board '{parsed_args.board}'")
-                return True
+                return
             
             task_service.move_task(task._id, parsed_args.to, current_user.role)
             formatter.print_success(f"Task '{parsed_args.title}' moved to {parsed_args.to}")
         
+        elif parsed_args.command == "reorder-task":
+            board_service = context.board_service
+            board = board_service.get_board_by_name(parsed_args.board, current_user._id)
+            task_service = context.task_service
+            # Find both tasks by title in the board
+            tasks = task_service.task_repo.find_task_by_board(board._id)
+            anchor_title = parsed_args.before or parsed_args.after
+            task = next((t for t in tasks if t.title == parsed_args.title), None)
+            anchor = next((t for t in tasks if t.title == anchor_title), None)
+            if not task or not anchor:
+                missing = parsed_args.title if not task else anchor_title
+                formatter.print_error(f"Task '{missing}' not found in board '{parsed_args.board}'")
+                return
+            
+            if parsed_args.before:
+                task_service.reorder_task(task._id, current_user.role, before_id=anchor._id)
+            else:
+                task_service.reorder_task(task._id, current_user.role, after_id=anchor._id)
+            position = "before" if parsed_args.before else "after"
+            formatter.print_success(f"Task '{parsed_args.title}' placed {position} '{anchor_title}'")
+        
         elif parsed_args.command == "delete-task":
-            board_service = BoardService()
+            board_service = context.board_service
             board = board_service.get_board_by_name(parsed_args.board, current_user._id)
-            task_service = TaskService()
+            task_service = context.task_service
             # Find task by title in the board
             tasks = task_service.task_repo.find_task_by_board(board._id)
             task = next((t for t in tasks if t.title == parsed_args.title), None)
             if not task:
                 formatter.print_error(f"Task '{parsed_args.title}' not found in board '{parsed_args.board}'")
-                return True
+                return
             
             task_service.delete_task(task._id, current_user.role)
             formatter.print_success(f"Task '{parsed_args.title}' deleted")
         
         elif parsed_args.command == "view-task":
-            board_service = BoardService()
+            board_service = context.board_service
             board = board_service.get_board_by_name(parsed_args.board, current_user._id)
-            task_service = TaskService()
+            task_service = context.task_service
             # Find task by title in the board
             tasks = task_service.task_repo.find_task_by_board(board._id)
             task = next((t for t in tasks if t.title == parsed_args.title), None)
             if not task:
                 formatter.print_error(f"Task '{parsed_args.title}' not found in board '{parsed_args.board}'")
-                return True
+                return
             
-            formatter.print_task_details(task)
+            if parsed_args.output != "table":
+                formatter.print_record(task_record(task, board.name), parsed_args.output, TASK_FIELDS)
+            else:
+                formatter.print_task_details(task)
         
         # Search command
         elif parsed_args.command == "search":
-            board_service = BoardService()
+            board_service = context.board_service
             board = board_service.get_board_by_name(parsed_args.board, current_user._id)
-            search_service = SearchService()
-            results = search_service.search_tasks(board._id, parsed_args.keyword)
+            search_service = context.search_service
+            results = search_service.search_tasks(board._id, parsed_args.keyword, parsed_args.mode)
+            if parsed_args.output != "table":
+                formatter.print_records((task_record(task, board.name) for task in results), parsed_args.output, TASK_FIELDS)
+            elif results:
+                formatter.print_task_list(results)
+            else:
+                print("No matching tasks found")
+        
+        elif parsed_args.command == "filter":
+            board_service = context.board_service
+            board = board_service.get_board_by_name(parsed_args.board, current_user._id)
+            assignee_id = None
+            if parsed_args.assignee:
+                assignee = context.auth_service.get_user(parsed_args.assignee)
+                if not assignee:
+                    raise ValueError(f"User '{parsed_args.assignee}' not found")
+                assignee_id = assignee._id
+            search_service = context.search_service
+            results = search_service.filter_tasks(
+                board._id,
+                column=parsed_args.column,
+                priority=parsed_args.priority,
+                assignee_id=assignee_id,
+                due_from=parsed_args.due_from,
+                due_to=parsed_args.due_to,
+                sort=parsed_args.sort,
+                page=parsed_args.page,
+                page_size=parsed_args.page_size,
+            )
             if results:
                 formatter.print_task_list(results)
+                print(f"Page {parsed_args.page} ({len(results)} tasks)")
+            else:
+                print("No matching tasks found")
+        
+        elif parsed_args.command in ["move-tasks", "edit-tasks", "delete-tasks"]:
+            board_service = context.board_service
+            board = board_service.get_board_by_name(parsed_args.board, current_user._id)
+            filters = bulk_filters(parsed_args)
+            task_service = context.task_service
+            if parsed_args.command == "move-tasks":
+                count = task_service.move_tasks(board._id, filters, parsed_args.to, current_user.role, dry_run=parsed_args.dry_run)
+                done = f"Moved {count} tasks to {parsed_args.to}"
+            elif parsed_args.command == "edit-tasks":
+                updates = {
+                    key: value
+                    for key, value in {
+                        "description": parsed_args.set_desc,
+                        "priority": parsed_args.set_priority,
+                        "due_date": parsed_args.set_due,
+                    }.items()
+                    if value is not None
+                }
+                count = task_service.edit_tasks(board._id, filters, updates, current_user.role, dry_run=parsed_args.dry_run)
+                done = f"Updated {count} tasks"
+            else:
+                count = task_service.delete_tasks(board._id, filters, current_user.role, dry_run=parsed_args.dry_run)
+                done = f"Deleted {count} tasks"
+            if parsed_args.dry_run:
+                print(f"{count} tasks match, nothing was changed (dry run)")
+            else:
+                formatter.print_success(done)
+        
+        elif parsed_args.command in ["due-soon", "overdue"]:
+            board_service = context.board_service
+            boards = board_service.list_boards_for_user(current_user._id, current_user.role)
+            board_names = {board._id: board.name for board in boards}
+            task_service = context.task_service
+            if parsed_args.command == "overdue":
+                results = task_service.list_overdue_tasks(list(board_names), limit=parsed_args.limit)
+            else:
+                results = task_service.list_tasks_due_soon(list(board_names), days=parsed_args.days, limit=parsed_args.limit)
+            if results:
+                formatter.print_task_list(results, board_names=board_names)
             else:
                 print("No matching tasks found")
         
+        # Backup commands
+        elif parsed_args.command in ["dump", "restore"]:
+            if current_user.role != "Boss":
+                raise PermissionError(f"User role '{current_user.role}' cannot {parsed_args.command} the workspace. Only 'Boss' can.")
+            started = time.perf_counter()
+            if parsed_args.command == "dump":
+                counts = dump_workspace(parsed_args.out)
+            else:
+                counts = restore_workspace(parsed_args.file, drop=parsed_args.drop)
+                # Everything cached in this process or on disk may describe documents that were replaced,
+                # restore_workspace already reset the licence key filter and its snapshot
+                context.board_repo.cache.clear()
+                context.user_repo.cache.clear()
+                context.search_service.cache.clear()
+                LocalViewCache().invalidate()
+            seconds = time.perf_counter() - started
+            summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+            action = "Dumped" if parsed_args.command == "dump" else "Restored"
+            formatter.print_success(f"{action} {summary} in {seconds:.2f}s")
+        
+        # Diagnostics commands
+        elif parsed_args.command == "cache-stats":
+            search_service = context.search_service
+            user_repo = context.user_repo
+            formatter.print_cache_stats({
+                "search": search_service.cache_stats(),
+                "boards": search_service.board_repo.cache_stats(),
+                "users": user_repo.cache_stats(),
+            })
+            call_sites = user_repo.call_site_stats()
+            if call_sites:
+                formatter.print_call_site_stats("users", call_sites)
+            key_filter_stats = context.licence_service.key_filter_stats()
+            if key_filter_stats is not None:
+                formatter.print_filter_stats("licence key", key_filter_stats)
+        
+        elif parsed_args.command in ["licence-stats", "license-stats"]:
+            licence_service = context.licence_service
+            formatter.print_licence_stats(licence_service.licence_stats(current_user.role))
+        
         else:
             formatter.print_error(f"Command '{parsed_args.command}' not implemented yet")
     
     except PermissionError as e:
         formatter.print_error(str(e))
+    except TimeoutError as e:
+        formatter.print_error(str(e))
     except ValueError as e:
         formatter.print_error(str(e))
     except Exception as e:
         formatter.print_error(str(e))
-    
-    return True
 
-# Main REPL loop
-def main():
+# Write the per-row results of import-users to a CSV file
+def write_import_report(path: str, results: list):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["row", "username", "role", "status", "message", "password"])
+        writer.writeheader()
+        writer.writerows(results)
+
+# Yield the items of an iterator, appending each to a list as it passes
+def collect_into(iterator, collected: list):
+    for item in iterator:
+        collected.append(item)
+        yield item
+
+
+# Filters of a bulk task command, with the assignee's username resolved to their id
+def bulk_filters(parsed_args) -> dict:
+    assignee_id = None
+    if parsed_args.assignee:
+        assignee = context.auth_service.get_user(parsed_args.assignee)
+        if not assignee:
+            raise ValueError(f"User '{parsed_args.assignee}' not found")
+        assignee_id = assignee._id
+    return {
+        "column": parsed_args.column,
+        "priority": parsed_args.priority,
+        "assignee_id": assignee_id,
+        "due_from": parsed_args.due_from,
+        "due_to": parsed_args.due_to,
+        "title": parsed_args.title_contains,
+    }
+
+
+# Log in from the saved session file, returns True when a session was resumed
+def resume_session() -> bool:
+    global current_user
+    current_user = context.session_service.resume()
+    return current_user is not None
+
+# Run commands from a script, one per line; blank lines and lines starting with # are skipped
+# Consecutive add-task lines are created with one insert per board instead of one command each.
+# Other commands run one at a time in order, so a script behaves like typing it into the REPL.
+def run_script(lines):
+    pending = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            args = shlex.split(line)
+        except ValueError as e:
+            add_tasks_in_bulk(pending)
+            OutputFormatter.print_error(f"Invalid command syntax - {e}")
+            context.failed_commands += 1
+            continue
+        parsed_args = parse_add_task(args)
+        if parsed_args is not None:
+            pending.append((args, parsed_args))
+            if len(pending) >= SCRIPT_BATCH_SIZE:
+                add_tasks_in_bulk(pending)
+            continue
+        add_tasks_in_bulk(pending)
+        if not execute_args(args):
+            return
+    add_tasks_in_bulk(pending)
+
+# Parsed arguments of an add-task line that can join a bulk insert, or None
+# Only while someone is logged in, otherwise the line runs alone and reports the login error
+def parse_add_task(args: list):
+    if not args or args[0] != "add-task":
+        return None
+    if current_user is None and not resume_session():
+        return None
+    try:
+        return get_parser().parse_args(args)
+    except SystemExit:
+        return None
+
+# Create queued add-task lines with one insert per board, then empty the queue
+# If anything in the batch is invalid the lines run one by one, so each reports its own error
+def add_tasks_in_bulk(pending: list):
+    if not pending:
+        return
+    batch = list(pending)
+    pending.clear()
+    formatter = OutputFormatter()
+    by_board = {}
+    for args, parsed_args in batch:
+        by_board.setdefault(parsed_args.board, []).append((args, parsed_args))
+
+    for board_name, lines in by_board.items():
+        def create_batch():
+            board = context.board_service.get_board_by_name(board_name, current_user._id)
+            task_ids = context.task_service.create_tasks(board._id, [
+                {
+                    "title": parsed_args.title,
+                    "column": parsed_args.column,
+                    "description": parsed_args.desc,
+                    "due_date": parsed_args.due,
+                    "priority": parsed_args.priority,
+                }
+                for _, parsed_args in lines
+            ], current_user.role)
+            for (_, parsed_args), task_id in zip(lines, task_ids):
+                formatter.print_success(f"Task '{parsed_args.title}' created on board '{board.name}' (id: {str(task_id)[:8]})")
+
+        # Validation and permission errors are raised before anything is written
+        unit_of_work = UnitOfWork()
+        started = time.perf_counter()
+        failed = False
+        try:
+            with unit_of_work:
+                create_batch()
+        except (PermissionError, ValueError):
+            for args, _ in lines:
+                execute_args(args)
+            continue
+        except Exception as e:
+            formatter.print_error(f"Saving changes failed: {e}")
+            context.failed_commands += 1
+            failed = True
+        # Kept apart from add-task, whose latency a whole batch would skew
+        record_command("add-task (batch)", unit_of_work, time.perf_counter() - started, failed)
+        if KANBAN_DEBUG:
+            formatter.print_debug(f"add-task x{len(lines)}: {unit_of_work.round_trips} database round trips")
+
+# Entry point
+#   python main.py                          interactive REPL
+#   python main.py <command> [options]      run one command, e.g. python main.py list-boards
+#   python main.py --script file.kanban     run a script of commands, "-" (or piped input) reads stdin
+# One-shot and script runs resume the saved session of the last login and return exit status 1
+# if any command failed. They skip the schema setup, run the REPL or setup_schema.py once for that.
+def main(argv: list = None) -> int:
+    args = sys.argv[1:] if argv is None else argv
+    if args and args[0] == "--script":
+        if len(args) != 2:
+            print("Usage: main.py --script <file>  (use - to read commands from stdin)")
+            return 2
+        return run_script_file(args[1])
+    if args:
+        execute_args(args)
+        return 1 if context.failed_commands else 0
+    if not sys.stdin.isatty():
+        return run_script_file("-")
+    run_repl()
+    return 0
+
+# Run a script file, or stdin for "-", with one setup for the whole script
+def run_script_file(path: str) -> int:
+    prepare()
+    if path == "-":
+        run_script(sys.stdin)
+    else:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                run_script(f)
+        except OSError as e:
+            OutputFormatter.print_error(f"Cannot read script: {e}")
+            return 2
+    return 1 if context.failed_commands else 0
+
+# Schema setup and cache warm-up for long-running sessions (REPL and scripts)
+def prepare():
     # Ensure DB collections and validators are in place before running
     try:
         ensure_schema()
     except Exception as e:
-        print(f"Warning: Schema setup failed: {e}")
+        print(f"Warning: Schema setup failed: {e}", file=sys.stderr)
+    # Build the licence key filter now, so the first signup does not wait for it
+    try:
+        key_filter = context.licence_service.key_filter
+        if key_filter is not None:
+            key_filter.warm_up()
+    except Exception as e:
+        print(f"Warning: Licence key filter setup failed: {e}", file=sys.stderr)
+
+# Main REPL loop
+def run_repl():
+    prepare()
     
     print("=" * 60)
     print("CLI-Kanban: Interactive Task Management")
     print("=" * 60)
-    print("Commands: signup, login, signout, create-board, list-boards, view-board, add-task, edit-task, move-task, delete-task, view-task, search")
+    print("Commands: signup, login, signout, import-users, create-board, list-boards, view-board, export-board, import-board, add-task, edit-task, move-task, reorder-task, delete-task, view-task, move-tasks, edit-tasks, delete-tasks, search, filter, due-soon, overdue, dump, restore, cache-stats, stats, licence-stats, calibrate-hash")
     print("Type 'help' for full documentation, 'quit' to exit")
     print("=" * 60)
+    try:
+        if resume_session():
+            print(f"✓ Resumed session of '{current_user.username}' ({current_user.role})")
+    except Exception as e:
+        print(f"Warning: Could not resume the saved session: {e}", file=sys.stderr)
 
     while True:
         try:
@@ -243,7 +749,7 @@ def main():
             if not execute_command(command_line):
                 print("✓ Goodbye!")
                 break
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, EOFError):
             print("\n✓ Goodbye!")
             break
         except Exception as e:
@@ -251,4 +757,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -69,4 +69,7 @@ class Boss(Hashira):
         return True  # Implemented in service layer
     
     def delete_board(self, board_id: ObjectId) -> bool:
-        return True  # Implemented in service layer
\ No newline at end of file
+        return True  # Implemented in service layer
+
+# User class for each role, e.g. USER_CLASSES["Hashira"]
+USER_CLASSES = {"Members": Members, "Hashira": Hashira, "Boss": Boss}
@@ -1,21 +1,49 @@
 from __future__ import annotations
+from datetime import date, datetime
 from bson import ObjectId
 
+DUE_DATE_FORMAT = "%Y-%m-%d"
+# Numeric rank stored next to the priority name so an index can sort by urgency (lower is more urgent)
+PRIORITY_RANKS = {"high": 0, "medium": 1, "low": 2}
+
+# Convert a due date given as "YYYY-MM-DD", date or datetime into the datetime stored as a BSON date
+# Due dates are calendar days, so they are kept at midnight without a timezone
+def parse_due_date(value) -> datetime | None:
+    if value is None or value == "":
+        return None
+    if isinstance(value, date):    # also covers datetime
+        return datetime(value.year, value.month, value.day)
+    try:
+        return datetime.strptime(value, DUE_DATE_FORMAT)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid due date '{value}'. Due dates must use the YYYY-MM-DD format.")
+
+# Format a stored due date back to "YYYY-MM-DD" for display
+def format_due_date(value) -> str | None:
+    if value is None:
+        return None
+    if isinstance(value, date):
+        return value.strftime(DUE_DATE_FORMAT)
+    return str(value)
+
 # ----------------Entity Classes-----------------#
 class Board:
-    def __init__(self, name: str, owner_id: ObjectId, columns: list[str] | None = None, _id: ObjectId = None):
+    def __init__(self, name: str, owner_id: ObjectId, columns: list[str] | None = None, version: int = 0, _id: ObjectId = None):
         self._id = _id
         self.name = name
         self.owner_id = owner_id
         # All boards have the classic board with TODO, DOING, DONE columns by default
         # Can be extended to a customised board in the future
         self.columns = columns or ["TODO", "DOING", "DONE"]
+        # Incremented on every task write, so caches keyed by version are never stale
+        self.version = version
 
     def to_dict(self):
         result = {
             "name": self.name,
             "owner_id": self.owner_id,
             "columns": self.columns,
+            "version": self.version,
         }
         if self._id is not None:    # Check if _id exists, if yes then include it
             result["_id"] = self._id
@@ -28,9 +56,11 @@ class Task:
         board_id: ObjectId,
         column: str,
         description: str | None = None,
-        due_date: str | None = None,
+        due_date: str | datetime | None = None,
         priority: str = "medium",   # default is set to medium
         assigned_to: ObjectId | None = None,    #The functionality of assign tasks is not implemented
+        priority_rank: int | None = None,   # always derived from priority, accepted so stored documents load
+        rank: str | None = None,    # fractional key for manual ordering within the column
         _id: ObjectId = None,
     ):
         self._id = _id
@@ -43,10 +73,13 @@ class Task:
             raise ValueError(f"Invalid column: {column}. Must be one of {sorted(valid_columns)}.")
         self.column = normalized_column
         self.description = description
-        self.due_date = due_date
+        # Stored as a BSON date so it can be range-queried and sorted on an index
+        self.due_date = parse_due_date(due_date)
         self.priority = priority
+        self.priority_rank = PRIORITY_RANKS.get(priority, PRIORITY_RANKS["medium"])
         # Can be extended to assign tasks to users in the future
         self.assigned_to = assigned_to
+        self.rank = rank
 
     def to_dict(self):
         result = {
@@ -56,7 +89,9 @@ class Task:
             "description": self.description,
             "due_date": self.due_date,
             "priority": self.priority,
+            "priority_rank": self.priority_rank,
             "assigned_to": self.assigned_to,
+            "rank": self.rank,
         }
         if self._id is not None:
             result["_id"] = self._id
@@ -64,11 +99,14 @@ class Task:
 
 
 class Licence:
-    def __init__(self, key: str, owner_id: ObjectId | None = None, role: str = "Members", _id: ObjectId = None):
+    def __init__(self, key: str, owner_id: ObjectId | None = None, role: str = "Members", _id: ObjectId = None,
+                 reserved_at: datetime | None = None, reserved_for: str | None = None):
         self._id = _id
         self.key = key
         self.owner_id = owner_id
         self.role = role
+        self.reserved_at = reserved_at      # Set when the key was handed out but not yet redeemed
+        self.reserved_for = reserved_for
 
     def to_dict(self):
         result = {
@@ -76,6 +114,9 @@ class Licence:
             "owner_id": self.owner_id,
             "role": self.role,
         }
+        if self.reserved_at is not None:
+            result["reserved_at"] = self.reserved_at
+            result["reserved_for"] = self.reserved_for
         if self._id is not None:    # Check if _id exists, if yes then include it
             result["_id"] = self._id
         return result
\ No newline at end of file
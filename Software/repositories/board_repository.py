@@ -1,27 +1,46 @@
 from models.entities import Board
 from repositories.mongodb_adapter import MongoDBAdapter
+from utils.lru_cache import LRUCache
+from utils.unit_of_work import lookup_identity, track_identity, forget_identity
+from config import BOARD_CACHE_SIZE, BOARD_CACHE_TTL, BOARD_CACHE_VALIDATE
 from bson import ObjectId
 
+# Shared by every BoardRepository in the process, so a REPL session stops re-reading the same boards
+# Entries hold raw documents keyed by ("id", _id), ("name", name, owner_id) or ("names", name)
+_board_cache = LRUCache(max_size=BOARD_CACHE_SIZE, ttl_seconds=BOARD_CACHE_TTL)
+
 #----------------Board Repository-----------------#
 class BoardRepository:
     
     COLLECTION_NAME = "boards"
     
-    def __init__(self, adapter: MongoDBAdapter = None):
+    def __init__(self, adapter: MongoDBAdapter = None, cache: LRUCache = None, validate_cache: bool = BOARD_CACHE_VALIDATE):
         self.adapter = adapter or MongoDBAdapter()
+        self.cache = cache if cache is not None else _board_cache
+        # When enabled, a cache hit costs one projected query to confirm the board still has the cached version
+        self.validate_cache = validate_cache
         self.adapter.create_index(self.COLLECTION_NAME, "owner_id")
         self.adapter.create_index(self.COLLECTION_NAME, "name")
     
     def create_board(self, board: Board) -> ObjectId:
         doc = board.to_dict()
         board_id = self.adapter.insert_one(self.COLLECTION_NAME, doc)
+        # Name lookups cached before the insert would not include the new board
+        self.cache.invalidate(("name", board.name, board.owner_id))
+        self.cache.invalidate(("names", board.name))
         return board_id
 
     def find_board_by_id(self, board_id: ObjectId) -> Board:
-        doc = self.adapter.find_one(self.COLLECTION_NAME, {"_id": board_id})
+        board = lookup_identity(self.COLLECTION_NAME, board_id)
+        if board is not None:
+            return board
+        doc = self._cached_lookup(
+            ("id", board_id),
+            lambda: self.adapter.find_one(self.COLLECTION_NAME, {"_id": board_id})
+        )
         if not doc:
             return None
-        return Board(**{**doc, '_id': doc['_id']})
+        return self._to_board(doc)
     
     def find_board_by_owner(self, owner_id: ObjectId) -> list:
         docs = self.adapter.find_many(self.COLLECTION_NAME, {"owner_id": owner_id})
@@ -29,26 +48,100 @@ class BoardRepository:
     
     # Find board by name but also match owner_id to ensure uniqueness per user
     def find_board_by_name(self, name: str, owner_id: ObjectId) -> Board:
-        doc = self.adapter.find_one(
-            self.COLLECTION_NAME,
-            {"name": name, "owner_id": owner_id}
+        doc = self._cached_lookup(
+            ("name", name, owner_id),
+            lambda: self.adapter.find_one(
+                self.COLLECTION_NAME,
+                {"name": name, "owner_id": owner_id}
+            )
         )
         if not doc:
             return None
-        return Board(**{**doc, '_id': doc['_id']})
+        return self._to_board(doc)
     
     # Find all boards matching a given name, regardless of owner
     def find_boards_by_name(self, name: str) -> list:
-        docs = self.adapter.find_many(self.COLLECTION_NAME, {"name": name})
-        return [Board(**{**doc, '_id': doc['_id']}) for doc in docs]
+        docs = self._cached_lookup(
+            ("names", name),
+            lambda: self.adapter.find_many(self.COLLECTION_NAME, {"name": name})
+        )
+        return [self._to_board(doc) for doc in docs or []]
     
+    # Hit/miss/eviction counters of the board cache
+    def cache_stats(self) -> dict:
+        return self.cache.stats()
+    
+    # Atomically increment the board version after any change to its tasks
+    # Sent right after the write it follows, never deferred: the view cache trusts a board's version,
+    # so a bump lost to a failed command or a crash would let it show the old tasks for good
+    def bump_version(self, board_id: ObjectId) -> bool:
+        modified = self.adapter.increment_one(
+            self.COLLECTION_NAME,
+            {"_id": board_id},
+            {"version": 1}
+        )
+        forget_identity(self.COLLECTION_NAME, board_id)
+        self._invalidate_board(board_id)
+        return modified > 0
+
+    # Read only the version field of a board, boards created before versioning count as 0
+    def get_version(self, board_id: ObjectId) -> int | None:
+        doc = self.adapter.find_one(self.COLLECTION_NAME, {"_id": board_id}, {"version": 1})
+        if not doc:
+            return None
+        return doc.get("version", 0)
+
     def delete_board(self, board_id: ObjectId) -> bool:
         deleted = self.adapter.delete_one(
             self.COLLECTION_NAME,
             {"_id": board_id}
         )
+        self._invalidate_board(board_id)
+        forget_identity(self.COLLECTION_NAME, board_id)
         return deleted > 0
 
+    #----------------Helper Functions-----------------#
+    # Serve a lookup from the cache, loading and caching it on a miss
+    # Empty results are not cached, so boards created by other clients show up immediately
+    def _cached_lookup(self, key, load):
+        cached = self.cache.get(key)
+        if cached is not None and (not self.validate_cache or self._is_current(cached)):
+            return cached
+        if cached is not None:
+            self.cache.invalidate(key)
+
+        result = load()
+        if result:
+            self.cache.set(key, result)
+        return result
+
+    # Cheap validation: compare cached versions with the server in one projected query
+    def _is_current(self, cached) -> bool:
+        docs = cached if isinstance(cached, list) else [cached]
+        current = {
+            doc["_id"]: doc.get("version", 0)
+            for doc in self.adapter.find_many(
+                self.COLLECTION_NAME,
+                {"_id": {"$in": [doc["_id"] for doc in docs]}},
+                projection={"version": 1}
+            )
+        }
+        return all(current.get(doc["_id"]) == doc.get("version", 0) for doc in docs)
+
+    # Drop every cached entry that contains the board
+    def _invalidate_board(self, board_id: ObjectId):
+        def contains_board(key, value):
+            docs = value if isinstance(value, list) else [value]
+            return any(doc["_id"] == board_id for doc in docs)
+
+        self.cache.invalidate_matching(contains_board)
+
+    # Build a Board from a (possibly cached) document without sharing mutable state with the cache
+    # Within a unit of work a board already loaded by this command is returned instead
+    def _to_board(self, doc: dict) -> Board:
+        board = Board(**{**doc, "columns": list(doc.get("columns") or []), '_id': doc['_id']})
+        return track_identity(self.COLLECTION_NAME, board)
+
 #----------Not currenly used, but could implemented in the future----------#
 #   Adding update/delete board features
 #    def update_board(self, board_id: ObjectId, updates: dict) -> bool:
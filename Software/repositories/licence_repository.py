@@ -1,29 +1,59 @@
+from datetime import datetime, timezone
 from models.entities import Licence
 from repositories.mongodb_adapter import MongoDBAdapter
 from bson import ObjectId
+from pymongo import UpdateOne
 
 #----------------Licence Repository-----------------#
 class LicenceRepository:
     
     COLLECTION_NAME = "licences"
+    # Unclaimed licences in the order reserve_next_licence hands them out, kept in sync with setup_schema
+    # Partial, so the index only holds the free keys and stays small however many have been redeemed.
+    # Queries must say {"owner_id": {"$type": "null"}} (not {"owner_id": None}) for MongoDB to use it.
+    UNCLAIMED_INDEX = [("role", 1), ("reserved_at", 1), ("_id", 1)]
+    UNCLAIMED_FILTER = {"owner_id": {"$type": "null"}}
     
     def __init__(self, adapter: MongoDBAdapter = None):
         self.adapter = adapter or MongoDBAdapter()
         self.adapter.create_index(self.COLLECTION_NAME, "key", unique=True)
         self.adapter.create_index(self.COLLECTION_NAME, "owner_id")
         self.adapter.create_index(self.COLLECTION_NAME, "role")
+        self.adapter.create_index(
+            self.COLLECTION_NAME,
+            self.UNCLAIMED_INDEX,
+            name="unclaimed_by_role",
+            partialFilterExpression=self.UNCLAIMED_FILTER,
+        )
     
     def create_licence(self, licence: Licence) -> ObjectId:
         doc = licence.to_dict()
         licence_id = self.adapter.insert_one(self.COLLECTION_NAME, doc)
         return licence_id
     
+    # Insert a batch of licences in one round trip, keys that already exist are skipped
+    # Returns {"inserted": n, "duplicates": n, "duplicate_indexes": [positions in licences]}
+    def create_licences(self, licences: list) -> dict:
+        if not licences:
+            return {"inserted": 0, "duplicates": 0, "duplicate_indexes": [], "duplicate_fields": {}}
+        docs = [licence.to_dict() for licence in licences]
+        return self.adapter.insert_many(self.COLLECTION_NAME, docs, ordered=False)
+    
     def find_licence_by_key(self, key: str) -> Licence:
         doc = self.adapter.find_one(self.COLLECTION_NAME, {"key": key})
         if not doc:
             return None
         return Licence(**{**doc, '_id': doc['_id']})
 
+    # Stream every licence key, or only those of licences created at or after since_id
+    # Only the key field is read, so building an in-memory key filter stays cheap
+    # with_ids yields (_id, key) pairs instead, so a caller can remember the newest licence it read
+    def iter_keys(self, since_id: ObjectId = None, batch_size: int = 10000, with_ids: bool = False):
+        query = {"_id": {"$gte": since_id}} if since_id is not None else {}
+        projection = {"key": 1} if with_ids else {"key": 1, "_id": 0}
+        for doc in self.adapter.iter_many(self.COLLECTION_NAME, query, batch_size=batch_size, projection=projection):
+            yield (doc["_id"], doc["key"]) if with_ids else doc["key"]
+
     def assign_owner(self, key: str, owner_id: ObjectId) -> bool:
         """Bind a licence key to a user if it is not already claimed."""
         modified = self.adapter.update_one(
@@ -33,6 +63,93 @@ class LicenceRepository:
         )
         return modified > 0
     
+    # Atomically give an unclaimed licence of the given role to owner_id, in one round trip
+    # Returns the claimed licence, or None if the key does not exist, is taken or has another role
+    def claim_licence(self, key: str, owner_id: ObjectId, role: str) -> Licence:
+        doc = self.adapter.find_one_and_update(
+            self.COLLECTION_NAME,
+            {"key": key, "owner_id": None, "role": role},
+            {"owner_id": owner_id},
+        )
+        if not doc:
+            return None
+        return Licence(**{**doc, "owner_id": owner_id, '_id': doc['_id']})
+
+    # Claim many licences in two round trips: one unordered bulk update, then one lookup of the keys
+    # claims is a list of (key, owner_id, role), role None accepts any role
+    # Returns {key: Licence} for every key that exists; a claim succeeded when licence.owner_id is its owner_id
+    def claim_licences(self, claims: list) -> dict:
+        if not claims:
+            return {}
+        operations = []
+        for key, owner_id, role in claims:
+            query = {"key": key, **self.UNCLAIMED_FILTER}
+            if role is not None:
+                query["role"] = role
+            operations.append(UpdateOne(query, {"$set": {"owner_id": owner_id}}))
+        self.adapter.bulk_write(self.COLLECTION_NAME, operations, ordered=False)
+        docs = self.adapter.find_many(
+            self.COLLECTION_NAME,
+            {"key": {"$in": list({key for key, _, _ in claims})}},
+            projection={"key": 1, "owner_id": 1, "role": 1},
+        )
+        return {doc["key"]: Licence(**doc) for doc in docs}
+
+    # Undo many claims in one round trip, each only if the licence is still held by its owner
+    # claims is a list of (key, owner_id)
+    def release_licences(self, claims: list) -> int:
+        if not claims:
+            return 0
+        operations = [UpdateOne({"key": key, "owner_id": owner_id}, {"$set": {"owner_id": None}}) for key, owner_id in claims]
+        return self.adapter.bulk_write(self.COLLECTION_NAME, operations, ordered=False).modified_count
+
+    # Undo a claim, only if the licence is still held by owner_id
+    def release_licence(self, key: str, owner_id: ObjectId) -> bool:
+        modified = self.adapter.update_one(
+            self.COLLECTION_NAME,
+            {"key": key, "owner_id": owner_id},
+            {"owner_id": None},
+        )
+        return modified > 0
+    
+    # Atomically set aside the oldest free licence of a role, e.g. to send its key to a new customer
+    # Free means unclaimed and not reserved before, so two callers never get the same key.
+    # Answered from the unclaimed_by_role index in one round trip, returns None when none is left
+    def reserve_next_licence(self, role: str, reserved_for: str = None) -> Licence:
+        reserved_at = datetime.now(timezone.utc)
+        doc = self.adapter.find_one_and_update(
+            self.COLLECTION_NAME,
+            {"role": role, **self.UNCLAIMED_FILTER, "reserved_at": None},
+            {"reserved_at": reserved_at, "reserved_for": reserved_for},
+            sort=[("_id", 1)],
+        )
+        if not doc:
+            return None
+        return Licence(**{**doc, "reserved_at": reserved_at, "reserved_for": reserved_for, '_id': doc['_id']})
+
+    # Claimed, unclaimed and reserved (unclaimed but handed out) licences per role, from one aggregation
+    # Returns {role: {"claimed": n, "unclaimed": n, "reserved": n}} for every role that has licences
+    def licence_stats(self) -> dict:
+        unclaimed = {"$eq": [{"$ifNull": ["$owner_id", None]}, None]}
+        reserved = {"$and": [unclaimed, {"$ne": [{"$ifNull": ["$reserved_at", None]}, None]}]}
+        groups = self.adapter.aggregate(self.COLLECTION_NAME, [
+            {"$group": {
+                "_id": "$role",
+                "total": {"$sum": 1},
+                "unclaimed": {"$sum": {"$cond": [unclaimed, 1, 0]}},
+                "reserved": {"$sum": {"$cond": [reserved, 1, 0]}},
+            }},
+            {"$sort": {"_id": 1}},
+        ])
+        return {
+            group["_id"]: {
+                "claimed": group["total"] - group["unclaimed"],
+                "unclaimed": group["unclaimed"],
+                "reserved": group["reserved"],
+            }
+            for group in groups
+        }
+    
     # Validate if a licence key exists
     def validate_licence(self, key: str) -> bool:
         return self.find_licence_by_key(key) is not None
@@ -1,25 +1,92 @@
+import functools
+import time
+from bson import decode_all
 from config import get_database
-from pymongo.errors import PyMongoError
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError, ExecutionTimeout, BulkWriteError
+from pymongo.errors import DuplicateKeyError as MongoDuplicateKeyError
+from utils.unit_of_work import count_round_trip, count_database_time, count_read
+
+# Raised when a write violates a unique index, fields names the indexed fields, e.g. ["username"]
+class DuplicateKeyError(Exception):
+    def __init__(self, message: str, fields: list = None):
+        super().__init__(message)
+        self.fields = fields or []
+
+# Decorator adding the time a call takes to the running command, for calls that do not read a cursor
+def _timed(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            count_database_time(time.perf_counter() - started)
+    return wrapper
 
 #-----------------MongoDB Adapter-----------------#
+# Each call is counted as one round trip against the running command (see utils/unit_of_work.py),
+# with the time spent waiting for MongoDB. Reads (find_one, find_many, iter_many, aggregate) go
+# through raw BSON batches that are decoded here, so the documents and bytes of each reply are
+# counted and decoding is timed apart from the network; later batches of a cursor count as round trips too.
 class MongoDBAdapter: 
     def __init__(self):
         self.db = get_database()
 
     # Insert a single document
+    @_timed
     def insert_one(self, collection_name: str, document: dict):
         try:
+            count_round_trip()
             collection = self.db[collection_name]       # Get the collection
             result = collection.insert_one(document)    # Insert the document
             return result.inserted_id                   # Return the inserted document ID
+        except MongoDuplicateKeyError as e:
+            fields = list((e.details or {}).get("keyPattern", {}))
+            raise DuplicateKeyError(f"MongoDB insert error: {e}", fields)
+        except PyMongoError as e:
+            raise Exception(f"MongoDB insert error: {e}")
+    
+    # Insert many documents in one round trip
+    # With ordered=False the server inserts every document it can, documents whose unique key
+    # already exists are counted as duplicates instead of failing the batch
+    # Returns {"inserted": n, "duplicates": n, "duplicate_indexes": [positions in documents],
+    # "duplicate_fields": {position: indexed fields, e.g. ["email"]}}, any other write error raises
+    @_timed
+    def insert_many(self, collection_name: str, documents: list, ordered: bool = True) -> dict:
+        try:
+            count_round_trip()
+            collection = self.db[collection_name]
+            result = collection.insert_many(documents, ordered=ordered)
+            return {"inserted": len(result.inserted_ids), "duplicates": 0, "duplicate_indexes": [], "duplicate_fields": {}}
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            duplicate_fields = {
+                error["index"]: list(error.get("keyPattern", {}))
+                for error in write_errors if error.get("code") == 11000
+            }
+            duplicate_indexes = list(duplicate_fields)
+            if len(duplicate_indexes) != len(write_errors):
+                other = next(error for error in write_errors if error.get("code") != 11000)
+                raise Exception(f"MongoDB insert error: {other.get('errmsg')}")
+            return {
+                "inserted": e.details.get("nInserted", 0),
+                "duplicates": len(duplicate_indexes),
+                "duplicate_indexes": duplicate_indexes,
+                "duplicate_fields": duplicate_fields,
+            }
         except PyMongoError as e:
             raise Exception(f"MongoDB insert error: {e}")
     
     # Find and return a single document
-    def find_one(self, collection_name: str, query: dict):  # query e.g. {"username": "testuser"}
+    # projection limits the returned fields, e.g. {"version": 1}
+    def find_one(self, collection_name: str, query: dict, projection: dict = None):  # query e.g. {"username": "testuser"}
         try:
+            count_round_trip()
             collection = self.db[collection_name]
-            return collection.find_one(query)
+            # A limit of -1 asks for a single batch and closes the cursor on the server, like find_one
+            cursor = collection.find_raw_batches(query, projection).limit(-1)
+            return next(self._read_batches(cursor, collection.codec_options), None)
         except PyMongoError as e:
             raise Exception(f"MongoDB find error: {e}")
     
@@ -27,14 +94,76 @@ class MongoDBAdapter:
     # Returns a list of documents that matches the query
     # limit specifies the maximum number of documents to return
     # Example: adapter.find_many("tasks", {"status": "todo"}, limit=10) means find up to 10 tasks with status "todo"
-    def find_many(self, collection_name: str, query: dict = None, limit: int = 0):
+    # Optional arguments:
+    #   sort         list of (field, direction) pairs, e.g. [("title", 1)]
+    #   collation    must match the index collation for case-insensitive index scans
+    #   max_time_ms  server-side time limit, raises TimeoutError when exceeded
+    #   skip         number of matching documents to skip, for pagination
+    #   projection   limits the returned fields, e.g. {"version": 1}
+    #   hint         name of the index to use, when the caller knows which one serves the sort
+    def find_many(self, collection_name: str, query: dict = None, limit: int = 0,
+                  sort: list = None, collation: dict = None, max_time_ms: int = None, skip: int = 0,
+                  projection: dict = None, hint: str = None):
         try:
+            count_round_trip()
             collection = self.db[collection_name]
             query = query or {}
-            return list(collection.find(query).limit(limit if limit > 0 else 0))
+            cursor = collection.find_raw_batches(query, projection, collation=collation, hint=hint).limit(limit if limit > 0 else 0)
+            if skip > 0:
+                cursor = cursor.skip(skip)
+            if sort:
+                cursor = cursor.sort(sort)
+            if max_time_ms:
+                cursor = cursor.max_time_ms(max_time_ms)
+            return list(self._read_batches(cursor, collection.codec_options))
+        except ExecutionTimeout:
+            raise TimeoutError(f"MongoDB query exceeded the {max_time_ms} ms time limit")
         except PyMongoError as e:
             raise Exception(f"MongoDB find error: {e}")
 
+    # Iterate over matching documents straight from the server cursor
+    # Unlike find_many, documents are yielded batch by batch, so memory stays flat for large results
+    def iter_many(self, collection_name: str, query: dict = None, sort: list = None, limit: int = 0,
+                  batch_size: int = 0, projection: dict = None):
+        try:
+            count_round_trip()
+            collection = self.db[collection_name]
+            cursor = collection.find_raw_batches(query or {}, projection).limit(limit if limit > 0 else 0)
+            if sort:
+                cursor = cursor.sort(sort)
+            if batch_size > 0:
+                cursor = cursor.batch_size(batch_size)
+            with cursor:
+                yield from self._read_batches(cursor, collection.codec_options)
+        except PyMongoError as e:
+            raise Exception(f"MongoDB find error: {e}")
+
+    # Run an aggregation pipeline on the server and return the resulting documents
+    # Example: adapter.aggregate("licences", [{"$group": {"_id": "$role", "count": {"$sum": 1}}}])
+    def aggregate(self, collection_name: str, pipeline: list):
+        try:
+            count_round_trip()
+            collection = self.db[collection_name]
+            cursor = collection.aggregate_raw_batches(pipeline)
+            return list(self._read_batches(cursor, collection.codec_options))
+        except PyMongoError as e:
+            raise Exception(f"MongoDB aggregate error: {e}")
+
+    # Return the winning query plan MongoDB would use for a find, without fetching documents
+    # Useful to check that a query is answered from an index (IXSCAN) and not a COLLSCAN
+    @_timed
+    def explain_find(self, collection_name: str, query: dict, sort: list = None, collation: dict = None,
+                     hint: str = None) -> dict:
+        try:
+            count_round_trip()
+            collection = self.db[collection_name]
+            cursor = collection.find(query, collation=collation, hint=hint)
+            if sort:
+                cursor = cursor.sort(sort)
+            return cursor.explain()["queryPlanner"]["winningPlan"]
+        except PyMongoError as e:
+            raise Exception(f"MongoDB explain error: {e}")
+
     # Update a single document
     # Can update multiple fields, e.g.
     # adapter.update_one(
@@ -46,17 +175,111 @@ class MongoDBAdapter:
     #       "updated_at": "2025-12-20"
     #   }
     # )
+    @_timed
     def update_one(self, collection_name: str, query: dict, update: dict):
         try:
+            count_round_trip()
             collection = self.db[collection_name]
             result = collection.update_one(query, {"$set": update})
             return result.modified_count
         except PyMongoError as e:
             raise Exception(f"MongoDB update error: {e}")
     
+    # Increment numeric fields of a single document atomically on the server
+    # Example: adapter.increment_one("boards", {"_id": board_id}, {"version": 1})
+    @_timed
+    def increment_one(self, collection_name: str, query: dict, increments: dict):
+        try:
+            count_round_trip()
+            collection = self.db[collection_name]
+            result = collection.update_one(query, {"$inc": increments})
+            return result.modified_count
+        except PyMongoError as e:
+            raise Exception(f"MongoDB update error: {e}")
+
+    # Update a single document and return it in the same round trip
+    # Returns the document as it was before the update, or None if nothing matched
+    # sort picks the document to update when several match, e.g. the oldest with [("_id", 1)]
+    @_timed
+    def find_one_and_update(self, collection_name: str, query: dict, update: dict, projection: dict = None,
+                            sort: list = None):
+        try:
+            count_round_trip()
+            collection = self.db[collection_name]
+            document = collection.find_one_and_update(
+                query,
+                {"$set": update},
+                projection=projection,
+                sort=sort,
+                return_document=ReturnDocument.BEFORE,
+            )
+            count_read(1 if document is not None else 0)
+            return document
+        except PyMongoError as e:
+            raise Exception(f"MongoDB update error: {e}")
+
+    # Delete a single document and return it in the same round trip, or None if nothing matched
+    @_timed
+    def find_one_and_delete(self, collection_name: str, query: dict, projection: dict = None):
+        try:
+            count_round_trip()
+            collection = self.db[collection_name]
+            document = collection.find_one_and_delete(query, projection=projection)
+            count_read(1 if document is not None else 0)
+            return document
+        except PyMongoError as e:
+            raise Exception(f"MongoDB delete error: {e}")
+
+    # Update every document matching a query in one round trip, returns the number modified
+    # A dict is applied with $set; a list is sent as an aggregation pipeline, so new values can be
+    # computed from each document's own fields (e.g. {"$concat": ["k", "$rank"]})
+    @_timed
+    def update_many(self, collection_name: str, query: dict, update: dict | list):
+        try:
+            count_round_trip()
+            collection = self.db[collection_name]
+            result = collection.update_many(query, update if isinstance(update, list) else {"$set": update})
+            return result.modified_count
+        except PyMongoError as e:
+            raise Exception(f"MongoDB update error: {e}")
+
+    # Delete every document matching a query in one round trip, returns the number deleted
+    @_timed
+    def delete_many(self, collection_name: str, query: dict):
+        try:
+            count_round_trip()
+            collection = self.db[collection_name]
+            result = collection.delete_many(query)
+            return result.deleted_count
+        except PyMongoError as e:
+            raise Exception(f"MongoDB delete error: {e}")
+
+    # Count the documents matching a query on the server, without sending them
+    @_timed
+    def count_documents(self, collection_name: str, query: dict) -> int:
+        try:
+            count_round_trip()
+            collection = self.db[collection_name]
+            return collection.count_documents(query)
+        except PyMongoError as e:
+            raise Exception(f"MongoDB count error: {e}")
+
+    # Send many write operations (pymongo InsertOne, UpdateOne, DeleteOne, ...) in one round trip
+    # Returns the pymongo BulkWriteResult
+    @_timed
+    def bulk_write(self, collection_name: str, operations: list, ordered: bool = True):
+        try:
+            count_round_trip()
+            collection = self.db[collection_name]
+            return collection.bulk_write(operations, ordered=ordered)
+        except PyMongoError as e:
+            raise Exception(f"MongoDB bulk write error: {e}")
+
     # Delete a single document
+    @_timed
     def delete_one(self, collection_name: str, query: dict):
         try:
+            count_round_trip()
             collection = self.db[collection_name]
             result = collection.delete_one(query)
             return result.deleted_count
@@ -67,13 +290,40 @@ class MongoDBAdapter:
     # It helps to speed up queries on that field
     # Enforce uniqueness if unique=True
     # Example: adapter.create_index("users", "username", unique=True)
-    def create_index(self, collection_name: str, field: str, unique: bool = False):
+    # Compound indexes take a list of (field, direction) pairs, extra options such as
+    # name or collation are passed through to MongoDB, e.g.
+    # adapter.create_index("tasks", [("board_id", 1), ("title", 1)], collation={"locale": "en", "strength": 2})
+    @_timed
+    def create_index(self, collection_name: str, keys, unique: bool = False, **options):
         try:
+            count_round_trip()
             collection = self.db[collection_name]
-            collection.create_index(field, unique=unique)
+            collection.create_index(keys, unique=unique, **options)
         except PyMongoError as e:
             msg = str(e)
             # Ignore the error if the index already exists
             if "already exists" in msg or "IndexOptionsConflict" in msg:
                 return
-            raise Exception(f"MongoDB index error: {e}")
\ No newline at end of file
+            raise Exception(f"MongoDB index error: {e}")
+
+    #----------------Helper Functions-----------------#
+    # Documents of a raw batch cursor (find_raw_batches, aggregate_raw_batches), decoded one batch at a time
+    # pymongo would decode the same bytes itself, so this costs nothing extra but tells waiting from decoding
+    # Every batch after the first is a getMore, one more round trip
+    @staticmethod
+    def _read_batches(cursor, codec_options):
+        batches = iter(cursor)
+        first = True
+        while True:
+            started = time.perf_counter()
+            batch = next(batches, None)
+            received = time.perf_counter()
+            count_database_time(received - started)
+            if batch is None:
+                return
+            if not first:
+                count_round_trip()
+            first = False
+            documents = decode_all(batch, codec_options)
+            count_read(len(documents), len(batch), time.perf_counter() - received)
+            yield from documents
@@ -1,34 +1,174 @@
 from models.entities import Task
 from repositories.mongodb_adapter import MongoDBAdapter
+from utils.rank_keys import ranks_between
+from utils.unit_of_work import lookup_identity, track_identity, forget_identity
+from pymongo import UpdateOne
 from bson import ObjectId
+import re
 
 #----------------Task Repository-----------------#
 class TaskRepository:
     
     COLLECTION_NAME = "tasks"
+    # Case-insensitive comparison (strength 2 ignores case but not accents)
+    # Queries must pass the same collation to use the title index
+    TITLE_COLLATION = {"locale": "en", "strength": 2}
+    SEARCH_MODES = ("literal", "prefix", "regex")
+    # Sort keys for filtered listings, _id breaks ties so pages are deterministic
+    FILTER_SORTS = {
+        "created": [("_id", 1)],
+        "priority": [("priority_rank", 1), ("_id", 1)],
+        "due": [("due_date", 1), ("_id", 1)],
+        "title": [("title", 1), ("_id", 1)],
+    }
+    # Orders for the board view, each served by a (board_id, column, <sort keys>) index
+    # so a column streams in order without an in-memory sort
+    VIEW_SORTS = {
+        "rank": [("rank", 1), ("_id", 1)],
+        "created": [("_id", 1)],
+        "priority": [("priority_rank", 1), ("_id", 1)],
+        "due": [("due_date", 1), ("_id", 1)],
+    }
+    # Compound indexes for the common filter predicates: equality fields first, then due_date and _id
+    # so they serve due-date ranges and the ("due_date", "_id") sort without a blocking SORT stage
+    FILTER_INDEXES = {
+        "board_column_priority_due_id": [("board_id", 1), ("column", 1), ("priority", 1), ("due_date", 1), ("_id", 1)],
+        "board_priority_due_id": [("board_id", 1), ("priority", 1), ("due_date", 1), ("_id", 1)],
+        "board_assignee_due_id": [("board_id", 1), ("assigned_to", 1), ("due_date", 1), ("_id", 1)],
+        "board_due_id": [("board_id", 1), ("due_date", 1), ("_id", 1)],
+    }
+    # Filters whose sort an index returns in order: (equality fields, sort) -> index to hint
+    # Any other combination still finds its tasks through an index but is sorted in memory,
+    # e.g. the title sort or an assignee filter sorted by creation
+    SORTED_FILTER_INDEXES = {
+        (frozenset(), "due"): "board_due_id",
+        (frozenset({"priority"}), "due"): "board_priority_due_id",
+        (frozenset({"column", "priority"}), "due"): "board_column_priority_due_id",
+        (frozenset({"assigned_to"}), "due"): "board_assignee_due_id",
+        (frozenset({"column"}), "due"): "board_column_due",
+        (frozenset({"column"}), "created"): "board_column_created",
+        (frozenset({"column"}), "priority"): "board_column_priority",
+    }
     
     def __init__(self, adapter: MongoDBAdapter = None):
         self.adapter = adapter or MongoDBAdapter()
         self.adapter.create_index(self.COLLECTION_NAME, "board_id")
         self.adapter.create_index(self.COLLECTION_NAME, "assigned_to")
+        self.adapter.create_index(
+            self.COLLECTION_NAME,
+            [("board_id", 1), ("title", 1)],
+            name="board_title_ci",
+            collation=self.TITLE_COLLATION,
+        )
+        for name, keys in self.FILTER_INDEXES.items():
+            self.adapter.create_index(self.COLLECTION_NAME, keys, name=name)
+        for sort, keys in self.VIEW_SORTS.items():
+            self.adapter.create_index(self.COLLECTION_NAME, [("board_id", 1), ("column", 1)] + keys, name=f"board_column_{sort}")
     
     def create_task(self, task: Task) -> ObjectId:
         doc = task.to_dict()
         task_id = self.adapter.insert_one(self.COLLECTION_NAME, doc)
         return task_id
     
+    # Insert many tasks in one round trip, ids are generated here so they can be returned
+    def create_tasks(self, tasks: list) -> list:
+        for task in tasks:
+            if task._id is None:
+                task._id = ObjectId()
+        if tasks:
+            self.adapter.insert_many(self.COLLECTION_NAME, [task.to_dict() for task in tasks])
+        return [task._id for task in tasks]
+    
     def find_task_by_id(self, task_id: ObjectId) -> Task:
+        task = lookup_identity(self.COLLECTION_NAME, task_id)
+        if task is not None:
+            return task
         doc = self.adapter.find_one(self.COLLECTION_NAME, {"_id": task_id})
         if not doc:
             return None
-        return Task(**{**doc, '_id': doc['_id']})
+        return track_identity(self.COLLECTION_NAME, Task(**{**doc, '_id': doc['_id']}))
     
-    def find_task_by_column(self, board_id: ObjectId, column: str) -> list:
+    def find_task_by_column(self, board_id: ObjectId, column: str, sort: str = "created") -> list:
+        return list(self.iter_tasks_by_column(board_id, column, sort))
+
+    # Stream the tasks of a column in the requested order, one batch at a time
+    # limit=0 streams the whole column
+    def iter_tasks_by_column(self, board_id: ObjectId, column: str, sort: str = "created", limit: int = 0):
+        if sort not in self.VIEW_SORTS:
+            raise ValueError(f"Invalid sort. Must be one of {list(self.VIEW_SORTS)}")
+        docs = self.adapter.iter_many(
+            self.COLLECTION_NAME,
+            {"board_id": board_id, "column": column},
+            sort=self.VIEW_SORTS[sort],
+            limit=limit
+        )
+        for doc in docs:
+            yield Task(**{**doc, '_id': doc['_id']})
+
+    # Number of tasks in each column of a board, counted on the server in one round trip
+    def count_tasks_by_column(self, board_id: ObjectId) -> dict:
+        groups = self.adapter.aggregate(self.COLLECTION_NAME, [
+            {"$match": {"board_id": board_id}},
+            {"$group": {"_id": "$column", "count": {"$sum": 1}}},
+        ])
+        return {group["_id"]: group["count"] for group in groups}
+
+    # Stream the raw documents of every task of a board, e.g. for an export
+    # Unsorted, so the server walks the board_id index without sorting; batch_size bounds memory
+    def iter_task_documents(self, board_id: ObjectId, batch_size: int = 1000):
+        yield from self.adapter.iter_many(self.COLLECTION_NAME, {"board_id": board_id}, batch_size=batch_size)
+
+    # Rank of the last task in a column, or None if the column is empty or unranked
+    def find_last_rank(self, board_id: ObjectId, column: str) -> str | None:
         docs = self.adapter.find_many(
             self.COLLECTION_NAME,
-            {"board_id": board_id, "column": column}
+            {"board_id": board_id, "column": column},
+            limit=1,
+            sort=[("rank", -1), ("_id", -1)]
+        )
+        return docs[0].get("rank") if docs else None
+
+    # Rank of the closest task before (direction=-1) or after (direction=1) the given rank in a column
+    # Both lookups are a single step along the board_column_rank index
+    def find_neighbour_rank(self, board_id: ObjectId, column: str, rank: str, direction: int) -> str | None:
+        operator = "$gt" if direction > 0 else "$lt"
+        docs = self.adapter.find_many(
+            self.COLLECTION_NAME,
+            {"board_id": board_id, "column": column, "rank": {operator: rank}},
+            limit=1,
+            sort=[("rank", direction), ("_id", direction)]
+        )
+        return docs[0].get("rank") if docs else None
+
+    # Rewrite the ranks of a column with short, evenly spaced keys, keeping the current order
+    # Only needed once repeated inserts at the same spot have made keys long
+    def rebalance_column(self, board_id: ObjectId, column: str, batch_size: int = 1000) -> int:
+        docs = list(self.adapter.iter_many(
+            self.COLLECTION_NAME,
+            {"board_id": board_id, "column": column},
+            sort=self.VIEW_SORTS["rank"],
+            projection={"_id": 1, "rank": 1}
+        ))
+        new_ranks = ranks_between(None, None, len(docs))
+        # Each key is only replaced while the task still has the rank and column it was read with,
+        # a task reordered or moved meanwhile keeps its new place
+        operations = [
+            UpdateOne({"_id": doc["_id"], "column": column, "rank": doc.get("rank")}, {"$set": {"rank": rank}})
+            for doc, rank in zip(docs, new_ranks)
+        ]
+        for start in range(0, len(operations), batch_size):
+            self.adapter.bulk_write(self.COLLECTION_NAME, operations[start:start + batch_size], ordered=False)
+        # Tasks already loaded by this command now carry stale ranks
+        forget_identity(self.COLLECTION_NAME)
+        return len(operations)
+
+    # Winning plan for a column listing, used to verify the order comes from the index
+    def explain_column(self, board_id: ObjectId, column: str, sort: str = "created") -> dict:
+        return self.adapter.explain_find(
+            self.COLLECTION_NAME,
+            {"board_id": board_id, "column": column},
+            sort=self.VIEW_SORTS[sort]
         )
-        return [Task(**{**doc, '_id': doc['_id']}) for doc in docs]
     
     def update_task(self, task_id: ObjectId, updates: dict) -> bool:
         modified = self.adapter.update_one(
@@ -36,6 +176,7 @@ class TaskRepository:
             {"_id": task_id},
             updates
         )
+        forget_identity(self.COLLECTION_NAME, task_id)
         return modified > 0
     
     def delete_task(self, task_id: ObjectId) -> bool:
@@ -43,21 +184,204 @@ class TaskRepository:
             self.COLLECTION_NAME,
             {"_id": task_id}
         )
+        forget_identity(self.COLLECTION_NAME, task_id)
         return deleted > 0
+
+    # Update a task and return the board it belongs to, or None if the task does not exist
+    # Uses a single round trip so the caller can bump the board version without re-reading the task
+    def update_task_returning_board(self, task_id: ObjectId, updates: dict) -> ObjectId | None:
+        doc = self.adapter.find_one_and_update(
+            self.COLLECTION_NAME,
+            {"_id": task_id},
+            updates,
+            projection={"board_id": 1}
+        )
+        forget_identity(self.COLLECTION_NAME, task_id)
+        return doc["board_id"] if doc else None
+
+    # Delete a task and return the board it belonged to, or None if the task does not exist
+    def delete_task_returning_board(self, task_id: ObjectId) -> ObjectId | None:
+        doc = self.adapter.find_one_and_delete(
+            self.COLLECTION_NAME,
+            {"_id": task_id},
+            projection={"board_id": 1}
+        )
+        forget_identity(self.COLLECTION_NAME, task_id)
+        return doc["board_id"] if doc else None
     
-    def search_task(self, board_id: ObjectId, keyword: str) -> list:
+    # Search tasks of a board by keyword, modes:
+    #   literal  case-insensitive substring of title or description, the keyword is escaped
+    #            so punctuation matches itself and no user pattern is ever compiled
+    #   prefix   case-insensitive title prefix, answered as a range scan on the board_title_ci index
+    #   regex    the keyword is used as a raw regular expression (explicit opt-in),
+    #            max_time_ms bounds the server time a pathological pattern can burn
+    def search_task(self, board_id: ObjectId, keyword: str, mode: str = "literal", max_time_ms: int = None) -> list:
+        if mode not in self.SEARCH_MODES:
+            raise ValueError(f"Invalid search mode. Must be one of {list(self.SEARCH_MODES)}")
+
+        if mode == "prefix":
+            # U+FFFF sorts after every other character in the collation, so this bounds the prefix range
+            docs = self.adapter.find_many(
+                self.COLLECTION_NAME,
+                {"board_id": board_id, "title": {"$gte": keyword, "$lt": keyword + "\uffff"}},
+                collation=self.TITLE_COLLATION,
+            )
+            return [Task(**{**doc, '_id': doc['_id']}) for doc in docs]
+
+        if mode == "regex":
+            try:
+                re.compile(keyword)
+            except re.error as e:
+                raise ValueError(f"Invalid regular expression: {e}")
+            pattern = keyword
+        else:
+            pattern = re.escape(keyword)
+
         docs = self.adapter.find_many(
             self.COLLECTION_NAME,
             {
                 "board_id": board_id,
                 "$or": [
-                    {"title": {"$regex": keyword, "$options": "i"}},
-                    {"description": {"$regex": keyword, "$options": "i"}}
+                    {"title": {"$regex": pattern, "$options": "i"}},
+                    {"description": {"$regex": pattern, "$options": "i"}}
                 ]
-            }
+            },
+            max_time_ms=max_time_ms if mode == "regex" else None,
         )
         return [Task(**{**doc, '_id': doc['_id']}) for doc in docs]
     
     def find_task_by_board(self, board_id: ObjectId) -> list:
         docs = self.adapter.find_many(self.COLLECTION_NAME, {"board_id": board_id})
         return [Task(**{**doc, '_id': doc['_id']}) for doc in docs]
+
+    # Filter tasks of a board on any combination of column, priority, assignee and due-date range
+    # The query runs on the server against the FILTER_INDEXES, sorted and paginated there too;
+    # the sort comes straight from an index for the combinations in SORTED_FILTER_INDEXES
+    def filter_tasks(self, board_id: ObjectId, column: str = None, priority: str = None,
+                     assigned_to: ObjectId = None, due_from=None, due_to=None,
+                     sort: str = "created", skip: int = 0, limit: int = 0) -> list:
+        query = self.build_filter_query(board_id, column, priority, assigned_to, due_from, due_to)
+        docs = self.adapter.find_many(
+            self.COLLECTION_NAME,
+            query,
+            limit=limit,
+            skip=skip,
+            sort=self._filter_sort(sort),
+            hint=self.sorted_filter_index(column, priority, assigned_to, sort),
+        )
+        return [Task(**{**doc, '_id': doc['_id']}) for doc in docs]
+
+    #----------------Bulk Writes-----------------#
+    # Each runs as one update_many/delete_many on the server, whatever the number of matching tasks.
+    # Tasks loaded earlier in the same command are dropped from the identity map, they may be stale now.
+
+    # Number of tasks matching a filter query, e.g. for a dry run
+    def count_tasks(self, query: dict) -> int:
+        return self.adapter.count_documents(self.COLLECTION_NAME, query)
+
+    # Set the same fields on every matching task, returns the number modified
+    def update_tasks(self, query: dict, updates: dict) -> int:
+        modified = self.adapter.update_many(self.COLLECTION_NAME, query, updates)
+        forget_identity(self.COLLECTION_NAME)
+        return modified
+
+    # Move every matching task into a column, after last_rank (the column's current last rank)
+    # Rank keys are only unique within a column, so the tasks are read in (column, rank) order and
+    # given fresh, evenly spaced keys after last_rank; only their ids are read, then one bulk write per batch.
+    # Each update still requires the filter, a task changed by someone else in between is left alone.
+    def move_tasks(self, query: dict, column: str, last_rank: str | None, batch_size: int = 1000) -> int:
+        # Tasks already in the target column keep their place
+        if "column" not in query:
+            query = {**query, "column": {"$ne": column}}
+        task_ids = [
+            doc["_id"] for doc in self.adapter.iter_many(
+                self.COLLECTION_NAME,
+                query,
+                sort=[("column", 1), ("rank", 1), ("_id", 1)],
+                projection={"_id": 1}
+            )
+        ]
+        new_ranks = ranks_between(last_rank, None, len(task_ids))
+        operations = [
+            UpdateOne({**query, "_id": task_id}, {"$set": {"column": column, "rank": rank}})
+            for task_id, rank in zip(task_ids, new_ranks)
+        ]
+        modified = 0
+        for start in range(0, len(operations), batch_size):
+            result = self.adapter.bulk_write(self.COLLECTION_NAME, operations[start:start + batch_size], ordered=False)
+            modified += result.modified_count
+        forget_identity(self.COLLECTION_NAME)
+        return modified
+
+    # Delete every matching task, returns the number deleted
+    def delete_tasks(self, query: dict) -> int:
+        deleted = self.adapter.delete_many(self.COLLECTION_NAME, query)
+        forget_identity(self.COLLECTION_NAME)
+        return deleted
+
+    # Winning plan for a filter, used to verify it is index-backed
+    def explain_filter(self, board_id: ObjectId, column: str = None, priority: str = None,
+                       assigned_to: ObjectId = None, due_from=None, due_to=None, sort: str = "created") -> dict:
+        query = self.build_filter_query(board_id, column, priority, assigned_to, due_from, due_to)
+        return self.adapter.explain_find(
+            self.COLLECTION_NAME, query, sort=self._filter_sort(sort),
+            hint=self.sorted_filter_index(column, priority, assigned_to, sort)
+        )
+
+    # Index that returns a filter's tasks already in sort order, or None when they are sorted in memory
+    def sorted_filter_index(self, column: str = None, priority: str = None, assigned_to: ObjectId = None,
+                            sort: str = "created") -> str | None:
+        fields = frozenset(name for name, value in [("column", column), ("priority", priority), ("assigned_to", assigned_to)] if value)
+        return self.SORTED_FILTER_INDEXES.get((fields, sort))
+
+    # Open tasks across several boards with a due date in [due_from, due_before), earliest first
+    # With board_id matched by $in, the board_due_id index yields one range scan per board already
+    # ordered by (due_date, _id), which MongoDB merges (SORT_MERGE), so no task outside the range is
+    # read and nothing is sorted in memory
+    def find_tasks_due(self, board_ids: list, due_from=None, due_before=None,
+                       exclude_column: str = "DONE", limit: int = 0) -> list:
+        due_range = {}
+        if due_from:
+            due_range["$gte"] = due_from
+        if due_before:
+            due_range["$lt"] = due_before
+        query = {"board_id": {"$in": list(board_ids)}, "due_date": due_range or {"$ne": None}}
+        if exclude_column:
+            query["column"] = {"$ne": exclude_column}
+        docs = self.adapter.find_many(
+            self.COLLECTION_NAME,
+            query,
+            limit=limit,
+            sort=[("due_date", 1), ("_id", 1)],
+            hint="board_due_id",
+        )
+        return [Task(**{**doc, '_id': doc['_id']}) for doc in docs]
+
+    # Build the MongoDB query for a filter, unset criteria are left out
+    # title matches tasks whose title contains the text, case-insensitively; it is escaped, not a regex
+    @staticmethod
+    def build_filter_query(board_id: ObjectId, column: str = None, priority: str = None,
+                           assigned_to: ObjectId = None, due_from=None, due_to=None, title: str = None) -> dict:
+        query = {"board_id": board_id}
+        if column:
+            query["column"] = column
+        if priority:
+            query["priority"] = priority
+        if assigned_to:
+            query["assigned_to"] = assigned_to
+        if due_from or due_to:
+            due_range = {}
+            if due_from:
+                due_range["$gte"] = due_from
+            if due_to:
+                due_range["$lte"] = due_to
+            query["due_date"] = due_range
+        if title:
+            query["title"] = {"$regex": re.escape(title), "$options": "i"}
+        return query
+
+    def _filter_sort(self, sort: str) -> list:
+        if sort not in self.FILTER_SORTS:
+            raise ValueError(f"Invalid sort. Must be one of {list(self.FILTER_SORTS)}")
+        return self.FILTER_SORTS[sort]
+
@@ -1,43 +1,165 @@
 from models.base_user import Members, Hashira, Boss
 from repositories.mongodb_adapter import MongoDBAdapter
+from utils.lru_cache import LRUCache
+from utils.unit_of_work import lookup_identity, track_identity, forget_identity
+from utils.password_hasher import PasswordHasher
+from config import USER_CACHE_SIZE, USER_CACHE_TTL, USER_CACHE_PASSWORD_HASHES, PASSWORD_HASH_SCHEME, PASSWORD_HASH_PARAMS
 from bson import ObjectId
-import hashlib
+import sys
+import threading
+
+# Shared by every UserRepository in the process, entries are raw documents keyed by ("id", _id) or ("username", name)
+_user_cache = LRUCache(max_size=USER_CACHE_SIZE, ttl_seconds=USER_CACHE_TTL)
+# Hit/miss counters per calling function, e.g. {"BoardService.get_board_visible_to_user": {"hits": 3, "misses": 1}}
+_call_site_stats = {}
+_call_site_lock = threading.Lock()
+# Hashes new passwords with the configured scheme and cost, verifies hashes of every supported scheme
+_password_hasher = PasswordHasher(PASSWORD_HASH_SCHEME, PASSWORD_HASH_PARAMS)
 
 #---------------User Repository-----------------#
 class UserRepository:
 
     COLLECTION_NAME = "users"
 
-    def __init__(self, adapter: MongoDBAdapter = None):
+    def __init__(self, adapter: MongoDBAdapter = None, cache: LRUCache = None, cache_password_hashes: bool = USER_CACHE_PASSWORD_HASHES):
         self.adapter = adapter or MongoDBAdapter()
+        self.cache = cache if cache is not None else _user_cache
+        # By default cached documents (and users returned from lookups) carry no password hash
+        self.cache_password_hashes = cache_password_hashes
+        # Signup relies on the unique index to detect taken usernames
+        self.adapter.create_index(self.COLLECTION_NAME, "username", unique=True, name="username_unique")
     
     def create_new_user(self, user: Members) -> ObjectId:
         doc = user.to_dict()
         user_id = self.adapter.insert_one(self.COLLECTION_NAME, doc)
+        self.invalidate_user(user_id=user_id, username=user.username)
+        forget_identity(self.COLLECTION_NAME, user_id)
         return user_id
 
-    def find_user_by_username(self, username: str) -> Members:
-        doc = self.adapter.find_one(self.COLLECTION_NAME, {"username": username})
+    # Insert many users in one unordered round trip, e.g. for a bulk import
+    # Users whose username or email is taken are skipped, see MongoDBAdapter.insert_many for the result.
+    # New ids and usernames cannot be cached yet, so unlike create_new_user nothing is invalidated
+    def create_users(self, users: list) -> dict:
+        if not users:
+            return {"inserted": 0, "duplicates": 0, "duplicate_indexes": [], "duplicate_fields": {}}
+        return self.adapter.insert_many(self.COLLECTION_NAME, [user.to_dict() for user in users], ordered=False)
+
+    # Set include_password_hash=True only to verify a password, it bypasses the cache unless hashes are cached
+    def find_user_by_username(self, username: str, include_password_hash: bool = False) -> Members:
+        doc = self._cached_lookup(
+            ("username", username),
+            {"username": username},
+            include_password_hash
+        )
         if not doc:
             return None
-        return self._instantiate_user(doc)
+        return self._to_user(doc, include_password_hash)
     
-    def find_user_by_id(self, user_id: ObjectId) -> Members:
-        doc = self.adapter.find_one(self.COLLECTION_NAME, {"_id": user_id})
+    def find_user_by_id(self, user_id: ObjectId, include_password_hash: bool = False) -> Members:
+        if not include_password_hash:
+            user = lookup_identity(self.COLLECTION_NAME, user_id)
+            if user is not None:
+                return user
+        doc = self._cached_lookup(
+            ("id", user_id),
+            {"_id": user_id},
+            include_password_hash
+        )
         if not doc:
             return None
-        return self._instantiate_user(doc)
+        return self._to_user(doc, include_password_hash)
+    
+    # Replace the stored hash of a user, e.g. to upgrade it after a login
+    def update_password_hash(self, user_id: ObjectId, password_hash: str) -> bool:
+        modified = self.adapter.update_one(self.COLLECTION_NAME, {"_id": user_id}, {"password_hash": password_hash})
+        self.invalidate_user(user_id=user_id)
+        return modified > 0
     
     # Find all users with a specific role, returns a list of user objects
     def find_user_by_role(self, role: str) -> list:
         docs = self.adapter.find_many(self.COLLECTION_NAME, {"role": role})
         return [self._instantiate_user(doc) for doc in docs]
     
+    #---------------Cache Functions-----------------#
+    # Drop cached entries of a user, call after any write to the users collection
+    def invalidate_user(self, user_id: ObjectId = None, username: str = None):
+        if user_id is not None:
+            # Removes both the id and the username entry of the cached document
+            self.cache.invalidate_matching(lambda key, doc: doc.get("_id") == user_id)
+        if username is not None:
+            self.cache.invalidate(("username", username))
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats()
+
+    # Snapshot of the per-call-site hit/miss counters
+    @staticmethod
+    def call_site_stats() -> dict:
+        with _call_site_lock:
+            return {site: dict(counts) for site, counts in _call_site_stats.items()}
+
+    # Serve a lookup from the cache, or query and cache the document (minus the hash unless allowed)
+    def _cached_lookup(self, key, query: dict, include_password_hash: bool):
+        site = self._call_site()
+        if include_password_hash and not self.cache_password_hashes:
+            # The cached copy has no hash to verify against
+            doc = self.adapter.find_one(self.COLLECTION_NAME, query)
+            self._record(site, hit=False)
+            if doc:
+                self._store(doc)
+            return doc
+
+        doc = self.cache.get(key)
+        self._record(site, hit=doc is not None)
+        if doc is None:
+            doc = self.adapter.find_one(self.COLLECTION_NAME, query)
+            if not doc:
+                return None
+            doc = self._store(doc)
+        if not include_password_hash:
+            doc = {**doc, "password_hash": None}
+        return doc
+
+    # Cache a user document under both its id and username, returns the cached form
+    def _store(self, doc: dict) -> dict:
+        cached = dict(doc) if self.cache_password_hashes else {**doc, "password_hash": None}
+        self.cache.set(("id", doc["_id"]), cached)
+        self.cache.set(("username", doc["username"]), cached)
+        return cached
+
+    # Name of the function that called find_user_by_*, e.g. "BoardService.get_board_visible_to_user"
+    @staticmethod
+    def _call_site() -> str:
+        code = sys._getframe(3).f_code
+        return getattr(code, "co_qualname", code.co_name)
+
+    @staticmethod
+    def _record(site: str, hit: bool):
+        with _call_site_lock:
+            counts = _call_site_stats.setdefault(site, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
     #---------------Helper Functions-----------------#
-    # Hash password using SHA-256
+    # Users without a password hash are shared through the unit of work's identity map
+    def _to_user(self, doc: dict, include_password_hash: bool) -> Members:
+        user = self._instantiate_user(doc)
+        if include_password_hash:
+            return user
+        return track_identity(self.COLLECTION_NAME, user)
+
+    # Hash a password with a random salt, see utils/password_hasher.py for the format
     @staticmethod
     def hash_password(password: str) -> str:
-        return hashlib.sha256(password.encode()).hexdigest()
+        return _password_hasher.hash(password)
+
+    @staticmethod
+    def verify_password(password: str, password_hash: str) -> bool:
+        return _password_hasher.verify(password, password_hash)
+
+    # True when a stored hash should be replaced, e.g. a legacy SHA-256 hash or an outdated cost
+    @staticmethod
+    def password_needs_rehash(password_hash: str) -> bool:
+        return _password_hasher.needs_rehash(password_hash)
     
     # Factory method to instantiate correct user class based on role
     @staticmethod
@@ -1,8 +1,13 @@
 from repositories.user_repository import UserRepository
 from services.licence_service import LicenceService
 from models.base_user import Members, Hashira, Boss
+from repositories.mongodb_adapter import DuplicateKeyError
 from bson import ObjectId
 import re
+import sys
+
+# Same rule as the users collection validator, compiled once for signups and bulk imports
+EMAIL_PATTERN = re.compile(r"^[^\s@]+@[^\s@]+\.[^\s@]+$")
 
 #---------------Authentication Service-----------------#
 class AuthService:
@@ -12,13 +17,14 @@ class AuthService:
         self.licence_service = licence_service or LicenceService()
     
     # Register a new user with a valid licence key (Members, Hashira, or Boss).
+    # A taken username is caught first by a cheap lookup, then the licence is claimed atomically for
+    # a pre-generated user id and the user is inserted. A username or email taken in the meantime is
+    # reported by the unique indexes, in which case the claim is released again. A claim whose user
+    # was never created (the process died in between) is freed by release_orphaned_licences in setup_schema.py.
     def signup(self, username: str, password: str, email: str = None, role: str = "Members", licence_key: str | None = None) -> tuple[ObjectId, str]:
         # Although we have the Schema, we do one more pre-validation here for fast catching errors
+        # All checks that need no database come first
 
-        # Check if user exists
-        if self.user_repo.find_user_by_username(username):
-            raise ValueError(f"User '{username}' already exists")
-        
         # Check if licence key exists
         if not licence_key:
             raise ValueError("Licence key is required to sign up")
@@ -27,44 +33,73 @@ class AuthService:
         valid_roles = ["Members", "Hashira", "Boss"]
         if role not in valid_roles:
             raise ValueError(f"Invalid role. Must be one of {valid_roles}")
-        
-        # Validate licence
-        licence = self.licence_service.get_redeemable_licence(licence_key)
-        resolved_role = licence.role
-        if role and resolved_role != role:
-            raise ValueError(f"Licence role '{resolved_role}' does not match requested role '{role}'")
 
         # Validate email early to avoid DB validator errors
-        email_pattern = r"^[^\s@]+@[^\s@]+\.[^\s@]+$"
-        if not email or not re.match(email_pattern, email):
+        if not email or not EMAIL_PATTERN.match(email):
             raise ValueError("Invalid or missing email. Please provide a valid email address.")
         
-        # Create user with the role class
+        # Checked before the claim, so a taken username does not claim and release a licence
+        if self.user_repo.find_user_by_username(username):
+            raise ValueError(f"User '{username}' already exists")
+
+        # The id is generated here so the licence can be claimed before the user exists
         password_hash = UserRepository.hash_password(password)
+        user_id = ObjectId()
+
+        # Claim the licence for the new user id, the key can only be redeemed once
+        licence = self.licence_service.claim_licence(licence_key, user_id, role)
+        resolved_role = licence.role
         
+        # Create user with the role class
         if resolved_role == "Boss":
-            user = Boss(username=username, password_hash=password_hash, email=email, role=resolved_role)
+            user = Boss(username=username, password_hash=password_hash, email=email, role=resolved_role, _id=user_id)
         elif resolved_role == "Hashira":
-            user = Hashira(username=username, password_hash=password_hash, email=email, role=resolved_role)
+            user = Hashira(username=username, password_hash=password_hash, email=email, role=resolved_role, _id=user_id)
         else:
-            user = Members(username=username, password_hash=password_hash, email=email, role=resolved_role)
+            user = Members(username=username, password_hash=password_hash, email=email, role=resolved_role, _id=user_id)
         
-        user_id = self.user_repo.create_new_user(user)
-        self.licence_service.redeem_licence(licence_key, user_id)
+        try:
+            self.user_repo.create_new_user(user)
+        except Exception as e:
+            # Compensate instead of a transaction, which would need a replica set
+            self._release_claim(licence_key, user_id)
+            if isinstance(e, DuplicateKeyError) and "email" in e.fields:
+                raise ValueError(f"Email '{email}' is already registered")
+            if isinstance(e, DuplicateKeyError):
+                raise ValueError(f"User '{username}' already exists")
+            raise
         return user_id, resolved_role
     
     # Login user and return user object
+    # Hashes of an older scheme or cost are replaced after a successful login, costing one more write
     def login(self, username: str, password: str) -> Members:
-        user = self.user_repo.find_user_by_username(username)
+        user = self.user_repo.find_user_by_username(username, include_password_hash=True)
         if not user:
             raise ValueError(f"User '{username}' not found")
         
-        password_hash = UserRepository.hash_password(password)
-        if user.password_hash != password_hash:
+        if not UserRepository.verify_password(password, user.password_hash):
             raise ValueError("Invalid password")
         
+        if UserRepository.password_needs_rehash(user.password_hash):
+            self._upgrade_password_hash(user, password)
         return user
     
+    # Store a hash with the current scheme and cost, a failure only delays the upgrade to the next login
+    def _upgrade_password_hash(self, user: Members, password: str):
+        try:
+            password_hash = UserRepository.hash_password(password)
+            self.user_repo.update_password_hash(user._id, password_hash)
+            user.password_hash = password_hash
+        except Exception as e:
+            print(f"Warning: Could not upgrade the password hash of '{user.username}': {e}", file=sys.stderr)
+
+    # Compensate a licence claim whose user could not be created
+    def _release_claim(self, licence_key: str, user_id: ObjectId):
+        try:
+            self.licence_service.release_licence(licence_key, user_id)
+        except Exception as e:
+            print(f"Warning: Could not release licence key {licence_key}: {e}", file=sys.stderr)
+
     # Get user by username
     def get_user(self, username: str) -> Members:
         # Get user by username
@@ -35,6 +35,10 @@ class BoardService:
             raise ValueError(f"Board '{name}' not found for this user")
         return board
 
+    # Current version of a board, one projected query, None if the board no longer exists
+    def get_board_version(self, board_id: ObjectId) -> int | None:
+        return self.board_repo.get_version(board_id)
+
     # Get the board by name that is visible to the current user
     # All user roles can view boards created by Boss users
     # Can be expanded in the future for more complex visibility rules
@@ -79,6 +83,8 @@ class BoardService:
         tasks = self.task_repo.find_task_by_board(board._id)
         for task in tasks:
             self.task_repo.delete_task(task._id)
+        # Task writes invalidate anything cached against the old board version
+        self.board_repo.bump_version(board._id)
 
         return self.board_repo.delete_board(board._id)
     
@@ -0,0 +1,178 @@
+import gzip
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+from bson import ObjectId, json_util
+
+from models.entities import Board, Task, PRIORITY_RANKS
+from repositories.board_repository import BoardRepository
+from repositories.task_repository import TaskRepository
+
+# zstd is optional, gzip from the standard library is always available
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bumped when the layout of an export file changes
+EXPORT_FORMAT_VERSION = 1
+COMPRESSIONS = ("none", "gzip", "zstd")
+EXTENSIONS = {"none": ".ndjson", "gzip": ".ndjson.gz", "zstd": ".ndjson.zst"}
+
+
+# Compression of a file from its extension: .gz is gzip, .zst zstd, anything else plain NDJSON
+def detect_compression(path: str) -> str:
+    lowered = path.lower()
+    if lowered.endswith(".gz"):
+        return "gzip"
+    if lowered.endswith(".zst"):
+        return "zstd"
+    return "none"
+
+
+# Open an export file for reading ("r") or writing ("w") text, compressed as requested
+# compression=None picks it from the file extension
+def open_transfer_file(path: str, mode: str, compression: str = None):
+    compression = compression or detect_compression(path)
+    if compression == "gzip":
+        # Level 6 is what the gzip tool uses, 9 costs much more CPU for a few percent
+        return gzip.open(path, f"{mode}t", encoding="utf-8", compresslevel=6)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression needs the 'zstandard' package (pip install zstandard)")
+        return zstandard.open(path, f"{mode}t", encoding="utf-8")
+    if compression == "none":
+        return open(path, mode, encoding="utf-8", newline="\n")
+    raise ValueError(f"Unknown compression '{compression}'. Must be one of {list(COMPRESSIONS)}")
+
+
+# File name for a board in a multi-board export directory, e.g. "Sprint 1" -> "Sprint_1.ndjson.gz"
+def export_file_name(board_name: str, compression: str = "none") -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", board_name).strip("_") + EXTENSIONS[compression]
+
+
+#---------------Board Transfer Service-----------------#
+# Exports a board to NDJSON and imports it back, e.g. to back up a board or move it to another database.
+# The first line is a header with the board, every further line one task as MongoDB extended JSON
+# ({"$oid": ...}, {"$date": ...}), so ids and dates survive the round trip.
+# Both directions stream: tasks are read from a cursor and written line by line, and read back line by
+# line into chunked insert_many calls, so memory stays constant whatever the board size.
+# Imported boards and tasks get new ids, so a board can be imported next to the one it was exported from.
+# Example:
+#   BoardTransferService().export_board(board, "sprint.ndjson.gz")
+#   BoardTransferService().import_board("sprint.ndjson.gz", boss._id, "Boss", name="Sprint copy")
+class BoardTransferService:
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, board_repo: BoardRepository = None, task_repo: TaskRepository = None):
+        self.task_repo = task_repo or TaskRepository()
+        self.board_repo = board_repo or BoardRepository(self.task_repo.adapter)
+
+    # Write a board and all its tasks to path, returns the number of tasks written
+    def export_board(self, board: Board, path: str, compression: str = None, batch_size: int = BATCH_SIZE) -> int:
+        header = {
+            "type": "board",
+            "format": EXPORT_FORMAT_VERSION,
+            "exported_at": datetime.now(timezone.utc),
+            "board": board.to_dict(),
+        }
+        count = 0
+        # Write next to the target first, so a failed export never leaves a truncated file behind
+        temporary_path = f"{path}.tmp"
+        try:
+            with open_transfer_file(temporary_path, "w", compression or detect_compression(path)) as f:
+                f.write(_encode(header))
+                for doc in self.task_repo.iter_task_documents(board._id, batch_size=batch_size):
+                    f.write(_encode(doc))
+                    count += 1
+            os.replace(temporary_path, path)
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+        return count
+
+    # Export several boards to a directory, in parallel across a process pool when workers > 1
+    # Each process opens its own connection; returns {board name: number of tasks}
+    def export_boards(self, boards: list, directory: str, compression: str = "none", workers: int = None) -> dict:
+        os.makedirs(directory, exist_ok=True)
+        jobs = [(board, os.path.join(directory, export_file_name(board.name, compression)), compression) for board in boards]
+        workers = min(workers or os.cpu_count() or 1, len(jobs))
+        if workers <= 1:
+            return {board.name: self.export_board(board, path, compression) for board, path, compression in jobs}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            counts = pool.map(_export_in_worker, *zip(*jobs))
+            return {board.name: count for (board, _, _), count in zip(jobs, counts)}
+
+    # Create a new board owned by owner_id from an export file, returns (board id, number of tasks)
+    # name defaults to the exported board's name and must not be taken by another board of the owner
+    def import_board(self, path: str, owner_id: ObjectId, user_role: str, name: str = None,
+                     batch_size: int = BATCH_SIZE) -> tuple:
+        # Importing creates a board, which only the Boss can do
+        if user_role != "Boss":
+            raise PermissionError(f"User role '{user_role}' cannot import boards. Only 'Boss' can.")
+
+        with open_transfer_file(path, "r") as f:
+            header = _decode(f.readline(), 1)
+            if header.get("type") != "board" or header.get("format") != EXPORT_FORMAT_VERSION:
+                raise ValueError(f"'{path}' is not a board export (format {EXPORT_FORMAT_VERSION})")
+            exported = header["board"]
+            name = name or exported["name"]
+            if self.board_repo.find_board_by_name(name, owner_id):
+                raise ValueError(f"Board '{name}' already exists")
+
+            board_id = self.board_repo.create_board(Board(name=name, owner_id=owner_id, columns=exported.get("columns")))
+            imported = 0
+            # Line 1 was the header, so task lines start at 2
+            lines = enumerate(f, start=2)
+            try:
+                while True:
+                    batch = list(islice(lines, max(1, batch_size)))
+                    if not batch:
+                        break
+                    chunk = [self._imported_task(line, number, board_id) for number, line in batch if line.strip()]
+                    if chunk:
+                        imported += len(self.task_repo.create_tasks(chunk))
+            except Exception:
+                # Compensate instead of a transaction: an invalid line leaves no half-imported board behind
+                self.task_repo.delete_tasks({"board_id": board_id})
+                self.board_repo.delete_board(board_id)
+                raise
+        self.board_repo.bump_version(board_id)
+        return board_id, imported
+
+    #----------------Helper Functions-----------------#
+    # Validate an exported task through the Task entity and give it a new id on the new board
+    @staticmethod
+    def _imported_task(line: str, number: int, board_id: ObjectId) -> Task:
+        doc = _decode(line, number)
+        # Task falls back to medium for an unknown priority, create_task rejects it instead
+        if doc.get("priority", "medium") not in PRIORITY_RANKS:
+            raise ValueError(f"Invalid task on line {number}: Priority must be 'high', 'medium', or 'low'")
+        try:
+            return Task(**{**doc, "_id": ObjectId(), "board_id": board_id})
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid task on line {number}: {e}")
+
+
+# One line of extended JSON; json.dumps with json_util.default keeps the C encoder for plain values
+def _encode(doc: dict) -> str:
+    return json.dumps(doc, default=json_util.default, separators=(",", ":")) + "\n"
+
+
+def _decode(line: str, number: int) -> dict:
+    try:
+        doc = json.loads(line, object_hook=json_util.object_hook)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON on line {number}: {e}")
+    if not isinstance(doc, dict):
+        raise ValueError(f"Line {number} is not a JSON object")
+    return doc
+
+
+# Runs in a pool process, which needs its own MongoClient
+def _export_in_worker(board: Board, path: str, compression: str) -> int:
+    return BoardTransferService().export_board(board, path, compression)
@@ -0,0 +1,198 @@
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from repositories.licence_repository import LicenceRepository
+from utils.bloom_filter import BloomFilter
+from config import (
+    LICENCE_FILTER_ENABLED, LICENCE_FILTER_CAPACITY, LICENCE_FILTER_ERROR_RATE,
+    LICENCE_FILTER_REFRESH, LICENCE_FILTER_SNAPSHOT,
+)
+
+#----------------Licence Key Filter-----------------#
+# In-process Bloom filter of every licence key, checked before the licences collection is queried.
+# A key the filter has never seen certainly does not exist, so typos and guessed keys cost no round trip;
+# a key it reports as present is still looked up, so a false positive only costs the usual query.
+# Licences created by other processes are caught up with one query on the _id index every refresh_seconds,
+# and before a key is rejected (see might_contain), and the filter is saved to a snapshot file so the next start does not have to scan every key.
+# Deleted licences stay in the filter, which is harmless for the same reason as false positives.
+class LicenceKeyFilter:
+
+    # Catch-up queries start this far before the last one, so keys inserted with slightly
+    # older client-generated ObjectIds (clock skew, slow batches) are not missed
+    CATCH_UP_MARGIN = timedelta(minutes=5)
+    # Misses catch up at most this often, so a flood of guessed keys costs one small query per second
+    MISS_CATCH_UP_SECONDS = 1.0
+
+    def __init__(self, licence_repo: LicenceRepository, capacity: int = LICENCE_FILTER_CAPACITY,
+                 error_rate: float = LICENCE_FILTER_ERROR_RATE, refresh_seconds: float = LICENCE_FILTER_REFRESH,
+                 snapshot_path: str = LICENCE_FILTER_SNAPSHOT):
+        self.licence_repo = licence_repo
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_seconds = refresh_seconds
+        self.snapshot_path = snapshot_path
+        self.bloom = None
+        self._watermark = None     # ObjectId from which the next catch-up reads
+        self._latest_id = None     # highest licence id read by a catch-up, where a miss catches up from
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.passed = 0
+
+    # Load the snapshot or scan the keys now instead of on the first check, e.g. at startup
+    def warm_up(self):
+        with self._lock:
+            self._ensure_current()
+
+    # False means the key certainly does not exist, True that it has to be looked up
+    # A miss first catches up on keys created by other processes after the newest licence read (at most
+    # once every MISS_CATCH_UP_SECONDS), so a key generated elsewhere is not rejected for refresh_seconds
+    def might_contain(self, key: str) -> bool:
+        with self._lock:
+            self._ensure_current()
+            present = key in self.bloom
+            if not present and time.monotonic() - self._refreshed_at >= self.MISS_CATCH_UP_SECONDS:
+                if self._catch_up_latest():
+                    self._save_snapshot()
+                self._refreshed_at = time.monotonic()
+                present = key in self.bloom
+            if present:
+                self.passed += 1
+            else:
+                self.rejected += 1
+        return present
+
+    # Record keys created by this process, so they pass before the next catch-up
+    def add(self, keys):
+        with self._lock:
+            if self.bloom is not None:
+                self.bloom.update([keys] if isinstance(keys, str) else keys)
+
+    # Forget every key and delete the snapshot, the next check rebuilds the filter from the collection
+    # Needed when licences appear with old ids that no catch-up would read, e.g. after a restore
+    def reset(self):
+        with self._lock:
+            self.bloom = None
+            self._watermark = None
+            self._latest_id = None
+            if self.snapshot_path and os.path.exists(self.snapshot_path):
+                try:
+                    os.remove(self.snapshot_path)
+                except OSError:
+                    pass
+
+    # Size, accuracy and how many lookups the filter answered on its own
+    def stats(self) -> dict:
+        with self._lock:
+            stats = self.bloom.stats() if self.bloom is not None else {}
+        return {**stats, "rejected": self.rejected, "passed": self.passed}
+
+    #----------------Helper Functions-----------------#
+    # Load or build the filter on first use, then catch up on new licences when the refresh interval passed
+    def _ensure_current(self):
+        if self.bloom is None:
+            if not self._load_snapshot():
+                self._rebuild()
+                self._save_snapshot()
+            self._refreshed_at = time.monotonic()
+        if time.monotonic() - self._refreshed_at >= self.refresh_seconds:
+            if self._catch_up():
+                self._save_snapshot()
+            self._refreshed_at = time.monotonic()
+
+    # Scan every key into a new filter
+    def _rebuild(self):
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        watermark = self._next_watermark()
+        bloom.update(self.licence_repo.iter_keys())
+        self.bloom, self._watermark, self._latest_id = bloom, watermark, None
+
+    # Add the keys of licences created since the last scan, returns the number of keys new to the filter
+    # Reads from CATCH_UP_MARGIN before the last scan, so keys with slightly older ids are found here
+    def _catch_up(self) -> int:
+        watermark = self._next_watermark()
+        added = self._add_keys_since(self._watermark)
+        self._watermark = watermark
+        return added
+
+    # Catch-up of a miss: only licences from the newest one read so far, so repeated misses after a
+    # bulk seed do not read the whole margin window again; keys with older ids wait for _catch_up
+    def _catch_up_latest(self) -> int:
+        if self._latest_id is None:
+            return self._catch_up()
+        return self._add_keys_since(self._latest_id)
+
+    def _add_keys_since(self, since_id: ObjectId) -> int:
+        added = 0
+        for licence_id, key in self.licence_repo.iter_keys(since_id=since_id, with_ids=True):
+            if self.bloom.add(key):
+                added += 1
+            if self._latest_id is None or licence_id > self._latest_id:
+                self._latest_id = licence_id
+        return added
+
+    def _next_watermark(self) -> ObjectId:
+        return ObjectId.from_datetime(datetime.now(timezone.utc) - self.CATCH_UP_MARGIN)
+
+    # Snapshot file: the 12-byte watermark followed by the serialized filter
+    # A missing, corrupt or differently sized snapshot is ignored and the filter rebuilt
+    def _load_snapshot(self) -> bool:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                data = f.read()
+            watermark, bloom = ObjectId(data[:12]), BloomFilter.from_bytes(data[12:])
+        except (OSError, ValueError, TypeError):
+            return False
+        if bloom.capacity != self.capacity or bloom.error_rate != self.error_rate:
+            return False
+        self.bloom, self._watermark, self._latest_id = bloom, watermark, None
+        self._catch_up()
+        return True
+
+    def _save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+            # Write to a temporary file first, so a crash never leaves a half-written snapshot
+            temporary_path = f"{self.snapshot_path}.tmp"
+            with open(temporary_path, "wb") as f:
+                f.write(self._watermark.binary + self.bloom.to_bytes())
+            os.replace(temporary_path, self.snapshot_path)
+        except OSError as e:
+            print(f"Warning: Could not save the licence key filter: {e}", file=sys.stderr)
+
+
+# Shared by every LicenceService in the process when LICENCE_FILTER_ENABLED is set
+_shared_filter = None
+_shared_filter_lock = threading.Lock()
+
+
+# The process-wide licence key filter, or None when the filter is disabled
+def get_shared_licence_filter(licence_repo: LicenceRepository) -> LicenceKeyFilter | None:
+    global _shared_filter
+    if not LICENCE_FILTER_ENABLED:
+        return None
+    with _shared_filter_lock:
+        if _shared_filter is None:
+            _shared_filter = LicenceKeyFilter(licence_repo)
+        return _shared_filter
+
+
+# Reset the process-wide filter and delete its snapshot, which later processes would otherwise load
+# The snapshot is deleted even when the filter is disabled here, another run may have it enabled
+def reset_shared_licence_filter():
+    with _shared_filter_lock:
+        key_filter = _shared_filter
+    if key_filter is not None:
+        key_filter.reset()
+    elif LICENCE_FILTER_SNAPSHOT and os.path.exists(LICENCE_FILTER_SNAPSHOT):
+        try:
+            os.remove(LICENCE_FILTER_SNAPSHOT)
+        except OSError:
+            pass
@@ -1,4 +1,5 @@
 from repositories.licence_repository import LicenceRepository
+from services.licence_key_filter import LicenceKeyFilter, get_shared_licence_filter
 from models.entities import Licence
 from bson import ObjectId
 
@@ -6,14 +7,19 @@ from bson import ObjectId
 class LicenceService:
     
     VALID_FORMAT = "AAAA-BBBB-CCCC-DDDD"
+    VALID_ROLES = ("Members", "Hashira", "Boss")
     
-    def __init__(self, licence_repo: LicenceRepository = None):
+    def __init__(self, licence_repo: LicenceRepository = None, key_filter: LicenceKeyFilter = None):
         self.licence_repo = licence_repo or LicenceRepository()
+        # Optional pre-check that rejects unknown keys without a query, shared by the process when enabled
+        self.key_filter = key_filter if key_filter is not None else get_shared_licence_filter(self.licence_repo)
     
     # Check if licence key is valid
     def validate_licence(self, key: str) -> bool:
         if not self._is_valid_format(key):
             raise ValueError(f"Invalid licence format. Expected: {self.VALID_FORMAT}")
+        if not self._might_exist(key):
+            return False
         
         return self.licence_repo.validate_licence(key)
 
@@ -22,7 +28,7 @@ class LicenceService:
         if not self._is_valid_format(key):
             raise ValueError(f"Invalid licence format. Expected: {self.VALID_FORMAT}")
 
-        licence = self.licence_repo.find_licence_by_key(key)
+        licence = self.licence_repo.find_licence_by_key(key) if self._might_exist(key) else None
         if not licence:
             raise ValueError("Licence key not found")
         if licence.owner_id is not None:
@@ -35,19 +41,113 @@ class LicenceService:
         if not updated:
             raise ValueError("Failed to claim licence key; it may have been used")
 
+    # Claim an unused licence of the requested role for a user that is about to be created
+    # The claim is a single atomic update, so two signups can never redeem the same key
+    # On failure one more lookup explains why, the successful path costs one round trip
+    def claim_licence(self, key: str, owner_id: ObjectId, role: str) -> Licence:
+        if not self._is_valid_format(key):
+            raise ValueError(f"Invalid licence format. Expected: {self.VALID_FORMAT}")
+        if not self._might_exist(key):
+            raise ValueError("Licence key not found")
+
+        licence = self.licence_repo.claim_licence(key, owner_id, role)
+        if licence:
+            return licence
+        existing = self.licence_repo.find_licence_by_key(key)
+        if not existing:
+            raise ValueError("Licence key not found")
+        if existing.owner_id is not None:
+            raise ValueError("Licence key has already been used")
+        raise ValueError(f"Licence role '{existing.role}' does not match requested role '{role}'")
+
+    # Claim many licences at once, e.g. for a bulk user import, in two round trips for the whole batch
+    # claims is a list of (key, owner_id, role), role None accepts the licence's own role
+    # Returns one (licence, None) or (None, error message) per claim, in the same order
+    def claim_licences(self, claims: list) -> list:
+        results = [None] * len(claims)
+        to_claim = []
+        for index, (key, owner_id, role) in enumerate(claims):
+            if not self._is_valid_format(key):
+                results[index] = (None, f"Invalid licence format. Expected: {self.VALID_FORMAT}")
+            elif not self._might_exist(key):
+                results[index] = (None, "Licence key not found")
+            else:
+                to_claim.append(index)
+
+        licences = self.licence_repo.claim_licences([claims[index] for index in to_claim])
+        for index in to_claim:
+            key, owner_id, role = claims[index]
+            licence = licences.get(key)
+            if licence is None:
+                results[index] = (None, "Licence key not found")
+            elif licence.owner_id == owner_id:
+                results[index] = (licence, None)
+            elif licence.owner_id is not None:
+                results[index] = (None, "Licence key has already been used")
+            else:
+                results[index] = (None, f"Licence role '{licence.role}' does not match requested role '{role}'")
+        return results
+
+    # Give back claims made by claim_licences, claims is a list of (key, owner_id)
+    def release_licences(self, claims: list) -> int:
+        return self.licence_repo.release_licences(claims)
+
+    # Give a claimed licence back, e.g. when creating the user failed after the claim
+    def release_licence(self, key: str, owner_id: ObjectId) -> bool:
+        return self.licence_repo.release_licence(key, owner_id)
+
     # Creating licences
     def create_licence(self, key: str, owner_id: 'ObjectId' = None, role: str = "Members") -> 'ObjectId':
+        licence = self.build_licence(key, owner_id, role)
+        licence_id = self.licence_repo.create_licence(licence)
+        if self.key_filter is not None:
+            self.key_filter.add(key)
+        return licence_id
+
+    # Validate a licence without storing it, e.g. to collect a batch for create_licences
+    def build_licence(self, key: str, owner_id: ObjectId = None, role: str = "Members") -> Licence:
         if not self._is_valid_format(key):
-            raise ValueError(f"Invalid licence format. Expected: {{self.VALID_FORMAT}}")
+            raise ValueError(f"Invalid licence format. Expected: {self.VALID_FORMAT}")
+
+        if role not in self.VALID_ROLES:
+            raise ValueError(f"Invalid role. Must be one of {list(self.VALID_ROLES)}")
+        return Licence(key=key, owner_id=owner_id, role=role)
+
+    # Store a batch of licences built with build_licence in one round trip
+    # Keys that already exist are skipped, returns {"inserted": n, "duplicates": n, "duplicate_indexes": [...]}
+    def create_licences(self, licences: list) -> dict:
+        result = self.licence_repo.create_licences(licences)
+        if self.key_filter is not None:
+            self.key_filter.add([licence.key for licence in licences])
+        return result
 
-        valid_roles = ["Members", "Hashira", "Boss"]
-        if role not in valid_roles:
-            raise ValueError(f"Invalid role. Must be one of {{valid_roles}}")
-        from models.entities import Licence
-        licence = Licence(key=key, owner_id=owner_id, role=role)
-        return self.licence_repo.create_licence(licence)
+    # Set aside the next free licence of a role, e.g. to hand its key to a new customer
+    # Raises ValueError when every licence of the role is claimed or reserved
+    def reserve_licence(self, role: str, reserved_for: str = None) -> Licence:
+        if role not in self.VALID_ROLES:
+            raise ValueError(f"Invalid role. Must be one of {list(self.VALID_ROLES)}")
+        licence = self.licence_repo.reserve_next_licence(role, reserved_for)
+        if not licence:
+            raise ValueError(f"No free '{role}' licences left")
+        return licence
+
+    # Claimed/unclaimed/reserved counts for every role, only the Boss may see them
+    def licence_stats(self, user_role: str) -> dict:
+        if user_role != "Boss":
+            raise PermissionError(f"User role '{user_role}' cannot view licence statistics. Only 'Boss' can.")
+        stats = self.licence_repo.licence_stats()
+        empty = {"claimed": 0, "unclaimed": 0, "reserved": 0}
+        return {role: stats.get(role, empty) for role in self.VALID_ROLES}
+
+    # Hit counts and accuracy of the key filter, or None when it is disabled
+    def key_filter_stats(self) -> dict | None:
+        return self.key_filter.stats() if self.key_filter is not None else None
 
     #----------------Helper Functions-----------------#
+    # False only when the key filter knows the key does not exist
+    def _might_exist(self, key: str) -> bool:
+        return self.key_filter is None or self.key_filter.might_contain(key)
+
     @staticmethod
     def _is_valid_format(key: str) -> bool:
         """Check licence key format AAAA-BBBB-CCCC-DDDD."""
@@ -1,27 +1,74 @@
 from repositories.task_repository import TaskRepository
+from repositories.board_repository import BoardRepository
+from utils.lru_cache import LRUCache
+from config import SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, SEARCH_REGEX_MAX_TIME_MS
+from models.entities import Task, parse_due_date
 from bson import ObjectId
 
+# Shared by every SearchService in the process, so repeated searches in a REPL session hit the cache
+_search_cache = LRUCache(max_size=SEARCH_CACHE_SIZE, ttl_seconds=SEARCH_CACHE_TTL)
+
 #---------------Search Service-----------------#
 class SearchService:
     
-    def __init__(self, task_repo: TaskRepository = None):
+    def __init__(self, task_repo: TaskRepository = None, board_repo: BoardRepository = None, cache: LRUCache = None):
         self.task_repo = task_repo or TaskRepository()
+        self.board_repo = board_repo or BoardRepository(self.task_repo.adapter)
+        self.cache = cache if cache is not None else _search_cache
     
     # Search tasks by keyword in title or description
-    def search_tasks(self, board_id: ObjectId, keyword: str) -> list:
-        return self.task_repo.search_task(board_id, keyword)
+    # mode is "literal" (default), "prefix" or "regex", see TaskRepository.search_task
+    # Results are cached per board version; any task write bumps the version, so a hit is never stale
+    def search_tasks(self, board_id: ObjectId, keyword: str, mode: str = "literal") -> list:
+        version = self.board_repo.get_version(board_id)
+        if version is None:
+            # Unknown board, nothing worth caching
+            return self._run_search(board_id, keyword, mode)
+
+        # Literal and prefix searches are case-insensitive, so keywords differing only in case share one entry
+        # Regex patterns are kept as typed because case changes their meaning (e.g. \s and \S)
+        normalized = keyword if mode == "regex" else keyword.lower()
+        cache_key = (board_id, mode, normalized, version)
+        docs = self.cache.get(cache_key)
+        if docs is None:
+            results = self._run_search(board_id, keyword, mode)
+            # Documents are cached rather than the tasks, so a caller changing a result cannot change later hits
+            self.cache.set(cache_key, tuple(task.to_dict() for task in results))
+            return results
+        return [Task(**doc) for doc in docs]
+
+    # Filter tasks on any combination of column, priority, assignee and due-date range (YYYY-MM-DD, inclusive)
+    # Filtering, sorting and pagination all happen in the database on compound indexes
+    def filter_tasks(self, board_id: ObjectId, column: str = None, priority: str = None,
+                     assignee_id: ObjectId = None, due_from: str = None, due_to: str = None,
+                     sort: str = "created", page: int = 1, page_size: int = 50) -> list:
+        if column:
+            column = column.upper()
+            valid_columns = ["TODO", "DOING", "DONE"]
+            if column not in valid_columns:
+                raise ValueError(f"Invalid column. Must be one of {valid_columns}")
+        if priority and priority not in ["high", "medium", "low"]:
+            raise ValueError("Priority must be 'high', 'medium', or 'low'")
+        due_from = parse_due_date(due_from)
+        due_to = parse_due_date(due_to)
+        if page < 1 or page_size < 1:
+            raise ValueError("Page and page size must be positive numbers")
+
+        return self.task_repo.filter_tasks(
+            board_id,
+            column=column,
+            priority=priority,
+            assigned_to=assignee_id,
+            due_from=due_from,
+            due_to=due_to,
+            sort=sort,
+            skip=(page - 1) * page_size,
+            limit=page_size,
+        )
+
+    # Hit/miss/eviction counters of the search cache
+    def cache_stats(self) -> dict:
+        return self.cache.stats()
 
-#----------Not currenly used, but could implemented in the future----------#
-#   Filter tasks by column (status) and assignee
-#    def filter_tasks(self, board_id: ObjectId, status: str = None, 
-#                    assignee_id: ObjectId = None) -> list:
-#        all_tasks = self.task_repo.find_task_by_board(board_id)
-#
-#        filtered = all_tasks
-#       if status:
-#            normalized_status = status.upper()
-#            filtered = [t for t in filtered if t.column == normalized_status]
-#        if assignee_id:
-#            filtered = [t for t in filtered if t.assigned_to == assignee_id]
-#        
-#        return filtered
\ No newline at end of file
+    def _run_search(self, board_id: ObjectId, keyword: str, mode: str) -> list:
+        return self.task_repo.search_task(board_id, keyword, mode=mode, max_time_ms=SEARCH_REGEX_MAX_TIME_MS)
@@ -0,0 +1,148 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from models.base_user import USER_CLASSES, Members
+from repositories.user_repository import UserRepository
+from config import SESSION_FILE, SESSION_SECRET, SESSION_TTL, SESSION_REVALIDATE
+
+#---------------Session Service-----------------#
+# Keeps the logged-in user in a signed, expiring token file, so a new run of the CLI can resume
+# the session instead of logging in again (a user lookup plus a slow password hash).
+# The token carries the user's id, name, email and role, so resuming needs no database round trip;
+# only once every revalidate_seconds one lookup confirms the user still exists with the same role.
+# Token: base64url(JSON payload) "." HMAC-SHA256 of the payload, keyed with SESSION_SECRET or
+# a random key stored next to the session file. Both files are readable by their owner only.
+# Example:
+#   SessionService().start(user)       # after login
+#   user = SessionService().resume()   # in a later run, None when there is no valid session
+class SessionService:
+
+    def __init__(self, user_repo: UserRepository = None, path: str = SESSION_FILE, secret: str = SESSION_SECRET,
+                 ttl_seconds: float = SESSION_TTL, revalidate_seconds: float = SESSION_REVALIDATE):
+        # Created on first revalidation, so resuming a fresh token does not touch the database
+        self._user_repo = user_repo
+        self.path = path
+        self.secret = secret
+        self.ttl_seconds = ttl_seconds
+        self.revalidate_seconds = revalidate_seconds
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and bool(self.path)
+
+    # Save a session for a user that just logged in
+    def start(self, user: Members):
+        if not self.enabled:
+            return
+        now = time.time()
+        self._write({
+            "user_id": str(user._id),
+            "username": user.username,
+            "email": user.email,
+            "role": user.role,
+            "issued_at": now,
+            "expires_at": now + self.ttl_seconds,
+            "checked_at": now,
+        })
+
+    # Return the user of the saved session, or None when there is none or it is no longer valid
+    # A session whose user was deleted or changed role is ended, the user has to log in again
+    def resume(self) -> Members | None:
+        if not self.enabled:
+            return None
+        payload = self._read()
+        if payload is None:
+            return None
+        now = time.time()
+        if now >= payload["expires_at"]:
+            self.end()
+            return None
+
+        if now - payload["checked_at"] >= self.revalidate_seconds:
+            stored = self.user_repo.find_user_by_id(ObjectId(payload["user_id"]))
+            if stored is None or stored.role != payload["role"] or stored.username != payload["username"]:
+                self.end()
+                return None
+            payload["email"] = stored.email
+            payload["checked_at"] = now
+            self._write(payload)
+
+        user_class = USER_CLASSES.get(payload["role"], Members)
+        return user_class(
+            username=payload["username"],
+            password_hash=None,
+            email=payload["email"],
+            role=payload["role"],
+            _id=ObjectId(payload["user_id"]),
+        )
+
+    # Forget the saved session, e.g. on signout
+    def end(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    @property
+    def user_repo(self) -> UserRepository:
+        if self._user_repo is None:
+            self._user_repo = UserRepository()
+        return self._user_repo
+
+    #----------------Helper Functions-----------------#
+    def _write(self, payload: dict):
+        body = base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+        try:
+            _write_private(self.path, f"{body}.{self._sign(body)}".encode())
+        except OSError as e:
+            print(f"Warning: Could not save the session: {e}", file=sys.stderr)
+
+    # The payload of a token with a valid signature, or None; a tampered or corrupt file is ignored
+    def _read(self) -> dict | None:
+        try:
+            with open(self.path, "r", encoding="ascii") as f:
+                body, signature = f.read().strip().split(".")
+            if not hmac.compare_digest(signature, self._sign(body)):
+                return None
+            payload = json.loads(base64.urlsafe_b64decode(body))
+            ObjectId(payload["user_id"])
+            payload["expires_at"], payload["checked_at"] = float(payload["expires_at"]), float(payload["checked_at"])
+            return payload
+        except (OSError, ValueError, KeyError, TypeError, InvalidId):
+            return None
+
+    def _sign(self, body: str) -> str:
+        return hmac.new(self._key(), body.encode(), hashlib.sha256).hexdigest()
+
+    # The signing key: SESSION_SECRET, or a random key created once next to the session file
+    def _key(self) -> bytes:
+        if self.secret:
+            return self.secret.encode()
+        key_path = f"{self.path}.key"
+        try:
+            with open(key_path, "rb") as f:
+                key = f.read()
+            if len(key) >= 32:
+                return key
+        except OSError:
+            pass
+        key = os.urandom(32)
+        _write_private(key_path, key)
+        return key
+
+
+# Write a file only its owner can read, replacing it atomically
+def _write_private(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary_path = f"{path}.tmp"
+    fd = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(temporary_path, path)
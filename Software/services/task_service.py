@@ -1,12 +1,22 @@
 from repositories.task_repository import TaskRepository
-from models.entities import Task
+from repositories.board_repository import BoardRepository
+from models.entities import Task, parse_due_date, PRIORITY_RANKS
+from utils.rank_keys import rank_between, ranks_between
+from config import RANK_REBALANCE_LENGTH
 from bson import ObjectId
+from datetime import datetime, timedelta
 
 #---------------Task Service-----------------#
 class TaskService:
+
+    # Filters accepted by the bulk changes and the fields edit_tasks may set on many tasks at once
+    BULK_FILTERS = ("column", "priority", "assignee_id", "due_from", "due_to", "title")
+    BULK_EDIT_FIELDS = ("description", "priority", "due_date", "assigned_to")
     
-    def __init__(self, task_repo: TaskRepository = None):
+    def __init__(self, task_repo: TaskRepository = None, board_repo: BoardRepository = None):
         self.task_repo = task_repo or TaskRepository()
+        # Share the task repository's connection, the board repository is only used to bump versions
+        self.board_repo = board_repo or BoardRepository(self.task_repo.adapter)
     
     def create_task(self, title: str, board_id: ObjectId, column: str,
                    user_role: str, description: str = None, due_date: str = None,
@@ -26,19 +36,68 @@ class TaskService:
             due_date=due_date,
             priority=priority
         )
-        return self.task_repo.create_task(task)
+        # New cards go to the bottom of their column
+        task.rank = rank_between(self.task_repo.find_last_rank(board_id, task.column), None)
+        task_id = self.task_repo.create_task(task)
+        self.board_repo.bump_version(board_id)
+        return task_id
+    
+    # Create many tasks on one board with a single insert, e.g. consecutive add-task lines of a script
+    # tasks holds create_task keyword arguments (title, column, description, due_date, priority).
+    # Every task is validated before anything is written; new cards go to the bottom of their
+    # column in list order, with one rank lookup per column and one version bump for the batch.
+    def create_tasks(self, board_id: ObjectId, tasks: list, user_role: str) -> list:
+        if user_role not in ["Hashira", "Boss"]:
+            raise PermissionError(f"User role '{user_role}' cannot create tasks. Only 'Hashira' or 'Boss' can.")
+        
+        new_tasks = []
+        for spec in tasks:
+            priority = spec.get("priority", "medium")
+            if priority not in ["high", "medium", "low"]:
+                raise ValueError("Priority must be 'high', 'medium', or 'low'")
+            new_tasks.append(Task(
+                title=spec["title"],
+                board_id=board_id,
+                column=spec.get("column", "TODO"),
+                description=spec.get("description"),
+                due_date=spec.get("due_date"),
+                priority=priority
+            ))
+        if not new_tasks:
+            return []
+        
+        by_column = {}
+        for task in new_tasks:
+            by_column.setdefault(task.column, []).append(task)
+        for column, column_tasks in by_column.items():
+            ranks = ranks_between(self.task_repo.find_last_rank(board_id, column), None, len(column_tasks))
+            for task, rank in zip(column_tasks, ranks):
+                task.rank = rank
+        task_ids = self.task_repo.create_tasks(new_tasks)
+        self.board_repo.bump_version(board_id)
+        return task_ids
     
     def get_task_by_id(self, task_id: ObjectId) -> Task:
         return self.task_repo.find_task_by_id(task_id)
     
-    def list_tasks_in_column(self, board_id: ObjectId, column: str) -> list:
-        return self.task_repo.find_task_by_column(board_id, column.upper())
+    # sort is "created", "priority" or "due"; the order comes from an index, not an in-memory sort
+    def list_tasks_in_column(self, board_id: ObjectId, column: str, sort: str = "created") -> list:
+        return self.task_repo.find_task_by_column(board_id, column.upper(), sort)
+
+    # Same as list_tasks_in_column but yields tasks as they arrive from the database, at most limit of them
+    def iter_tasks_in_column(self, board_id: ObjectId, column: str, sort: str = "created", limit: int = 0):
+        return self.task_repo.iter_tasks_by_column(board_id, column.upper(), sort, limit=limit)
+
+    # Number of tasks in each column of a board, e.g. to show how many a capped view left out
+    def count_tasks_by_column(self, board_id: ObjectId) -> dict:
+        return self.task_repo.count_tasks_by_column(board_id)
     
     def edit_task(self, task_id: ObjectId, updates: dict, user_role: str) -> bool:
         if user_role not in ["Hashira", "Boss"]:
             raise PermissionError(f"User role '{user_role}' cannot edit tasks. Only 'Hashira' or 'Boss' can.")
         
-        return self.task_repo.update_task(task_id, updates)
+        board_id = self.task_repo.update_task_returning_board(task_id, self._normalize_updates(updates))
+        return self._touch_board(board_id)
     
     def move_task(self, task_id: ObjectId, new_column: str, user_role: str) -> bool:
         if user_role not in ["Hashira", "Boss"]:
@@ -49,10 +108,190 @@ class TaskService:
         if normalized_column not in valid_columns:
             raise ValueError(f"Invalid column. Must be one of {valid_columns}")
 
-        return self.task_repo.update_task(task_id, {"column": normalized_column})
+        task = self.task_repo.find_task_by_id(task_id)
+        if not task:
+            return False
+        updates = {"column": normalized_column}
+        if task.column != normalized_column:
+            # Moved cards go to the bottom of the target column
+            updates["rank"] = rank_between(self.task_repo.find_last_rank(task.board_id, normalized_column), None)
+        board_id = self.task_repo.update_task_returning_board(task_id, updates)
+        return self._touch_board(board_id)
+
+    # Place a task directly before or after another task (the anchor), taking the anchor's column
+    # Only the moved task is written: it gets a fractional rank between the anchor and its neighbour
+    def reorder_task(self, task_id: ObjectId, user_role: str, before_id: ObjectId = None, after_id: ObjectId = None) -> bool:
+        if user_role not in ["Hashira", "Boss"]:
+            raise PermissionError(f"User role '{user_role}' cannot move tasks. Only 'Hashira' or 'Boss' can.")
+        if (before_id is None) == (after_id is None):
+            raise ValueError("Specify exactly one task to place this task before or after")
+
+        anchor_id = before_id if before_id is not None else after_id
+        if anchor_id == task_id:
+            raise ValueError("A task cannot be placed relative to itself")
+        task = self.task_repo.find_task_by_id(task_id)
+        anchor = self.task_repo.find_task_by_id(anchor_id)
+        if not task or not anchor:
+            raise ValueError("Task not found")
+        if task.board_id != anchor.board_id:
+            raise ValueError("Tasks must be on the same board")
+
+        if anchor.rank is None:
+            # Column predates manual ordering, give it ranks first
+            self.task_repo.rebalance_column(anchor.board_id, anchor.column)
+            anchor = self.task_repo.find_task_by_id(anchor_id)
+
+        if before_id is not None:
+            low = self.task_repo.find_neighbour_rank(anchor.board_id, anchor.column, anchor.rank, -1)
+            high = anchor.rank
+        else:
+            low = anchor.rank
+            high = self.task_repo.find_neighbour_rank(anchor.board_id, anchor.column, anchor.rank, 1)
+
+        neighbour = low if before_id is not None else high
+        if task.column == anchor.column and task.rank is not None and task.rank == neighbour:
+            # Already next to the anchor, nothing to write
+            return True
+
+        new_rank = rank_between(low, high)
+        board_id = self.task_repo.update_task_returning_board(task_id, {"rank": new_rank, "column": anchor.column})
+        try:
+            if board_id is not None and len(new_rank) > RANK_REBALANCE_LENGTH:
+                # Shortened within this command, the reorder is still published if that fails
+                self.task_repo.rebalance_column(board_id, anchor.column)
+        finally:
+            self._touch_board(board_id)
+        return board_id is not None
     
     def delete_task(self, task_id: ObjectId, user_role: str) -> bool:
         if user_role not in ["Hashira", "Boss"]:
             raise PermissionError(f"User role '{user_role}' cannot delete tasks. Only 'Hashira' or 'Boss' can.")
         
-        return self.task_repo.delete_task(task_id)
\ No newline at end of file
+        board_id = self.task_repo.delete_task_returning_board(task_id)
+        return self._touch_board(board_id)
+
+    #----------------Bulk Changes-----------------#
+    # Change every task of a board matching filters with a single update_many/delete_many and one
+    # version bump, instead of a lookup and a write per task. filters may hold column, priority,
+    # assignee_id, due_from, due_to and title (a case-insensitive substring); at least one is required.
+    # With dry_run nothing is written, the methods only return how many tasks match.
+
+    # Move the matching tasks to the bottom of a column, returns the number moved
+    def move_tasks(self, board_id: ObjectId, filters: dict, new_column: str, user_role: str, dry_run: bool = False) -> int:
+        if user_role not in ["Hashira", "Boss"]:
+            raise PermissionError(f"User role '{user_role}' cannot move tasks. Only 'Hashira' or 'Boss' can.")
+        new_column = self._normalize_column(new_column)
+        query = self._bulk_query(board_id, filters)
+        if query.get("column") == new_column:
+            # Already there, nothing would move
+            return 0
+        if dry_run:
+            return self.task_repo.count_tasks(query if "column" in query else {**query, "column": {"$ne": new_column}})
+
+        last_rank = self.task_repo.find_last_rank(board_id, new_column)
+        moved = self.task_repo.move_tasks(query, new_column, last_rank)
+        if moved:
+            try:
+                # New keys start from the column's last key, so they are barely longer than it
+                if last_rank and len(last_rank) >= RANK_REBALANCE_LENGTH:
+                    self.task_repo.rebalance_column(board_id, new_column)
+            finally:
+                self.board_repo.bump_version(board_id)
+        return moved
+
+    # Apply the same updates (description, priority, due_date, assigned_to) to the matching tasks
+    # Returns the number of tasks changed, tasks that already had the values are not counted
+    def edit_tasks(self, board_id: ObjectId, filters: dict, updates: dict, user_role: str, dry_run: bool = False) -> int:
+        if user_role not in ["Hashira", "Boss"]:
+            raise PermissionError(f"User role '{user_role}' cannot edit tasks. Only 'Hashira' or 'Boss' can.")
+        if not updates:
+            raise ValueError("No updates provided")
+        unsupported = set(updates) - set(self.BULK_EDIT_FIELDS)
+        if unsupported:
+            raise ValueError(f"Cannot edit {sorted(unsupported)} of several tasks at once. Allowed: {list(self.BULK_EDIT_FIELDS)}")
+        updates = self._normalize_updates(updates)
+        query = self._bulk_query(board_id, filters)
+        if dry_run:
+            return self.task_repo.count_tasks(query)
+
+        modified = self.task_repo.update_tasks(query, updates)
+        if modified:
+            self.board_repo.bump_version(board_id)
+        return modified
+
+    # Delete the matching tasks, returns the number deleted
+    def delete_tasks(self, board_id: ObjectId, filters: dict, user_role: str, dry_run: bool = False) -> int:
+        if user_role not in ["Hashira", "Boss"]:
+            raise PermissionError(f"User role '{user_role}' cannot delete tasks. Only 'Hashira' or 'Boss' can.")
+        query = self._bulk_query(board_id, filters)
+        if dry_run:
+            return self.task_repo.count_tasks(query)
+
+        deleted = self.task_repo.delete_tasks(query)
+        if deleted:
+            self.board_repo.bump_version(board_id)
+        return deleted
+
+    # Tasks past their due date that are not DONE, across the given boards, earliest first
+    def list_overdue_tasks(self, board_ids: list, limit: int = 0) -> list:
+        today = parse_due_date(datetime.now())
+        return self.task_repo.find_tasks_due(board_ids, due_before=today, limit=limit)
+
+    # Tasks due from today up to and including the given number of days ahead, across the given boards
+    def list_tasks_due_soon(self, board_ids: list, days: int = 7, limit: int = 0) -> list:
+        if days < 0:
+            raise ValueError("Days must be zero or a positive number")
+        today = parse_due_date(datetime.now())
+        return self.task_repo.find_tasks_due(
+            board_ids,
+            due_from=today,
+            due_before=today + timedelta(days=days + 1),
+            limit=limit,
+        )
+
+    #----------------Helper Functions-----------------#
+    # Convert the due date and keep the sortable priority rank in step with the priority name
+    @staticmethod
+    def _normalize_updates(updates: dict) -> dict:
+        if "due_date" in updates:
+            updates = {**updates, "due_date": parse_due_date(updates["due_date"])}
+        if "priority" in updates:
+            if updates["priority"] not in PRIORITY_RANKS:
+                raise ValueError("Priority must be 'high', 'medium', or 'low'")
+            updates = {**updates, "priority_rank": PRIORITY_RANKS[updates["priority"]]}
+        return updates
+
+    @staticmethod
+    def _normalize_column(column: str) -> str:
+        valid_columns = ["TODO", "DOING", "DONE"]
+        normalized_column = column.upper()
+        if normalized_column not in valid_columns:
+            raise ValueError(f"Invalid column. Must be one of {valid_columns}")
+        return normalized_column
+
+    # Validate bulk filters and build their query; an empty filter would match the whole board
+    def _bulk_query(self, board_id: ObjectId, filters: dict) -> dict:
+        filters = {key: value for key, value in (filters or {}).items() if value}
+        unknown = set(filters) - set(self.BULK_FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown filters {sorted(unknown)}. Must be among {list(self.BULK_FILTERS)}")
+        if not filters:
+            raise ValueError("Give at least one filter (column, priority, assignee, due date or title)")
+        if filters.get("priority") and filters["priority"] not in PRIORITY_RANKS:
+            raise ValueError("Priority must be 'high', 'medium', or 'low'")
+        return self.task_repo.build_filter_query(
+            board_id,
+            column=self._normalize_column(filters["column"]) if filters.get("column") else None,
+            priority=filters.get("priority"),
+            assigned_to=filters.get("assignee_id"),
+            due_from=parse_due_date(filters.get("due_from")),
+            due_to=parse_due_date(filters.get("due_to")),
+            title=filters.get("title"),
+        )
+
+    # Bump the version of the board a task write touched, returns False if no task matched
+    def _touch_board(self, board_id: ObjectId | None) -> bool:
+        if board_id is None:
+            return False
+        self.board_repo.bump_version(board_id)
+        return True
@@ -0,0 +1,188 @@
+import csv
+import os
+import secrets
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from typing import Iterable, Iterator
+from bson import ObjectId
+
+from models.base_user import USER_CLASSES
+from repositories.user_repository import UserRepository
+from services.auth_services import EMAIL_PATTERN
+from services.licence_service import LicenceService
+from setup_license_keys import iter_json_items
+
+# Column names accepted for the licence key
+LICENCE_COLUMNS = ("licence", "license", "licence_key", "license_key")
+
+
+# Stream the rows of a user file as dicts without loading it into memory
+# A .csv file needs a header row (username, email, licence, optional password and role),
+# any other file is read as a JSON array or NDJSON of objects with the same fields
+def iter_user_rows(path: str) -> Iterator[dict]:
+    if path.lower().endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            yield from csv.DictReader(f)
+    else:
+        yield from iter_json_items(path)
+
+
+#---------------User Import Service-----------------#
+# Creates many users from a file in batches, each costing a handful of round trips instead of two per user:
+# the licences of a batch are claimed with one bulk update and one lookup, the passwords of the rows
+# that got one are hashed across a process pool, and the users are inserted with one unordered insert_many. Users that cannot be
+# inserted (taken username or email) give their licence back in one more bulk update.
+# Example:
+#   for result in UserImportService().import_users(iter_user_rows("staff.csv"), "Boss"):
+#       print(result["row"], result["status"], result["message"])
+class UserImportService:
+
+    BATCH_SIZE = 500
+
+    def __init__(self, user_repo: UserRepository = None, licence_service: LicenceService = None):
+        self.user_repo = user_repo or UserRepository()
+        self.licence_service = licence_service or LicenceService()
+
+    # Import rows (dicts) and yield one result per row, in file order, as each batch finishes:
+    # {"row": n, "username", "role", "status": "created" or "failed", "message", "password"}
+    # password is only set for rows without one, it is the generated password the user logs in with
+    # workers is the number of hashing processes (default: CPU count, 1 hashes in this process)
+    def import_users(self, rows: Iterable, user_role: str, batch_size: int = BATCH_SIZE, workers: int = None) -> Iterator[dict]:
+        # Only the Boss can onboard users
+        if user_role != "Boss":
+            raise PermissionError(f"User role '{user_role}' cannot import users. Only 'Boss' can.")
+
+        numbered_rows = enumerate(rows, start=1)
+        with self._password_hasher(workers or os.cpu_count() or 1) as hash_passwords:
+            while True:
+                batch = list(islice(numbered_rows, max(1, batch_size)))
+                if not batch:
+                    return
+                yield from self._import_batch(batch, hash_passwords)
+
+    #----------------Helper Functions-----------------#
+    def _import_batch(self, batch: list, hash_passwords) -> list:
+        results = {}
+        records = []
+        for row_number, row in batch:
+            try:
+                records.append(self._normalize_row(row_number, row))
+            except ValueError as e:
+                username = row.get("username") if isinstance(row, dict) else None
+                results[row_number] = self._result(row_number, username, "failed", str(e))
+
+        # Licences are claimed for ids generated here, so the users can be inserted afterwards
+        claims = self.licence_service.claim_licences(
+            [(record["licence_key"], ObjectId(), record["role"]) for record in records]
+        )
+        claimed = []
+        licences = []
+        for record, (licence, error) in zip(records, claims):
+            if error:
+                results[record["row"]] = self._result(record["row"], record["username"], "failed", error)
+                continue
+            claimed.append(record)
+            licences.append(licence)
+
+        # Hashing is the costliest step, so only rows that got a licence pay for it
+        try:
+            password_hashes = hash_passwords([record["password"] for record in claimed])
+        except Exception:
+            self.licence_service.release_licences([(record["licence_key"], licence.owner_id) for record, licence in zip(claimed, licences)])
+            raise
+
+        users = []
+        for record, licence, password_hash in zip(claimed, licences, password_hashes):
+            user_class = USER_CLASSES[licence.role]
+            users.append(user_class(
+                username=record["username"],
+                password_hash=password_hash,
+                email=record["email"],
+                role=licence.role,
+                _id=licence.owner_id,
+            ))
+
+        inserted = self.user_repo.create_users(users)
+        released = []
+        for index, (record, user) in enumerate(zip(claimed, users)):
+            fields = inserted["duplicate_fields"].get(index)
+            if fields is None:
+                results[record["row"]] = self._result(
+                    record["row"], record["username"], "created", "User created", role=user.role,
+                    password=record["password"] if record["generated_password"] else None,
+                )
+                continue
+            # Compensate instead of a transaction, which would need a replica set
+            released.append((record["licence_key"], user._id))
+            if "email" in fields:
+                message = f"Email '{record['email']}' is already registered"
+            else:
+                message = f"User '{record['username']}' already exists"
+            results[record["row"]] = self._result(record["row"], record["username"], "failed", message)
+        if released:
+            try:
+                self.licence_service.release_licences(released)
+            except Exception as e:
+                print(f"Warning: Could not release {len(released)} licence keys: {e}", file=sys.stderr)
+
+        return [results[row_number] for row_number, _ in batch]
+
+    # Check a row without the database, returns {row, username, email, password, licence_key, role}
+    @staticmethod
+    def _normalize_row(row_number: int, row) -> dict:
+        if not isinstance(row, dict):
+            raise ValueError("Row must be an object with username, email and licence fields")
+        # JSON rows may hold numbers, they are read as their text; lists, objects and booleans are rejected
+        def text(column: str, strip: bool = True) -> str:
+            value = row.get(column)
+            if value is None:
+                return ""
+            if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+                raise ValueError(f"Field '{column}' must be text")
+            return str(value).strip() if strip else str(value)
+
+        username = text("username")
+        email = text("email")
+        licence_key = next((text(column) for column in LICENCE_COLUMNS if row.get(column)), "")
+        password = text("password", strip=False)
+        role = text("role") or None
+
+        if not username:
+            raise ValueError("Username is required")
+        if not email or not EMAIL_PATTERN.match(email):
+            raise ValueError("Invalid or missing email. Please provide a valid email address.")
+        if not licence_key:
+            raise ValueError("Licence key is required to sign up")
+        if role is not None and role not in USER_CLASSES:
+            raise ValueError(f"Invalid role. Must be one of {list(USER_CLASSES)}")
+
+        return {
+            "row": row_number,
+            "username": username,
+            "email": email,
+            # Rows without a password get a random one, reported back once in the import result
+            "password": password or secrets.token_urlsafe(12),
+            "generated_password": not password,
+            "licence_key": licence_key,
+            "role": role,
+        }
+
+    @staticmethod
+    def _result(row_number: int, username: str, status: str, message: str, role: str = None, password: str = None) -> dict:
+        return {"row": row_number, "username": username, "role": role, "status": status, "message": message, "password": password}
+
+    # Yield a function that hashes a list of passwords, spread over a process pool when workers > 1
+    # The pool is started once and reused by every batch of the import
+    @staticmethod
+    @contextmanager
+    def _password_hasher(workers: int):
+        if workers <= 1:
+            yield lambda passwords: [UserRepository.hash_password(password) for password in passwords]
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            def hash_passwords(passwords: list) -> list:
+                chunksize = max(1, len(passwords) // (workers * 4))
+                return list(pool.map(UserRepository.hash_password, passwords, chunksize=chunksize))
+            yield hash_passwords
@@ -1,7 +1,8 @@
 import argparse
 import json
 import os
-from typing import List, Dict, Any
+import sys
+from typing import List, Dict, Any, Iterable, Iterator
 
 from bson import ObjectId
 
@@ -9,73 +10,97 @@ from services.licence_service import LicenceService
 from repositories.licence_repository import LicenceRepository
 from setup_schema import ensure_schema
 
+# Records per insert_many round trip, and how often progress is printed
+BATCH_SIZE = 1000
+PROGRESS_EVERY = 10000
+# Characters read at a time when streaming a JSON array, and the largest single item accepted
+READ_CHUNK_SIZE = 64 * 1024
+MAX_ITEM_SIZE = 1024 * 1024
+
+# Stream the raw items of a licence file without loading it into memory
+# Accepts a JSON array (['AAAA-...', ...] or [{key, role}, ...]) or NDJSON (one string or object per line)
+def iter_json_items(path: str) -> Iterator[Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = f.read(READ_CHUNK_SIZE)
+        start = buffer.lstrip()[:1]
+        if start == "[":
+            yield from _iter_json_array(f, buffer)
+        else:
+            f.seek(0)
+            yield from _iter_ndjson(f)
+
+
+# Normalize a raw item to {key, role}
+def normalize_record(item: Any) -> Dict[str, Any]:
+    if isinstance(item, str):
+        return {"key": item, "role": "Members"}
+    if isinstance(item, dict):
+        key = item.get("key")
+        role = item.get("role", "Members")
+        if not key or not isinstance(key, str):
+            raise ValueError("JSON item missing 'key' field")
+        return {"key": key, "role": role}
+    raise ValueError("Unsupported JSON item format; use string or {key, role}")
+
+
 # Load JSON file and normalize records
+# Loads everything into memory, seed_keys(iter_json_items(path)) streams instead
 def load_from_json(path: str) -> List[Dict[str, Any]]:
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    # Accept either list of strings or list of objects with key/role
-    if isinstance(data, list):
-        normalized = []
-        for item in data:
-            if isinstance(item, str):
-                normalized.append({"key": item, "role": "Members"})
-            elif isinstance(item, dict):
-                key = item.get("key")
-                role = item.get("role", "Members")
-                if not key:
-                    raise ValueError("JSON item missing 'key' field")
-                normalized.append({"key": key, "role": role})
-            else:
-                raise ValueError("Unsupported JSON item format; use string or {key, role}")
-        return normalized
-    raise ValueError("Unsupported JSON format; expected a list")
-
-
-# Insert seed keys into the database
-def seed_keys(records: List[Dict[str, Any]], dry_run: bool = False) -> Dict[str, int]:
-    # Ensure DB schema (including unique indexes) before seeding keys
-    try:
-        ensure_schema()
-    except Exception as e:
-        print(f"Warning: Schema setup failed before seeding: {e}")
-
-    repo = LicenceRepository()  # ensures indexes
-    service = LicenceService(repo)
-
-    inserted = 0
-    skipped = 0
-    errors = 0
-
-    for rec in records:
-        key = rec.get("key")
-        role = rec.get("role", "Members")
-        if not key:
-            print("Skipping record with no 'key' field")
-            errors += 1
-            continue
+    return [normalize_record(item) for item in iter_json_items(path)]
+
+
+# Insert seed keys into the database in unordered batches
+# Keys that already exist are skipped by the unique index, so each batch costs one round trip
+# With dry_run the records are only validated and the database is never touched
+def seed_keys(records: Iterable[Any], dry_run: bool = False, batch_size: int = BATCH_SIZE,
+              progress_every: int = PROGRESS_EVERY) -> Dict[str, int]:
+    if dry_run:
+        service = LicenceService(_DryRunRepository())
+    else:
+        # Ensure DB schema (including unique indexes) before seeding keys
+        try:
+            ensure_schema()
+        except Exception as e:
+            print(f"Warning: Schema setup failed before seeding: {e}", file=sys.stderr)
+        service = LicenceService(LicenceRepository())  # ensures indexes
 
-        # Skip duplicates
-        existing = repo.find_licence_by_key(key)
-        if existing:
-            print(f"Skip existing key: {key} (role={existing.role})")
-            skipped += 1
-            continue
+    summary = {"inserted": 0, "skipped": 0, "errors": 0}
+    processed = 0
+    next_report = progress_every
+    batch = []
 
-        if dry_run:
-            print(f"[dry-run] Would insert key: {key} role={role}")
-            inserted += 1
-            continue
+    def flush():
+        if not batch:
+            return
+        try:
+            result = service.create_licences(batch)
+            summary["inserted"] += result["inserted"]
+            summary["skipped"] += result["duplicates"]
+        except Exception as e:
+            print(f"Error inserting batch of {len(batch)} keys: {e}")
+            summary["errors"] += len(batch)
+        batch.clear()
 
+    for position, item in enumerate(records, start=1):
+        processed = position
         try:
+            record = normalize_record(item)
             # Owner not assigned yet in seed (None). When redeemed, app can set owner.
-            service.create_licence(key=key, owner_id=None, role=role)  # type: ignore[arg-type]
-            print(f"Inserted key: {key} role={role}")
-            inserted += 1
-        except Exception as e:
-            print(f"Error inserting {key}: {e}")
-            errors += 1
+            batch.append(service.build_licence(record["key"], owner_id=None, role=record["role"]))
+        except ValueError as e:
+            print(f"Skipping record {position}: {e}")
+            summary["errors"] += 1
 
-    return {"inserted": inserted, "skipped": skipped, "errors": errors}
+        if len(batch) >= batch_size:
+            flush()
+        if progress_every and processed >= next_report:
+            _print_progress(processed, summary, dry_run)
+            next_report += progress_every
+
+    flush()
+    if progress_every and processed % progress_every:
+        _print_progress(processed, summary, dry_run)
+    return summary
 
 
 def main():
@@ -85,12 +110,18 @@ def main():
     parser.add_argument(
         "--from-json",
         dest="json_path",
-        help="Path to JSON file: either ['AAAA-...', ...] or [{key, role}, ...]",
+        help="Path to a JSON array (['AAAA-...', ...] or [{key, role}, ...]) or an NDJSON file with one key per line",
     )
     parser.add_argument(
         "--dry-run",
         action="store_true",
-        help="Validate and show actions without inserting",
+        help="Validate the file without connecting to the database",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help=f"Keys inserted per round trip (default: {BATCH_SIZE})",
     )
 
     args = parser.parse_args()
@@ -106,13 +137,95 @@ def main():
             print("Error: Provide --from-json <path> or create license.json in the project root.")
             return
 
-    records = load_from_json(json_path)
-
-    summary = seed_keys(records, dry_run=args.dry_run)
+    try:
+        summary = seed_keys(iter_json_items(json_path), dry_run=args.dry_run, batch_size=max(1, args.batch_size))
+    except ValueError as e:
+        # Malformed JSON ends the stream, batches before the error are already stored
+        print(f"Error: {e}")
+        return
+    label = "valid" if args.dry_run else "inserted"
     print(
-        f"\nSummary: inserted={summary['inserted']} skipped={summary['skipped']} errors={summary['errors']}"
+        f"\nSummary: {label}={summary['inserted']} skipped={summary['skipped']} errors={summary['errors']}"
     )
 
 
+#----------------Helper Functions-----------------#
+# Yield the items of a JSON array one at a time, keeping at most one item plus one chunk in memory
+# The whole document must be an array, anything after the closing bracket is ignored
+def _iter_json_array(f, buffer: str) -> Iterator[Any]:
+    decoder = json.JSONDecoder()
+    pos = buffer.index("[") + 1
+    eof = False
+    expect_item = True
+    after_comma = False
+    while True:
+        # Skip whitespace and the comma between items
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer, pos = f.read(READ_CHUNK_SIZE), 0
+            eof = not buffer
+
+        if pos >= len(buffer):
+            raise ValueError("Unexpected end of JSON file; the array is not closed")
+        if buffer[pos] == "]":
+            # As in json.loads, "[1,]" is not an array
+            if after_comma:
+                raise ValueError("Trailing ',' before the end of the JSON array")
+            return
+        if not expect_item:
+            if buffer[pos] != ",":
+                raise ValueError(f"Expected ',' between JSON items, found '{buffer[pos]}'")
+            pos += 1
+            expect_item = True
+            after_comma = True
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            end = None
+        # An item that reaches the end of the buffer may continue in the next chunk
+        if (end is None or end == len(buffer)) and not eof:
+            if len(buffer) - pos > MAX_ITEM_SIZE:
+                raise ValueError("Invalid JSON item in licence file")
+            chunk = f.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        if end is None:
+            raise ValueError("Invalid JSON item in licence file")
+        yield item
+        pos = end
+        expect_item = False
+        after_comma = False
+
+
+# Yield one item per non-empty line
+def _iter_ndjson(f) -> Iterator[Any]:
+    for line_number, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_number}: {e.msg}")
+
+
+def _print_progress(processed: int, summary: Dict[str, int], dry_run: bool):
+    label = "valid" if dry_run else "inserted"
+    print(f"Processed {processed} records: {label}={summary['inserted']} skipped={summary['skipped']} errors={summary['errors']}")
+
+
+# Stands in for the repository during a dry run: counts every valid key as insertable
+class _DryRunRepository:
+    @staticmethod
+    def create_licences(licences: list) -> dict:
+        return {"inserted": len(licences), "duplicates": 0, "duplicate_indexes": [], "duplicate_fields": {}}
+
+
 if __name__ == "__main__":
     main()
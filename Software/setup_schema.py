@@ -1,5 +1,9 @@
+import sys
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
 from config import get_database
-from pymongo import ASCENDING
+from pymongo import ASCENDING, UpdateOne
+from utils.rank_keys import ranks_between
 
 #-----------------Schema and Models-----------------#
 # Align schemas to actual entity fields
@@ -18,7 +22,7 @@ user_schema = {
     }
 }
 
-# Licences: key, owner_id, role
+# Licences: key, owner_id, role, reserved_at, reserved_for
 licence_schema = {
     "$jsonSchema": {
         "bsonType": "object",
@@ -27,11 +31,13 @@ licence_schema = {
             "key": {"bsonType": "string", "minLength": 8},
             "owner_id": {"bsonType": ["objectId", "null"]},
             "role": {"enum": ["Members", "Hashira", "Boss"]},
+            "reserved_at": {"bsonType": ["date", "null"]},
+            "reserved_for": {"bsonType": ["string", "null"]},
         },
     }
 }
 
-# Tasks: title, board_id, column, description, due_date, priority, assigned_to
+# Tasks: title, board_id, column, description, due_date, priority, priority_rank, assigned_to, rank
 task_schema = {
     "$jsonSchema": {
         "bsonType": "object",
@@ -41,14 +47,16 @@ task_schema = {
             "board_id": {"bsonType": "objectId"},
             "column": {"enum": ["TODO", "DOING", "DONE"]},
             "description": {"bsonType": ["string", "null"]},
-            "due_date": {"bsonType": ["string", "null"], "pattern": r"^\d{4}-\d{2}-\d{2}$"},
+            "due_date": {"bsonType": ["date", "null"]},
             "priority": {"enum": ["low", "medium", "high"]},
+            "priority_rank": {"enum": [0, 1, 2]},
             "assigned_to": {"bsonType": ["objectId", "null"]},
+            "rank": {"bsonType": ["string", "null"]},
         },
     }
 }
 
-# Boards: name, owner_id, columns
+# Boards: name, owner_id, columns, version
 board_schema = {
     "$jsonSchema": {
         "bsonType": "object",
@@ -60,10 +68,19 @@ board_schema = {
                 "bsonType": "array",
                 "items": {"enum": ["TODO", "DOING", "DONE"]},
             },
+            "version": {"bsonType": ["int", "long"], "minimum": 0},
         },
     }
 }
 
+# Every collection of the workspace with its validator
+COLLECTION_SCHEMAS = {
+    "users": user_schema,
+    "boards": board_schema,
+    "tasks": task_schema,
+    "licences": licence_schema,
+}
+
 # -----------------Schema Setup Logic-----------------#
 # Create collection with validator or update its validator if it exists
 def _ensure_collection(db, name: str, validator: dict):
@@ -75,15 +92,98 @@ def _ensure_collection(db, name: str, validator: dict):
         else:
             raise
 
+# -----------------Data Migrations-----------------#
+# Convert due dates stored as "YYYY-MM-DD" strings into BSON dates with one server-side bulk update
+# Values that cannot be parsed become null instead of aborting the migration, those tasks are read
+# first and returned so the caller can report them
+# Returns (number of tasks migrated, [{"_id", "title", "due_date"} of the unparseable ones])
+def migrate_due_dates(db) -> tuple[int, list]:
+    parsed = {"$dateFromString": {
+        "dateString": "$due_date",
+        "format": "%Y-%m-%d",
+        "onError": None,
+        "onNull": None,
+    }}
+    unparseable = list(db["tasks"].find(
+        {"due_date": {"$type": "string"}, "$expr": {"$eq": [parsed, None]}},
+        {"title": 1, "due_date": 1},
+    ))
+    result = db["tasks"].update_many({"due_date": {"$type": "string"}}, [{"$set": {"due_date": parsed}}])
+    return result.modified_count, unparseable
+
+# Derive the numeric priority_rank (high=0, medium=1, low=2) for tasks written before it existed
+def migrate_priority_ranks(db) -> int:
+    result = db["tasks"].update_many(
+        {"priority_rank": {"$exists": False}},
+        [{"$set": {"priority_rank": {"$switch": {
+            "branches": [
+                {"case": {"$eq": ["$priority", "high"]}, "then": 0},
+                {"case": {"$eq": ["$priority", "low"]}, "then": 2},
+            ],
+            "default": 1,
+        }}}}],
+    )
+    return result.modified_count
+
+# Store an explicit null owner on licences written without the field, so the partial
+# unclaimed_by_role index (owner_id of type null) covers every free licence
+def migrate_licence_owners(db) -> int:
+    result = db["licences"].update_many({"owner_id": {"$exists": False}}, {"$set": {"owner_id": None}})
+    return result.modified_count
+
+# Give every column that still has unranked tasks evenly spaced rank keys, in creation order
+# Already ranked tasks keep their place after the newly ranked ones
+def migrate_task_ranks(db, batch_size: int = 1000) -> int:
+    tasks = db["tasks"]
+    migrated = 0
+    groups = tasks.aggregate([
+        {"$match": {"rank": None}},
+        {"$group": {"_id": {"board_id": "$board_id", "column": "$column"}}},
+    ])
+    for group in groups:
+        board_id, column = group["_id"]["board_id"], group["_id"]["column"]
+        first_ranked = tasks.find_one(
+            {"board_id": board_id, "column": column, "rank": {"$type": "string"}},
+            sort=[("rank", ASCENDING)],
+        )
+        unranked = [doc["_id"] for doc in tasks.find({"board_id": board_id, "column": column, "rank": None}, {"_id": 1}).sort("_id", ASCENDING)]
+        new_ranks = ranks_between(None, first_ranked["rank"] if first_ranked else None, len(unranked))
+        operations = [UpdateOne({"_id": task_id}, {"$set": {"rank": rank}}) for task_id, rank in zip(unranked, new_ranks)]
+        for start in range(0, len(operations), batch_size):
+            tasks.bulk_write(operations[start:start + batch_size], ordered=False)
+        migrated += len(operations)
+    return migrated
+
+# Free licences claimed for a user id that no user has, left behind when a signup or import died
+# between claiming the licence and inserting the user. User ids are generated just before the claim,
+# so only claims older than grace_seconds are considered, a signup still in progress is left alone.
+def release_orphaned_licences(db, grace_seconds: int = 3600) -> int:
+    cutoff = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(seconds=grace_seconds))
+    orphans = db["licences"].aggregate([
+        {"$match": {"owner_id": {"$type": "objectId", "$lt": cutoff}}},
+        {"$lookup": {"from": "users", "localField": "owner_id", "foreignField": "_id", "as": "owner"}},
+        {"$match": {"owner": {"$size": 0}}},
+        {"$project": {"owner_id": 1}},
+    ])
+    # Conditional on the owner, so a licence claimed again meanwhile is not freed
+    operations = [UpdateOne({"_id": doc["_id"], "owner_id": doc["owner_id"]}, {"$set": {"owner_id": None}}) for doc in orphans]
+    if not operations:
+        return 0
+    return db["licences"].bulk_write(operations, ordered=False).modified_count
+
+# Bump the version of every board after a migration rewrote tasks, so no cached view
+# (see utils/view_cache.py) keeps showing them as they were before
+def bump_board_versions(db) -> int:
+    result = db["boards"].update_many({}, {"$inc": {"version": 1}})
+    return result.modified_count
+
 # Ensure all collections exist with proper validators and indexes.
 def ensure_schema():
     db = get_database()
 
     # Apply validators
-    _ensure_collection(db, "users", user_schema)
-    _ensure_collection(db, "boards", board_schema)
-    _ensure_collection(db, "tasks", task_schema)
-    _ensure_collection(db, "licences", licence_schema)
+    for name, validator in COLLECTION_SCHEMAS.items():
+        _ensure_collection(db, name, validator)
 
     # Helpful indexes
     # Uniqueness (handle existing non-unique indexes gracefully)
@@ -104,7 +204,7 @@ def ensure_schema():
             coll.create_index([(field, ASCENDING)], name=name, unique=True)
         except Exception as e:
             # Surface a clear warning but do not fail schema setup entirely
-            print(f"Warning: Failed to ensure unique index on {coll.name}.{field}: {e}")
+            print(f"Warning: Failed to ensure unique index on {coll.name}.{field}: {e}", file=sys.stderr)
 
     _ensure_unique_index(db["users"], "username", name="username_unique")
     _ensure_unique_index(db["users"], "email", name="email_unique")
@@ -114,7 +214,59 @@ def ensure_schema():
     db["tasks"].create_index("board_id")
     db["tasks"].create_index("assigned_to")
     db["tasks"].create_index("priority")
+    db["tasks"].create_index(
+        [("board_id", ASCENDING), ("title", ASCENDING)],
+        name="board_title_ci",
+        collation={"locale": "en", "strength": 2},
+    )
+    # Compound indexes for the filter command, kept in sync with TaskRepository.FILTER_INDEXES
+    db["tasks"].create_index([("board_id", ASCENDING), ("column", ASCENDING), ("priority", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)], name="board_column_priority_due_id")
+    db["tasks"].create_index([("board_id", ASCENDING), ("priority", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)], name="board_priority_due_id")
+    db["tasks"].create_index([("board_id", ASCENDING), ("assigned_to", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)], name="board_assignee_due_id")
+    db["tasks"].create_index([("board_id", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)], name="board_due_id")
+    # Their earlier versions without the _id tie-breaker could not serve the sort, the ones above replace them
+    for name in ["board_column_priority_due", "board_priority_due", "board_assignee_due", "board_due"]:
+        if name in db["tasks"].index_information():
+            db["tasks"].drop_index(name)
+    # Ordered board view, kept in sync with TaskRepository.VIEW_SORTS
+    db["tasks"].create_index([("board_id", ASCENDING), ("column", ASCENDING), ("rank", ASCENDING), ("_id", ASCENDING)], name="board_column_rank")
+    db["tasks"].create_index([("board_id", ASCENDING), ("column", ASCENDING), ("_id", ASCENDING)], name="board_column_created")
+    db["tasks"].create_index([("board_id", ASCENDING), ("column", ASCENDING), ("priority_rank", ASCENDING), ("_id", ASCENDING)], name="board_column_priority")
+    db["tasks"].create_index([("board_id", ASCENDING), ("column", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)], name="board_column_due")
     db["licences"].create_index("owner_id")
+    # Free keys per role, kept in sync with LicenceRepository.UNCLAIMED_INDEX
+    db["licences"].create_index(
+        [("role", ASCENDING), ("reserved_at", ASCENDING), ("_id", ASCENDING)],
+        name="unclaimed_by_role",
+        partialFilterExpression={"owner_id": {"$type": "null"}},
+    )
+
+    # Bring existing documents in line with the current schema
+    tasks_migrated = 0
+    migrated, unparseable = migrate_due_dates(db)
+    if migrated:
+        print(f"Migrated {migrated} task due dates to BSON dates")
+    if unparseable:
+        print(f"Warning: Cleared {len(unparseable)} task due dates that are not YYYY-MM-DD dates:", file=sys.stderr)
+        for doc in unparseable:
+            print(f"  {doc['_id']} {doc.get('title', '')!r}: {doc['due_date']!r}", file=sys.stderr)
+    tasks_migrated += migrated
+    migrated = migrate_priority_ranks(db)
+    if migrated:
+        print(f"Added priority ranks to {migrated} tasks")
+    tasks_migrated += migrated
+    migrated = migrate_licence_owners(db)
+    if migrated:
+        print(f"Marked {migrated} licences without an owner field as unclaimed")
+    released = release_orphaned_licences(db)
+    if released:
+        print(f"Released {released} licences claimed by signups that never created their user")
+    migrated = migrate_task_ranks(db)
+    if migrated:
+        print(f"Added manual order ranks to {migrated} tasks")
+    tasks_migrated += migrated
+    if tasks_migrated:
+        bump_board_versions(db)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+import hashlib
+import math
+import struct
+
+#-----------------Bloom Filter-----------------#
+# A compact set of strings that can answer "certainly not present" or "probably present".
+# It never forgets an added key, and reports an absent key as present with probability error_rate
+# once capacity keys have been added. Memory is about 1.44 * log2(1 / error_rate) bits per key,
+# e.g. 10 million keys at a 0.1% error rate take 18 MB instead of the ~1 GB of a Python set.
+# Adding is not thread-safe, build the filter before sharing it between threads.
+# Example:
+#   seen = BloomFilter(capacity=1000, error_rate=0.001)
+#   seen.add("ABCD-1234-EFGH-5678")    # True, the key was not seen before
+#   "WXYZ-0000-0000-0000" in seen      # False, certainly never added
+class BloomFilter:
+
+    # Snapshot header: capacity, error_rate, hash_count, items
+    _HEADER = struct.Struct("<QdQQ")
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if capacity <= 0:
+            raise ValueError("Bloom filter capacity must be a positive number")
+        if not 0 < error_rate < 1:
+            raise ValueError("Bloom filter error rate must be between 0 and 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Optimal size and number of hash functions for the capacity and error rate
+        self.size_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.size_bits + 7) // 8)
+        self.items = 0
+
+    # Add a key, returns False if it was (probably) present already
+    def add(self, key: str) -> bool:
+        bits = self._bits
+        added = False
+        for position in self._positions(key):
+            index, mask = position >> 3, 1 << (position & 7)
+            if not bits[index] & mask:
+                bits[index] |= mask
+                added = True
+        if added:
+            self.items += 1
+        return added
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def __len__(self):
+        return self.items
+
+    # Size and accuracy figures, e.g. for a stats command
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "items": self.items,
+            "size_bytes": len(self._bits),
+            "hash_count": self.hash_count,
+            "target_error_rate": self.error_rate,
+            # Expected false positive rate at the current number of items
+            "estimated_error_rate": (1 - math.exp(-self.hash_count * self.items / self.size_bits)) ** self.hash_count,
+        }
+
+    #-----------------Snapshots-----------------#
+    # Serialize the filter, e.g. to save it to disk and skip rebuilding it on the next start
+    def to_bytes(self) -> bytes:
+        return self._HEADER.pack(self.capacity, self.error_rate, self.hash_count, self.items) + bytes(self._bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BloomFilter":
+        try:
+            capacity, error_rate, hash_count, items = cls._HEADER.unpack_from(data)
+        except struct.error:
+            raise ValueError("Invalid Bloom filter snapshot")
+        bloom = cls(capacity, error_rate)
+        bits = data[cls._HEADER.size:]
+        if hash_count != bloom.hash_count or len(bits) != len(bloom._bits):
+            raise ValueError("Invalid Bloom filter snapshot")
+        bloom._bits[:] = bits
+        bloom.items = items
+        return bloom
+
+    #----------------Helper Functions-----------------#
+    # Bit positions of a key, derived from one 128-bit hash by double hashing
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size_bits
+        return [(h1 + i * h2) % size for i in range(self.hash_count)]
@@ -0,0 +1,121 @@
+import math
+import threading
+import time
+
+#-----------------Histogram-----------------#
+# A log-scale histogram: every power of two is split into PER_OCTAVE buckets, so a percentile read
+# from it is off by at most 2^(1/8), about 9%, whatever the range of the values. Only the buckets
+# that were hit are stored, recording is one log2 and a dict update, and memory does not grow with
+# the number of values, so it can stay on for every command of a long session.
+# Example:
+#   histogram = Histogram(smallest=0.01)
+#   histogram.record(12.5)
+#   histogram.percentile(95)
+class Histogram:
+
+    PER_OCTAVE = 8
+
+    # smallest is the resolution, values at or below it share the first bucket
+    def __init__(self, smallest: float = 1.0):
+        self.smallest = smallest
+        self.buckets = {}       # bucket index -> number of values
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0
+
+    def record(self, value):
+        index = 0 if value <= self.smallest else math.ceil(math.log2(value / self.smallest) * self.PER_OCTAVE)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None or value < self.min else self.min
+        self.max = value if value > self.max else self.max
+
+    # Upper bound of the bucket holding the value at percent (0-100), kept within the values seen
+    def percentile(self, percent: float):
+        if not self.count:
+            return 0
+        rank = max(1, math.ceil(percent / 100 * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.max, max(self.min, self._upper_bound(index)))
+        return self.max
+
+    # Counters, percentiles and the non-empty buckets as [upper bound, count] pairs
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0,
+            "min": self.min or 0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": [[self._upper_bound(index), self.buckets[index]] for index in sorted(self.buckets)],
+        }
+
+    #----------------Helper Functions-----------------#
+    def _upper_bound(self, index: int) -> float:
+        return self.smallest * 2 ** (index / self.PER_OCTAVE)
+
+
+#-----------------Command Stats-----------------#
+# Latency and database cost of every command run by this process, for the stats command.
+# Each command name gets one histogram per metric, fed with the measurements of its unit of work
+# (see UnitOfWork.measurements): wall time, time waiting for MongoDB, time decoding BSON, time printing,
+# round trips, documents returned and bytes decoded. Times are in milliseconds.
+# Example:
+#   command_stats = CommandStats()
+#   command_stats.record("view-board", unit_of_work.measurements(wall_seconds))
+#   command_stats.snapshot()["view-board"]["wall_ms"]["p95"]
+class CommandStats:
+
+    # Metric name -> resolution of its histogram
+    METRICS = {
+        "wall_ms": 0.01,
+        "database_ms": 0.01,
+        "decode_ms": 0.01,
+        "output_ms": 0.01,
+        "round_trips": 1,
+        "documents": 1,
+        "bytes_decoded": 64,
+    }
+
+    def __init__(self):
+        self._commands = {}     # command -> {"count", "failed", metric: Histogram}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    # Record one run of a command, measurements maps metric names to values
+    def record(self, command: str, measurements: dict, failed: bool = False):
+        with self._lock:
+            stats = self._commands.get(command)
+            if stats is None:
+                stats = {"count": 0, "failed": 0, **{metric: Histogram(smallest) for metric, smallest in self.METRICS.items()}}
+                self._commands[command] = stats
+            stats["count"] += 1
+            stats["failed"] += 1 if failed else 0
+            for metric in self.METRICS:
+                stats[metric].record(measurements.get(metric, 0))
+
+    # Summaries per command, e.g. {"view-board": {"count": 3, "failed": 0, "wall_ms": {"p50": ...}, ...}}
+    # command limits the result to one command
+    def snapshot(self, command: str = None) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "count": stats["count"],
+                    "failed": stats["failed"],
+                    **{metric: stats[metric].summary() for metric in self.METRICS},
+                }
+                for name, stats in sorted(self._commands.items())
+                if command is None or name == command
+            }
+
+    def reset(self):
+        with self._lock:
+            self._commands.clear()
+            self.started_at = time.time()
@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import OrderedDict
+
+#-----------------LRU Cache-----------------#
+# A small bounded cache with least-recently-used eviction and an optional time-to-live.
+# It is thread-safe, so one instance can be shared by every service in the process.
+# Example:
+#   cache = LRUCache(max_size=128, ttl_seconds=60)
+#   cache.set(("board", board_id), value)
+#   cache.get(("board", board_id))    # returns None on a miss
+class LRUCache:
+
+    def __init__(self, max_size: int = 256, ttl_seconds: float | None = None):
+        if max_size <= 0:
+            raise ValueError("Cache size must be a positive number")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # Return the cached value, or the default on a miss or when the entry expired
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    # Store a value, evicting the least recently used entries when the cache is full
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    # Remove a single entry, returns True if it was cached
+    def invalidate(self, key) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    # Remove every entry whose key and value satisfy the predicate, returns the number removed
+    def invalidate_matching(self, predicate) -> int:
+        with self._lock:
+            stale = [key for key, (_, value) in self._entries.items() if predicate(key, value)]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    # Snapshot of the cached values, expired entries included until they are next looked up
+    def values(self) -> list:
+        with self._lock:
+            return [value for _, value in self._entries.values()]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # Snapshot of the counters, e.g. for the cache-stats command
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
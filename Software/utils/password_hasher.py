@@ -0,0 +1,132 @@
+import hashlib
+import hmac
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+#-----------------Password Hasher-----------------#
+# Salted, deliberately slow password hashes stored as one self-describing string:
+#   scrypt$n=16384,r=8,p=1$<salt hex>$<hash hex>
+#   pbkdf2_sha256$i=600000$<salt hex>$<hash hex>
+# The scheme and cost travel with each hash, so the configured cost can change at any time:
+# old hashes still verify and needs_rehash tells the caller to store a new one after a login.
+# Hashes from before this module (64 hex digits of unsalted SHA-256) are verified as "legacy".
+# hashlib runs both KDFs without holding the GIL, so many verifications can share a thread pool.
+# Example:
+#   hasher = PasswordHasher("scrypt", "n=16384,r=8,p=1")
+#   encoded = hasher.hash("secret")
+#   hasher.verify("secret", encoded)     # True
+#   hasher.needs_rehash(encoded)         # False, same scheme and cost
+class PasswordHasher:
+
+    SCHEMES = ("scrypt", "pbkdf2_sha256")
+    DEFAULT_PARAMS = {
+        "scrypt": {"n": 2 ** 14, "r": 8, "p": 1},
+        "pbkdf2_sha256": {"i": 600000},
+    }
+    SALT_BYTES = 16
+    HASH_BYTES = 32
+
+    def __init__(self, scheme: str = "scrypt", params: str | dict = None):
+        if scheme not in self.SCHEMES:
+            raise ValueError(f"Unknown password hash scheme '{scheme}'. Must be one of {list(self.SCHEMES)}")
+        self.scheme = scheme
+        self.params = {**self.DEFAULT_PARAMS[scheme], **(self.parse_params(params) if isinstance(params, str) else params or {})}
+
+    # Hash a password with a new random salt
+    def hash(self, password: str) -> str:
+        salt = os.urandom(self.SALT_BYTES)
+        digest = self._derive(self.scheme, self.params, password, salt)
+        return f"{self.scheme}${self.format_params(self.params)}${salt.hex()}${digest.hex()}"
+
+    # Check a password against a hash of any supported scheme, in constant time
+    def verify(self, password: str, encoded: str) -> bool:
+        if not encoded:
+            return False
+        if _is_legacy(encoded):
+            return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), encoded)
+        try:
+            scheme, params, salt, digest = encoded.split("$")
+            expected = bytes.fromhex(digest)
+            actual = self._derive(scheme, self.parse_params(params), password, bytes.fromhex(salt), len(expected))
+        except (ValueError, KeyError):
+            return False
+        return hmac.compare_digest(actual, expected)
+
+    # True when a stored hash uses another scheme or cost than this hasher, e.g. a legacy SHA-256 hash
+    def needs_rehash(self, encoded: str) -> bool:
+        if not encoded or _is_legacy(encoded):
+            return True
+        try:
+            scheme, params, _, _ = encoded.split("$")
+            return scheme != self.scheme or self.parse_params(params) != self.params
+        except ValueError:
+            return True
+
+    # Verify many (password, encoded) pairs in a thread pool, returns one bool per pair
+    def verify_many(self, pairs: list, workers: int = None) -> list:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            return list(pool.map(lambda pair: self.verify(*pair), pairs))
+
+    # "n=16384,r=8,p=1" <-> {"n": 16384, "r": 8, "p": 1}
+    @staticmethod
+    def parse_params(params: str) -> dict:
+        if not params:
+            return {}
+        return {name: int(value) for name, value in (item.split("=", 1) for item in params.split(","))}
+
+    @staticmethod
+    def format_params(params: dict) -> str:
+        return ",".join(f"{name}={value}" for name, value in params.items())
+
+    #----------------Helper Functions-----------------#
+    @classmethod
+    def _derive(cls, scheme: str, params: dict, password: str, salt: bytes, length: int = HASH_BYTES) -> bytes:
+        if scheme == "scrypt":
+            n, r, p = params["n"], params["r"], params["p"]
+            # Exactly the memory scrypt needs (128 * r * (n + p + 2) bytes) plus some headroom
+            maxmem = 128 * r * (n + p + 2) + 1024 * 1024
+            return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=maxmem, dklen=length)
+        if scheme == "pbkdf2_sha256":
+            return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, params["i"], dklen=length)
+        raise ValueError(f"Unknown password hash scheme '{scheme}'")
+
+
+# Pick the cost of a scheme whose hash takes about target_ms on this machine
+# scrypt doubles n (memory and time) until the next step would overshoot the target,
+# pbkdf2 scales the iteration count linearly from a short measurement.
+# Returns (params, measured milliseconds per hash)
+def calibrate(scheme: str, target_ms: float, samples: int = 3) -> tuple:
+    if target_ms <= 0:
+        raise ValueError("Target latency must be a positive number of milliseconds")
+    if scheme == "scrypt":
+        params = {"n": 2 ** 10, "r": 8, "p": 1}
+        elapsed = _time_hash(scheme, params, samples)
+        # Each doubling of n roughly doubles the time
+        while elapsed * 2 <= target_ms and params["n"] < 2 ** 20:
+            params["n"] *= 2
+            elapsed = _time_hash(scheme, params, samples)
+        return params, elapsed
+    if scheme == "pbkdf2_sha256":
+        probe = {"i": 10000}
+        elapsed = _time_hash(scheme, probe, samples)
+        # Round to thousands, the measurement is not more precise than that
+        params = {"i": max(1000, round(probe["i"] * target_ms / elapsed / 1000) * 1000)}
+        return params, _time_hash(scheme, params, samples)
+    raise ValueError(f"Unknown password hash scheme '{scheme}'. Must be one of {list(PasswordHasher.SCHEMES)}")
+
+
+#----------------Helper Functions-----------------#
+def _is_legacy(encoded: str) -> bool:
+    return len(encoded) == 64 and "$" not in encoded
+
+
+# Best of samples, in milliseconds, so a noisy neighbour does not inflate the result
+def _time_hash(scheme: str, params: dict, samples: int) -> float:
+    hasher = PasswordHasher(scheme, params)
+    best = float("inf")
+    for _ in range(max(1, samples)):
+        started = time.perf_counter()
+        hasher.hash("calibration-password")
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
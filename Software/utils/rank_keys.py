@@ -0,0 +1,75 @@
+#-----------------Fractional Rank Keys-----------------#
+# Manual ordering of tasks uses string keys that compare lexicographically, like fractions
+# in base 62 written without the leading "0.". A key can always be generated between two
+# neighbours, so moving a card only rewrites that card, never its siblings.
+# Keys never end with "0" (the smallest digit), otherwise nothing could be placed before them.
+# Example:
+#   rank_between(None, None)   -> "V"
+#   rank_between("V", None)    -> "W"
+#   rank_between("V", "W")     -> "VV"
+
+# Digits in ASCII order so plain string comparison (and MongoDB's binary index order) matches key order
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+_DIGIT_VALUES = {digit: value for value, digit in enumerate(DIGITS)}
+
+
+# Return a key strictly between before and after, None means the start/end of the column
+def rank_between(before: str | None, after: str | None) -> str:
+    if before is not None and after is not None and before >= after:
+        raise ValueError(f"Rank '{before}' must sort before '{after}'")
+    if before is None and after is None:
+        return DIGITS[BASE // 2]
+    if after is None:
+        return _rank_after(before)
+    if before is None:
+        return _rank_before(after)
+    return _midpoint(before, after)
+
+
+# Return count keys spread evenly between before and after, in ascending order
+# Bisecting keeps the longest key close to log62(count) characters
+def ranks_between(before: str | None, after: str | None, count: int) -> list:
+    if count <= 0:
+        return []
+    middle = _midpoint(before or "", after)
+    left = (count - 1) // 2
+    return ranks_between(before, middle, left) + [middle] + ranks_between(middle, after, count - 1 - left)
+
+
+# Appending to the end: bump the first digit that still has room, so keys grow slowly
+def _rank_after(before: str) -> str:
+    for index, digit in enumerate(before):
+        value = _DIGIT_VALUES[digit]
+        if value < BASE - 1:
+            return before[:index] + DIGITS[value + 1]
+    return before + DIGITS[BASE // 2]
+
+
+# Prepending to the start: lower the first digit that can go down without becoming "0"
+def _rank_before(after: str) -> str:
+    for index, digit in enumerate(after):
+        value = _DIGIT_VALUES[digit]
+        if value > 1:
+            return after[:index] + DIGITS[value - 1]
+    return _midpoint("", after)
+
+
+# Key halfway between a and b, where a may be "" (the very start) and b may be None (the very end)
+def _midpoint(a: str, b: str | None) -> str:
+    if b is not None:
+        # Keep the common prefix, a missing digit in a counts as "0"
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else DIGITS[0]) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+
+    value_a = _DIGIT_VALUES[a[0]] if a else 0
+    value_b = _DIGIT_VALUES[b[0]] if b is not None else BASE
+    if value_b - value_a > 1:
+        return DIGITS[(value_a + value_b) // 2]
+    # The first digits are consecutive
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITS[value_a] + _midpoint(a[1:], None)
@@ -0,0 +1,139 @@
+import contextvars
+import functools
+import time
+
+#-----------------Unit of Work-----------------#
+# One unit of work is opened per CLI command. While it is active:
+#   - repositories keep an identity map, so loading the same _id twice returns the same object
+#     without another query, e.g. the board resolved by add-task and again by a visibility check
+#   - the adapter counts every round trip to MongoDB, the time spent waiting for it and decoding
+#     its replies, and the documents and bytes it returned; the formatter adds the time spent printing.
+#     These are shown when KANBAN_DEBUG is set and collected per command for the stats command
+# Outside a unit of work (tests, scripts, background threads) repositories behave as before.
+# Example:
+#   with UnitOfWork() as unit_of_work:
+#       board_service.get_board_by_name("Sprint", owner_id)
+#   print(unit_of_work.round_trips)
+_current = contextvars.ContextVar("unit_of_work", default=None)
+
+
+class UnitOfWork:
+
+    def __init__(self):
+        self.identity_map = {}      # (collection, _id) -> entity
+        self.round_trips = 0
+        self.identity_hits = 0
+        self.documents = 0
+        self.bytes_decoded = 0
+        self.database_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.output_seconds = 0.0
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        self._token = None
+        return False
+
+    # What the command cost, in the units of CommandStats (see utils/command_stats.py)
+    def measurements(self, wall_seconds: float) -> dict:
+        return {
+            "wall_ms": wall_seconds * 1000,
+            "database_ms": self.database_seconds * 1000,
+            "decode_ms": self.decode_seconds * 1000,
+            "output_ms": self.output_seconds * 1000,
+            "round_trips": self.round_trips,
+            "documents": self.documents,
+            "bytes_decoded": self.bytes_decoded,
+        }
+
+    #-----------------Identity Map-----------------#
+    def get(self, collection: str, doc_id):
+        entity = self.identity_map.get((collection, doc_id))
+        if entity is not None:
+            self.identity_hits += 1
+        return entity
+
+    # Keep the first object loaded for an _id, later loads return that same object
+    def register(self, collection: str, entity):
+        doc_id = getattr(entity, "_id", None)
+        if doc_id is None:
+            return entity
+        return self.identity_map.setdefault((collection, doc_id), entity)
+
+    # Drop an entity after a write, or every entity of the collection when doc_id is None
+    def forget(self, collection: str, doc_id=None):
+        if doc_id is not None:
+            self.identity_map.pop((collection, doc_id), None)
+            return
+        for key in [key for key in self.identity_map if key[0] == collection]:
+            del self.identity_map[key]
+
+
+# The unit of work of the running command, or None
+def current_unit_of_work() -> UnitOfWork | None:
+    return _current.get()
+
+
+# Count one round trip to the database against the running command
+def count_round_trip():
+    unit_of_work = _current.get()
+    if unit_of_work is not None:
+        unit_of_work.round_trips += 1
+
+
+# Add time spent waiting for MongoDB to the running command
+def count_database_time(seconds: float):
+    unit_of_work = _current.get()
+    if unit_of_work is not None:
+        unit_of_work.database_seconds += seconds
+
+
+# Add documents read from MongoDB to the running command, size is their BSON size in bytes
+def count_read(count: int, size: int = 0, decode_seconds: float = 0.0):
+    unit_of_work = _current.get()
+    if unit_of_work is not None:
+        unit_of_work.documents += count
+        unit_of_work.bytes_decoded += size
+        unit_of_work.decode_seconds += decode_seconds
+
+
+# Decorator adding the time a function spends printing to the running command
+# Database reads made while printing, e.g. a board streamed from its cursors, stay database time
+def timed_output(function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        unit_of_work = _current.get()
+        if unit_of_work is None:
+            return function(*args, **kwargs)
+        reading_before = unit_of_work.database_seconds + unit_of_work.decode_seconds
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            reading = unit_of_work.database_seconds + unit_of_work.decode_seconds - reading_before
+            unit_of_work.output_seconds += time.perf_counter() - started - reading
+    return wrapper
+
+
+# Identity map helpers for repositories, both are no-ops outside a unit of work
+def lookup_identity(collection: str, doc_id):
+    unit_of_work = _current.get()
+    return unit_of_work.get(collection, doc_id) if unit_of_work is not None else None
+
+
+def track_identity(collection: str, entity):
+    unit_of_work = _current.get()
+    if unit_of_work is None or entity is None:
+        return entity
+    return unit_of_work.register(collection, entity)
+
+
+def forget_identity(collection: str, doc_id=None):
+    unit_of_work = _current.get()
+    if unit_of_work is not None:
+        unit_of_work.forget(collection, doc_id)
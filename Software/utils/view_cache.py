@@ -0,0 +1,127 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+import bson
+from bson.errors import BSONError
+from models.entities import Board, Task
+from config import DATABASE_NAME, VIEW_CACHE_DIR, VIEW_CACHE_MAX_BOARDS, VIEW_CACHE_MAX_BYTES
+
+#-----------------Local View Cache-----------------#
+# Keeps the last rendered view of recently viewed boards in a SQLite file under the user's cache dir,
+# so a fresh CLI session can show an unchanged board after one projected version query instead of
+# reloading every column. Each entry stores the board version it was read at, the caller compares it
+# with the server before using the entry. Views are stored as one BSON blob per (board id, sort):
+# board names are only unique per owner, and the caller must resolve the board (and with it the
+# user's access) before asking for its view, the cache never decides who may see a board.
+# The cache is best effort: any problem with the file is treated as a miss and never fails a command.
+# Example:
+#   view_cache = LocalViewCache()
+#   cached = view_cache.get(board._id, "rank")    # (board, tasks_by_column) or None
+#   view_cache.put(board, "rank", tasks_by_column)
+class LocalViewCache:
+
+    def __init__(self, path: str = None, max_boards: int = VIEW_CACHE_MAX_BOARDS, max_bytes: int = VIEW_CACHE_MAX_BYTES):
+        # One file per database, so the test database never shares views with the real one
+        self.path = path or os.path.join(VIEW_CACHE_DIR, f"views-{DATABASE_NAME}.sqlite3")
+        self.max_boards = max_boards
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_boards > 0 and self.max_bytes > 0
+
+    # Return the cached (board, tasks_by_column) of a board view, or None
+    def get(self, board_id, sort: str):
+        if not self.enabled or not os.path.exists(self.path):
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT payload FROM board_views WHERE board_id = ? AND sort = ?",
+                    (str(board_id), sort)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE board_views SET last_used = ? WHERE board_id = ? AND sort = ?",
+                    (time.time(), str(board_id), sort)
+                )
+            payload = bson.decode(row[0])
+            board = Board(**payload["board"])
+            tasks_by_column = {
+                column: [Task(**doc) for doc in docs]
+                for column, docs in payload["tasks_by_column"].items()
+            }
+            return board, tasks_by_column
+        except (sqlite3.Error, OSError, BSONError, KeyError, TypeError, ValueError):
+            self.invalidate(board_id)
+            return None
+
+    # Store a rendered view, board.version must be the version the tasks were read at
+    def put(self, board: Board, sort: str, tasks_by_column: dict):
+        if not self.enabled:
+            return
+        payload = bson.encode({
+            "board": board.to_dict(),
+            "tasks_by_column": {
+                column: [task.to_dict() for task in tasks]
+                for column, tasks in tasks_by_column.items()
+            },
+        })
+        if len(payload) > self.max_bytes:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO board_views (board_id, sort, version, payload, size, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                    (str(board._id), sort, board.version, payload, len(payload), time.time())
+                )
+                self._evict(conn)
+        except (sqlite3.Error, OSError):
+            pass
+
+    # Drop the cached views of a board, or of every board when board_id is None
+    def invalidate(self, board_id=None):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with self._connect() as conn:
+                if board_id is None:
+                    conn.execute("DELETE FROM board_views")
+                else:
+                    conn.execute("DELETE FROM board_views WHERE board_id = ?", (str(board_id),))
+        except sqlite3.Error:
+            pass
+
+    #----------------Helper Functions-----------------#
+    # Open the cache file in a transaction that commits on success, and always close it
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=1)
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS board_views ("
+                    " board_id TEXT NOT NULL, sort TEXT NOT NULL, version INTEGER NOT NULL,"
+                    " payload BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL,"
+                    " PRIMARY KEY (board_id, sort))"
+                )
+                yield conn
+        finally:
+            conn.close()
+
+    # Remove the least recently viewed entries until both limits hold
+    # Limits count boards, so all sorts of a board are evicted together
+    def _evict(self, conn):
+        rows = conn.execute(
+            "SELECT board_id, SUM(size), MAX(last_used) AS used FROM board_views GROUP BY board_id ORDER BY used DESC"
+        ).fetchall()
+        kept_boards = kept_bytes = 0
+        for board_id, size, _ in rows:
+            if kept_boards < self.max_boards and kept_bytes + size <= self.max_bytes:
+                kept_boards += 1
+                kept_bytes += size
+            else:
+                conn.execute("DELETE FROM board_views WHERE board_id = ?", (board_id,))
@@ -0,0 +1,207 @@
+import argparse
+import mmap
+import os
+import struct
+import time
+import zlib
+from bson import encode, decode
+from bson.raw_bson import RawBSONDocument
+from pymongo import IndexModel
+
+from config import get_database
+from setup_schema import COLLECTION_SCHEMAS
+from services.licence_key_filter import reset_shared_licence_filter
+
+#-----------------Workspace Dump-----------------#
+# Backs up the whole workspace (the collections of setup_schema with their options and indexes)
+# into one archive file, and restores it. Documents are never decoded: the dump copies the raw
+# BSON batches of each cursor (find_raw_batches) straight into the archive, and the restore
+# memory-maps the archive and hands the raw documents to insert_many as RawBSONDocuments.
+#
+# Archive layout, little-endian:
+#   MAGIC
+#   chunk*: kind (1 byte) | name length (2) | name | document count (4) | payload length (8) | CRC-32 (4) | payload
+#     "M" metadata  payload is one BSON document {options, indexes} of the named collection
+#     "D" documents payload is BSON documents back to back, each starts with its own int32 length
+#     "E" end       payload is {"counts": {collection: documents}}, a missing end chunk means a truncated archive
+# Example:
+#   dump_workspace("workspace.kbdump")
+#   restore_workspace("workspace.kbdump", drop=True)
+
+MAGIC = b"KBDUMP01"
+BATCH_SIZE = 1000
+_CHUNK_KIND = struct.Struct("<cH")
+_CHUNK_SIZES = struct.Struct("<IQI")
+_DOCUMENT_LENGTH = struct.Struct("<i")
+
+
+# Write every collection to an archive, returns {collection: number of documents}
+def dump_workspace(path: str, db=None, batch_size: int = BATCH_SIZE) -> dict:
+    db = db if db is not None else get_database()
+    counts = {}
+    # Write next to the target first, so a failed dump never replaces a good archive
+    temporary_path = f"{path}.tmp"
+    try:
+        with open(temporary_path, "wb") as f:
+            f.write(MAGIC)
+            for name in COLLECTION_SCHEMAS:
+                info = next(db.list_collections(filter={"name": name}), None)
+                metadata = {
+                    "options": info["options"] if info else {},
+                    # The _id index comes with every collection
+                    "indexes": [index for index in db[name].list_indexes() if index["name"] != "_id_"],
+                }
+                _write_chunk(f, b"M", name, 0, encode(metadata))
+                counts[name] = 0
+                for batch in db[name].find_raw_batches({}, batch_size=batch_size):
+                    count = _count_documents(batch)
+                    _write_chunk(f, b"D", name, count, batch)
+                    counts[name] += count
+            _write_chunk(f, b"E", "", sum(counts.values()), encode({"counts": counts}))
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+    return counts
+
+
+# Restore an archive, returns {collection: number of documents}
+# The whole archive is checked before anything is written. Collections that already hold documents
+# are only replaced with drop=True; indexes are built after the data, which is faster than inserting into them.
+def restore_workspace(path: str, db=None, drop: bool = False) -> dict:
+    restores_configured_database = db is None
+    db = db if db is not None else get_database()
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as archive:
+        chunks = read_chunks(archive)
+        metadata = {name: decode(archive[start:end]) for kind, name, _, start, end in chunks if kind == b"M"}
+
+        existing = set(db.list_collection_names())
+        not_empty = [name for name in metadata if name in existing and db[name].estimated_document_count()]
+        if not_empty and not drop:
+            raise ValueError(f"Collections {not_empty} are not empty, restore with drop to replace them")
+        for name, collection_metadata in metadata.items():
+            db.drop_collection(name)
+            db.create_collection(name, **collection_metadata["options"])
+
+        counts = dict.fromkeys(metadata, 0)
+        view = memoryview(archive)
+        try:
+            for kind, name, count, start, end in chunks:
+                if kind == b"D" and count:
+                    # Documents were valid when dumped, so the validator does not have to check them again
+                    db[name].insert_many(_raw_documents(view, start, end), ordered=False, bypass_document_validation=True)
+                    counts[name] += count
+        finally:
+            # The mmap cannot close while a view of it is alive
+            view.release()
+
+    for name, collection_metadata in metadata.items():
+        if collection_metadata["indexes"]:
+            db[name].create_indexes([_index_model(index) for index in collection_metadata["indexes"]])
+    if restores_configured_database:
+        # Restored licences keep ids older than the key filter's catch-up point, so it must start over
+        reset_shared_licence_filter()
+    return counts
+
+
+# Check the magic, every checksum and the end chunk of an archive without decoding documents
+# Returns the chunks as (kind, collection, document count, payload start, payload end)
+def read_chunks(archive) -> list:
+    if archive[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a workspace archive")
+    view = memoryview(archive)
+    chunks = []
+    offset = len(MAGIC)
+    try:
+        while offset < len(archive):
+            chunk_start = offset
+            kind, name_length = _CHUNK_KIND.unpack_from(archive, offset)
+            offset += _CHUNK_KIND.size
+            name = bytes(archive[offset:offset + name_length]).decode("utf-8")
+            offset += name_length
+            count, length, checksum = _CHUNK_SIZES.unpack_from(archive, offset)
+            start = offset + _CHUNK_SIZES.size
+            end = start + length
+            if end > len(archive) or zlib.crc32(view[start:end]) != checksum:
+                raise ValueError(f"Workspace archive is corrupt in the chunk at byte {chunk_start}")
+            chunks.append((kind, name, count, start, end))
+            offset = end
+            if kind == b"E":
+                break
+    except struct.error:
+        raise ValueError(f"Workspace archive is truncated at byte {offset}")
+    finally:
+        view.release()
+
+    if not chunks or chunks[-1][0] != b"E":
+        raise ValueError("Workspace archive is truncated, the end marker is missing")
+    expected = decode(archive[chunks[-1][3]:chunks[-1][4]])["counts"]
+    found = {}
+    for kind, name, count, _, _ in chunks:
+        if kind == b"D":
+            found[name] = found.get(name, 0) + count
+    if any(found.get(name, 0) != count for name, count in expected.items()):
+        raise ValueError("Workspace archive is incomplete, document counts do not match")
+    return chunks
+
+
+#----------------Helper Functions-----------------#
+def _write_chunk(f, kind: bytes, name: str, count: int, payload: bytes):
+    encoded_name = name.encode("utf-8")
+    f.write(_CHUNK_KIND.pack(kind, len(encoded_name)))
+    f.write(encoded_name)
+    f.write(_CHUNK_SIZES.pack(count, len(payload), zlib.crc32(payload)))
+    f.write(payload)
+
+
+# Number of BSON documents in a raw batch, following the length prefix of each
+def _count_documents(batch: bytes) -> int:
+    count = 0
+    offset = 0
+    while offset < len(batch):
+        offset += _DOCUMENT_LENGTH.unpack_from(batch, offset)[0]
+        count += 1
+    return count
+
+
+# The documents of a payload as RawBSONDocuments, which pymongo sends without encoding them again
+def _raw_documents(view: memoryview, start: int, end: int):
+    offset = start
+    while offset < end:
+        length = _DOCUMENT_LENGTH.unpack_from(view, offset)[0]
+        # The smallest BSON document is 5 bytes, anything less would loop forever
+        if length < 5 or offset + length > end:
+            raise ValueError(f"Invalid BSON document length at byte {offset}")
+        yield RawBSONDocument(bytes(view[offset:offset + length]))
+        offset += length
+
+
+# IndexModel from a listIndexes entry, keeping options such as unique, collation and partial filters
+def _index_model(index: dict) -> IndexModel:
+    options = {key: value for key, value in index.items() if key not in ("key", "v", "ns")}
+    return IndexModel(list(index["key"].items()), **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dump the workspace to a raw BSON archive or restore it.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    dump = subparsers.add_parser("dump", help="Write every collection and its indexes to an archive")
+    dump.add_argument("path", help="Archive file to write")
+    restore = subparsers.add_parser("restore", help="Restore collections and indexes from an archive")
+    restore.add_argument("path", help="Archive file to read")
+    restore.add_argument("--drop", action="store_true", help="Replace collections that already hold documents")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "dump":
+        counts = dump_workspace(args.path)
+    else:
+        counts = restore_workspace(args.path, drop=args.drop)
+    seconds = time.perf_counter() - started
+    for name, count in counts.items():
+        print(f"{name}: {count} documents")
+    print(f"{args.command.capitalize()} of {sum(counts.values())} documents took {seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
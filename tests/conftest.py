@@ -19,6 +19,7 @@ from repositories.task_repository import TaskRepository
 from repositories.licence_repository import LicenceRepository
 from models.base_user import Members, Hashira, Boss
 from models.entities import Board, Task, Licence
+from utils.lru_cache import LRUCache
 
 @pytest.fixture(scope="function")
 def test_db():
@@ -45,13 +46,13 @@ def adapter(test_db):
 
 @pytest.fixture
 def user_repo(adapter):
-    """Provide a clean UserRepository instance."""
-    return UserRepository(adapter=adapter)
+    """Provide a clean UserRepository instance with its own empty user cache."""
+    return UserRepository(adapter=adapter, cache=LRUCache(max_size=64))
 
 @pytest.fixture
 def board_repo(adapter):
-    """Provide a clean BoardRepository instance."""
-    return BoardRepository(adapter=adapter)
+    """Provide a clean BoardRepository instance with its own empty board cache."""
+    return BoardRepository(adapter=adapter, cache=LRUCache(max_size=64))
 
 @pytest.fixture
 def task_repo(adapter):
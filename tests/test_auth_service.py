@@ -7,7 +7,20 @@ from services.auth_services import AuthService
 from repositories.user_repository import UserRepository
 from services.licence_service import LicenceService
 from models.entities import Licence
+from models.base_user import Members
+from utils.lru_cache import LRUCache
+from utils.unit_of_work import UnitOfWork
+from utils.password_hasher import PasswordHasher, calibrate
+import hashlib
+from services.user_import_service import UserImportService, iter_user_rows
+from services.session_service import SessionService
+from cli.app_context import AppContext
 from bson import ObjectId
+from datetime import datetime, timedelta, timezone
+from setup_schema import release_orphaned_licences
+import csv
+import time
+import main
 
 
 class TestAuthService:
@@ -98,6 +111,24 @@ class TestAuthService:
                 role="Members",
                 licence_key="MEMB-1234-5678-ABCD"
             )
+        assert licence_repo.find_licence_by_key("MEMB-1234-5678-ABCD").owner_id is None
+    
+    def test_orphaned_licence_claims_are_released(self, test_db, licence_repo, sample_member_user):
+        """Test licences claimed for a user id no user has are freed once the grace period is over."""
+        # Arrange
+        two_hours_ago = datetime.now(timezone.utc) - timedelta(hours=2)
+        licence_repo.create_licence(Licence(key="MEMB-0000-0000-OLD1", owner_id=ObjectId.from_datetime(two_hours_ago), role="Members"))
+        licence_repo.create_licence(Licence(key="MEMB-0000-0000-NEW1", owner_id=ObjectId(), role="Members"))
+        licence_repo.create_licence(Licence(key="MEMB-0000-0000-USED", owner_id=sample_member_user._id, role="Members"))
+        
+        # Act
+        released = release_orphaned_licences(test_db, grace_seconds=3600)
+        
+        # Assert
+        assert released == 1
+        assert licence_repo.find_licence_by_key("MEMB-0000-0000-OLD1").owner_id is None
+        assert licence_repo.find_licence_by_key("MEMB-0000-0000-NEW1").owner_id is not None
+        assert licence_repo.find_licence_by_key("MEMB-0000-0000-USED").owner_id == sample_member_user._id
     
     def test_signup_fail_missing_licence_key(self, user_repo, licence_repo):
         """Test signup fails without licence key."""
@@ -187,6 +218,37 @@ class TestAuthService:
                 licence_key="MEMB-1234-5678-ABCD"
             )
     
+    def test_signup_two_round_trips(self, user_repo, licence_repo):
+        """Test signup claims the licence and inserts the user in two round trips."""
+        # Arrange
+        licence = Licence(key="MEMB-1234-5678-ABCD", owner_id=None, role="Members")
+        licence_repo.create_licence(licence)
+        auth_service = AuthService(user_repo=user_repo, licence_service=LicenceService(licence_repo))
+        
+        # Act
+        with UnitOfWork() as unit_of_work:
+            user_id, _ = auth_service.signup("newuser", "password123", "user@test.com", "Members", "MEMB-1234-5678-ABCD")
+        
+        # Assert
+        assert unit_of_work.round_trips == 2
+        assert licence_repo.find_licence_by_key("MEMB-1234-5678-ABCD").owner_id == user_id
+    
+    def test_signup_duplicate_username_releases_licence(self, user_repo, licence_repo, sample_member_user):
+        """Test a signup rejected by the unique username index gives its licence back."""
+        # Arrange
+        licence = Licence(key="MEMB-1234-5678-ABCD", owner_id=None, role="Members")
+        licence_repo.create_licence(licence)
+        auth_service = AuthService(user_repo=user_repo, licence_service=LicenceService(licence_repo))
+        
+        # Act
+        with pytest.raises(ValueError, match="already exists"):
+            auth_service.signup(sample_member_user.username, "password123", "other@test.com", "Members", "MEMB-1234-5678-ABCD")
+        
+        # Assert
+        assert licence_repo.find_licence_by_key("MEMB-1234-5678-ABCD").owner_id is None
+        user_id, _ = auth_service.signup("newuser", "password123", "other@test.com", "Members", "MEMB-1234-5678-ABCD")
+        assert licence_repo.find_licence_by_key("MEMB-1234-5678-ABCD").owner_id == user_id
+    
     def test_login_success(self, user_repo, sample_member_user):
         """Test successful login."""
         # Arrange
@@ -242,7 +304,7 @@ class TestAuthService:
         assert user is None
     
     def test_password_hashing_consistency(self):
-        """Test password hashing produces consistent results."""
+        """Test hashes of the same password differ by salt but both verify."""
         # Arrange
         password = "testpassword123"
         
@@ -251,7 +313,10 @@ class TestAuthService:
         hash2 = UserRepository.hash_password(password)
         
         # Assert
-        assert hash1 == hash2
+        assert hash1 != hash2
+        assert UserRepository.verify_password(password, hash1)
+        assert UserRepository.verify_password(password, hash2)
+        assert not UserRepository.verify_password("wrongpassword", hash1)
     
     def test_password_hashing_different_passwords(self):
         """Test different passwords produce different hashes."""
@@ -265,3 +330,305 @@ class TestAuthService:
         
         # Assert
         assert hash1 != hash2
+
+    def test_password_hasher_schemes_and_rehash(self):
+        """Test every scheme verifies against one hasher and only the configured cost needs no rehash."""
+        # Arrange
+        hasher = PasswordHasher("scrypt", "n=1024,r=8,p=1")
+        pbkdf2_hash = PasswordHasher("pbkdf2_sha256", "i=1000").hash("secret")
+        legacy_hash = hashlib.sha256(b"secret").hexdigest()
+        current_hash = hasher.hash("secret")
+        
+        # Act
+        verified = hasher.verify_many([("secret", pbkdf2_hash), ("secret", legacy_hash), ("secret", current_hash), ("wrong", current_hash)])
+        
+        # Assert
+        assert verified == [True, True, True, False]
+        assert current_hash.startswith("scrypt$n=1024,r=8,p=1$")
+        assert hasher.needs_rehash(pbkdf2_hash)
+        assert hasher.needs_rehash(legacy_hash)
+        assert not hasher.needs_rehash(current_hash)
+        assert not hasher.verify("secret", "scrypt$garbage")
+    
+    def test_calibrate_hash_reports_cost(self):
+        """Test calibration returns parameters a hasher accepts."""
+        # Act
+        params, milliseconds = calibrate("pbkdf2_sha256", target_ms=5, samples=1)
+        
+        # Assert
+        assert params["i"] >= 1000
+        assert milliseconds > 0
+        assert PasswordHasher("pbkdf2_sha256", params).hash("x").startswith(f"pbkdf2_sha256$i={params['i']}$")
+    
+    def test_login_upgrades_legacy_hash(self, user_repo):
+        """Test a user stored with an unsalted SHA-256 hash can log in and gets a current hash."""
+        # Arrange
+        user = Members(username="legacyuser", password_hash=hashlib.sha256(b"oldpassword").hexdigest(), email="legacy@test.com")
+        user_id = user_repo.create_new_user(user)
+        auth_service = AuthService(user_repo=user_repo)
+        
+        # Act
+        auth_service.login("legacyuser", "oldpassword")
+        
+        # Assert
+        stored = user_repo.find_user_by_id(user_id, include_password_hash=True).password_hash
+        assert not UserRepository.password_needs_rehash(stored)
+        assert auth_service.login("legacyuser", "oldpassword").username == "legacyuser"
+        with pytest.raises(ValueError, match="Invalid password"):
+            auth_service.login("legacyuser", "wrongpassword")
+    
+    def test_user_lookups_served_from_cache(self, user_repo, sample_boss_user):
+        """Test repeated lookups by id and username share one cached document."""
+        # Act
+        by_id = user_repo.find_user_by_id(sample_boss_user._id)
+        by_name = user_repo.find_user_by_username(sample_boss_user.username)
+        user_repo.find_user_by_id(sample_boss_user._id)
+        
+        # Assert
+        assert by_id.username == by_name.username == "testboss"
+        stats = user_repo.cache_stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 2
+    
+    def test_user_cache_excludes_password_hash(self, user_repo, sample_boss_user):
+        """Test cached users carry no password hash unless explicitly requested."""
+        # Act
+        cached_user = user_repo.find_user_by_username(sample_boss_user.username)
+        verified_user = user_repo.find_user_by_username(sample_boss_user.username, include_password_hash=True)
+        
+        # Assert
+        assert cached_user.password_hash is None
+        assert verified_user.password_hash == sample_boss_user.password_hash
+        assert all(doc.get("password_hash") is None for doc in user_repo.cache.values())
+    
+    def test_user_cache_invalidation(self, user_repo, sample_boss_user):
+        """Test invalidation forces the next lookup back to the database."""
+        # Arrange
+        user_repo.find_user_by_id(sample_boss_user._id)
+        
+        # Act
+        user_repo.invalidate_user(user_id=sample_boss_user._id)
+        user_repo.find_user_by_username(sample_boss_user.username)
+        
+        # Assert
+        assert user_repo.cache_stats()["misses"] == 2
+    
+    def test_user_cache_counts_per_call_site(self, adapter, sample_boss_user):
+        """Test hits and misses are attributed to the calling function."""
+        # Arrange
+        user_repo = UserRepository(adapter=adapter, cache=LRUCache(max_size=8))
+        
+        def lookup_owner():
+            return user_repo.find_user_by_id(sample_boss_user._id)
+        
+        # Act
+        lookup_owner()
+        lookup_owner()
+        
+        # Assert
+        site_stats = [counts for site, counts in UserRepository.call_site_stats().items() if site.endswith("lookup_owner")]
+        assert site_stats == [{"hits": 1, "misses": 1}]
+
+
+
+class TestUserImport:
+    """Test suite for the bulk import-users command."""
+
+    def test_iter_user_rows_reads_csv_and_ndjson(self, tmp_path):
+        """Test CSV and NDJSON user files yield the same rows."""
+        # Arrange
+        csv_path = tmp_path / "users.csv"
+        csv_path.write_text("username,email,licence\nalice,alice@test.com,IMPT-0000-0000-0001\n")
+        ndjson_path = tmp_path / "users.ndjson"
+        ndjson_path.write_text('{"username": "alice", "email": "alice@test.com", "licence": "IMPT-0000-0000-0001"}\n')
+        
+        # Act
+        csv_rows = list(iter_user_rows(str(csv_path)))
+        ndjson_rows = list(iter_user_rows(str(ndjson_path)))
+        
+        # Assert
+        assert csv_rows == ndjson_rows == [{"username": "alice", "email": "alice@test.com", "licence": "IMPT-0000-0000-0001"}]
+
+    def test_import_row_with_non_string_fields(self):
+        """Test numbers in a JSON row are read as text and other non-strings are rejected with a ValueError."""
+        # Act
+        row = UserImportService._normalize_row(1, {"username": 123, "email": "n@test.com", "licence": "IMPT-0000-0000-0001", "password": 4567})
+        
+        # Assert
+        assert row["username"] == "123"
+        assert row["password"] == "4567"
+        with pytest.raises(ValueError, match="'email' must be text"):
+            UserImportService._normalize_row(2, {"username": "bob", "email": ["bob@test.com"], "licence": "IMPT-0000-0000-0002"})
+
+    def test_import_users_requires_boss(self, user_repo, licence_repo):
+        """Test only the Boss may import users."""
+        import_service = UserImportService(user_repo, LicenceService(licence_repo=licence_repo))
+        
+        with pytest.raises(PermissionError):
+            list(import_service.import_users([], "Hashira"))
+
+    def test_import_users_reports_every_row(self, user_repo, licence_repo, sample_member_user):
+        """Test a batch creates valid users and reports why the other rows failed."""
+        # Arrange
+        licence_repo.create_licence(Licence(key="IMPT-0000-0000-0001", role="Hashira"))
+        licence_repo.create_licence(Licence(key="IMPT-0000-0000-0002", role="Members"))
+        licence_repo.create_licence(Licence(key="IMPT-0000-0000-0003", role="Members"))
+        licence_repo.create_licence(Licence(key="IMPT-0000-0000-0004", role="Members", owner_id=ObjectId()))
+        rows = [
+            {"username": "alice", "email": "alice@test.com", "licence": "IMPT-0000-0000-0001", "password": "secret1"},
+            {"username": "bob", "email": "not-an-email", "licence": "IMPT-0000-0000-0002"},
+            {"username": "testmember", "email": "dup@test.com", "licence": "IMPT-0000-0000-0002"},
+            {"username": "carol", "email": "carol@test.com", "licence": "IMPT-0000-0000-0004"},
+            {"username": "dave", "email": "dave@test.com", "licence": "IMPT-0000-0000-0003"},
+        ]
+        import_service = UserImportService(user_repo, LicenceService(licence_repo=licence_repo))
+        
+        # Act
+        results = list(import_service.import_users(rows, "Boss", workers=1))
+        
+        # Assert
+        assert [result["status"] for result in results] == ["created", "failed", "failed", "failed", "created"]
+        assert results[0]["role"] == "Hashira" and results[0]["password"] is None
+        assert "email" in results[1]["message"]
+        assert "already exists" in results[2]["message"]
+        assert "already been used" in results[3]["message"]
+        generated_password = results[4]["password"]
+        assert AuthService(user_repo=user_repo).login("dave", generated_password).role == "Members"
+        assert user_repo.find_user_by_username("alice").role == "Hashira"
+        # The licence of the duplicate username was given back
+        assert licence_repo.find_licence_by_key("IMPT-0000-0000-0002").owner_id is None
+
+    def test_import_users_round_trips_per_batch(self, user_repo, licence_repo):
+        """Test a batch costs a fixed number of round trips however many rows it holds."""
+        # Arrange
+        rows = []
+        for i in range(20):
+            key = f"BULK-0000-0000-{i:04d}"
+            licence_repo.create_licence(Licence(key=key, role="Members"))
+            rows.append({"username": f"bulk{i}", "email": f"bulk{i}@test.com", "licence": key, "password": "pw"})
+        import_service = UserImportService(user_repo, LicenceService(licence_repo=licence_repo))
+        
+        # Act
+        with UnitOfWork() as unit_of_work:
+            results = list(import_service.import_users(rows, "Boss", batch_size=20, workers=1))
+        
+        # Assert
+        assert all(result["status"] == "created" for result in results)
+        # Bulk claim, lookup of the claimed keys and one insert_many
+        assert unit_of_work.round_trips == 3
+
+    def test_import_users_hashes_only_claimed_rows(self, user_repo, licence_repo, monkeypatch):
+        """Test rows whose licence cannot be claimed fail without paying for a password hash."""
+        # Arrange
+        licence_repo.create_licence(Licence(key="HASH-0000-0000-0001", role="Members"))
+        rows = [
+            {"username": "hashed", "email": "hashed@test.com", "licence": "HASH-0000-0000-0001", "password": "pw1"},
+            {"username": "nokey", "email": "nokey@test.com", "licence": "HASH-0000-0000-9999", "password": "pw2"},
+        ]
+        hashed = []
+        hash_password = UserRepository.hash_password
+        monkeypatch.setattr(UserRepository, "hash_password", staticmethod(lambda password: hashed.append(password) or hash_password(password)))
+        import_service = UserImportService(user_repo, LicenceService(licence_repo=licence_repo))
+        
+        # Act
+        results = list(import_service.import_users(rows, "Boss", workers=1))
+        
+        # Assert
+        assert [result["status"] for result in results] == ["created", "failed"]
+        assert hashed == ["pw1"]
+
+    def test_import_users_command_writes_report(self, adapter, licence_repo, sample_boss_user, tmp_path, monkeypatch, capsys):
+        """Test import-users --report writes one CSV row per user and the command succeeds."""
+        # Arrange
+        licence_repo.create_licence(Licence(key="RPRT-0000-0000-0001", role="Members"))
+        users_path = tmp_path / "users.csv"
+        users_path.write_text("username,email,licence,password\nreported,reported@test.com,RPRT-0000-0000-0001,pw\nbad,bad@test.com,RPRT-0000-0000-9999,pw\n")
+        report_path = tmp_path / "report.csv"
+        monkeypatch.setattr(main, "context", AppContext(adapter))
+        monkeypatch.setattr(main, "current_user", sample_boss_user)
+        
+        # Act
+        main.execute_args(["import-users", "--file", str(users_path), "--report", str(report_path), "--workers", "1"])
+        capsys.readouterr()
+        
+        # Assert
+        with open(report_path, newline="", encoding="utf-8") as f:
+            report = list(csv.DictReader(f))
+        assert [row["username"] for row in report] == ["reported", "bad"]
+        assert [row["status"] for row in report] == ["created", "failed"]
+        assert main.context.failed_commands == 0
+
+
+class TestSessionService:
+    """Test suite for saved login sessions."""
+
+    def test_session_resumes_without_database(self, tmp_path):
+        """Test a fresh session is resumed from the token file alone."""
+        # Arrange
+        path = str(tmp_path / "session.token")
+        user = Members(username="sessionuser", password_hash=None, email="session@test.com", _id=ObjectId())
+        SessionService(path=path, secret="test-secret").start(user)
+        
+        # Act
+        with UnitOfWork() as unit_of_work:
+            resumed = SessionService(path=path, secret="test-secret").resume()
+        
+        # Assert
+        assert unit_of_work.round_trips == 0
+        assert resumed._id == user._id
+        assert resumed.username == "sessionuser"
+        assert resumed.role == "Members"
+
+    def test_session_rejects_tampered_or_expired_tokens(self, tmp_path, monkeypatch):
+        """Test a token with another signature, a modified payload or past its expiry is ignored."""
+        # Arrange
+        path = tmp_path / "session.token"
+        user = Members(username="sessionuser", password_hash=None, email="session@test.com", _id=ObjectId())
+        SessionService(path=str(path), secret="test-secret").start(user)
+        body, signature = path.read_text().split(".")
+        
+        # Act & Assert
+        assert SessionService(path=str(path), secret="other-secret").resume() is None
+        path.write_text(f"{body}x.{signature}")
+        assert SessionService(path=str(path), secret="test-secret").resume() is None
+        # A valid token, written an hour ago with a one minute lifetime
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now - 3600)
+        SessionService(path=str(path), secret="test-secret", ttl_seconds=60).start(user)
+        monkeypatch.setattr(time, "time", lambda: now - 3590)
+        assert SessionService(path=str(path), secret="test-secret", ttl_seconds=60).resume() is not None
+        monkeypatch.setattr(time, "time", lambda: now)
+        assert SessionService(path=str(path), secret="test-secret", ttl_seconds=60).resume() is None
+
+    def test_session_save_warning_goes_to_stderr(self, tmp_path, capsys):
+        """Test a session that cannot be saved warns on stderr, leaving stdout to the command output."""
+        # Arrange
+        # The parent "directory" is a file, so the token cannot be written
+        (tmp_path / "not-a-directory").write_text("")
+        path = tmp_path / "not-a-directory" / "session.token"
+        user = Members(username="sessionuser", password_hash=None, email="session@test.com", _id=ObjectId())
+        
+        # Act
+        SessionService(path=str(path), secret="test-secret").start(user)
+        
+        # Assert
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert "Could not save the session" in captured.err
+
+    def test_session_revalidates_role(self, tmp_path, user_repo, sample_hashira_user):
+        """Test an old session is checked against the database and ended when the role changed."""
+        # Arrange
+        path = str(tmp_path / "session.token")
+        SessionService(path=path, secret="test-secret").start(sample_hashira_user)
+        
+        # Act
+        resumed = SessionService(user_repo, path=path, secret="test-secret", revalidate_seconds=0).resume()
+        user_repo.adapter.update_one(UserRepository.COLLECTION_NAME, {"_id": sample_hashira_user._id}, {"role": "Members"})
+        user_repo.invalidate_user(user_id=sample_hashira_user._id)
+        ended = SessionService(user_repo, path=path, secret="test-secret", revalidate_seconds=0).resume()
+        
+        # Assert
+        assert resumed.role == "Hashira"
+        assert ended is None
+        assert SessionService(path=path, secret="test-secret").resume() is None
@@ -3,14 +3,35 @@ Performance benchmark tests for CLI Kanban system.
 Tests system performance under various load conditions.
 """
 import pytest
+import os
+import shutil
+import subprocess
 import time
+import tracemalloc
+from tabulate import tabulate
+import generate_licences
+from concurrent.futures import ThreadPoolExecutor
+from repositories.user_repository import UserRepository
+from repositories.licence_repository import LicenceRepository
+from utils.unit_of_work import UnitOfWork
+from utils.password_hasher import PasswordHasher
+from cli.app_context import AppContext
+from services.board_transfer_service import BoardTransferService, EXTENSIONS
+from repositories.task_repository import TaskRepository
+from workspace_dump import dump_workspace, restore_workspace
+from config import MONGO_URI
+import main
 from services.auth_services import AuthService
 from services.board_services import BoardService
 from services.task_service import TaskService
 from services.search_service import SearchService
 from services.licence_service import LicenceService
-from models.entities import Licence
-from bson import ObjectId
+from models.entities import Licence, Task
+from cli.board_renderer import BoardRenderer
+from cli.record_writer import RecordWriter, task_record, TASK_FIELDS
+from repositories.mongodb_adapter import MongoDBAdapter
+from bson import ObjectId, encode, decode_all
+from bson.codec_options import CodecOptions
 
 
 class TestPerformanceBenchmarks:
@@ -251,4 +272,358 @@ class TestPerformanceBenchmarks:
         print(f"\nPerformed {num_logins} logins in {duration:.3f}s")
         print(f"Average time per login: {avg_time_per_login:.4f}s")
         
-        assert avg_time_per_login < 1.0, "Login time too slow"
\ No newline at end of file
+        assert avg_time_per_login < 1.0, "Login time too slow"
+
+    def test_bulk_password_verification_thread_pool(self):
+        """Benchmark verifying many password hashes in a thread pool (the KDF releases the GIL)."""
+        # Arrange
+        hasher = PasswordHasher("scrypt", "n=4096,r=8,p=1")
+        pairs = [(f"password{i}", hasher.hash(f"password{i}")) for i in range(32)]
+        
+        # Act
+        start_time = time.perf_counter()
+        serial = [hasher.verify(password, encoded) for password, encoded in pairs]
+        serial_duration = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        parallel = hasher.verify_many(pairs)
+        parallel_duration = time.perf_counter() - start_time
+        
+        # Assert
+        print(f"\nVerified {len(pairs)} hashes: serial {serial_duration:.3f}s, thread pool {parallel_duration:.3f}s on {os.cpu_count()} CPUs")
+        
+        assert serial == parallel == [True] * len(pairs)
+        if (os.cpu_count() or 1) >= 4:
+            assert parallel_duration < serial_duration, "Thread pool verification did not run in parallel"
+
+    def test_literal_search_adversarial_keywords(self, user_repo, board_repo, task_repo, licence_repo):
+        """Benchmark literal search with ReDoS-style keywords stays bounded."""
+        # Arrange
+        licence = Licence(key="BOSS-REDO-1111-2222", owner_id=None, role="Boss")
+        licence_repo.create_licence(licence)
+        auth_service = AuthService(user_repo=user_repo, licence_service=LicenceService(licence_repo))
+        boss_id, _ = auth_service.signup("redosboss", "pass", "boss@redos.com", "Boss", "BOSS-REDO-1111-2222")
+        
+        board_service = BoardService(board_repo, task_repo, user_repo)
+        board_id = board_service.create_board("ReDoS Board", boss_id, "Boss")
+        
+        task_service = TaskService(task_repo)
+        num_tasks = 200
+        for i in range(num_tasks):
+            # Long runs of "a" followed by a mismatch are the worst case for nested quantifiers
+            task_service.create_task(
+                title=f"{'a' * 40}! {i}",
+                board_id=board_id,
+                column="TODO",
+                user_role="Boss",
+                description="a" * 200 + "!"
+            )
+        
+        search_service = SearchService(task_repo)
+        adversarial = ["(a+)+$", "(a|aa)*b", "(.*a){20}", "([a-z]+)*!x", "^(a?){40}a{40}$"]
+        
+        # Act
+        search_times = []
+        for keyword in adversarial:
+            start_time = time.time()
+            results = search_service.search_tasks(board_id, keyword)
+            end_time = time.time()
+            search_times.append(end_time - start_time)
+            assert results == []
+        
+        # Assert
+        max_search_time = max(search_times)
+        print(f"\nLiteral search over {num_tasks} tasks with {len(adversarial)} adversarial keywords")
+        print(f"Max search time: {max_search_time:.4f}s")
+        
+        assert max_search_time < 1.0, "Literal search with adversarial keyword too slow"
+
+    @pytest.mark.benchmark
+    def test_licence_generation_throughput(self, tmp_path):
+        """Benchmark minting licence keys to a manifest (set LICENCE_BENCHMARK_COUNT=10000000 for the full run)."""
+        # Arrange
+        count = int(os.getenv("LICENCE_BENCHMARK_COUNT", "200000"))
+        # The rate depends on the machine, LICENCE_BENCHMARK_MIN_RATE holds a machine to its own baseline
+        min_rate = float(os.getenv("LICENCE_BENCHMARK_MIN_RATE", "2000"))
+        manifest = tmp_path / "keys.ndjson"
+        
+        # Act
+        summary = generate_licences.generate_licences(count, manifest_path=str(manifest), insert=False, progress_every=0)
+        
+        # Assert
+        rate = summary["stored"] / summary["seconds"]
+        print(f"\nMinted {summary['stored']} keys in {summary['seconds']:.2f}s ({rate:,.0f} keys/s)")
+        print(f"Duplicates replaced: {summary['duplicates']}")
+        
+        assert summary["stored"] == count
+        assert rate > min_rate, "Licence generation too slow"
+
+    def test_concurrent_signup_contention(self, adapter, user_repo, licence_repo):
+        """Benchmark concurrent signups racing for fewer licences than users."""
+        # Arrange
+        num_licences = 20
+        num_attempts = 80
+        for i in range(num_licences):
+            licence_repo.create_licence(Licence(key=f"RACE-{i:04d}-AAAA-BBBB", owner_id=None, role="Members"))
+        auth_service = AuthService(user_repo=user_repo, licence_service=LicenceService(licence_repo))
+        
+        def attempt(i):
+            # Four users race for every licence
+            with UnitOfWork() as unit_of_work:
+                started = time.perf_counter()
+                try:
+                    user_id, _ = auth_service.signup(
+                        username=f"racer{i}",
+                        password="password123",
+                        email=f"racer{i}@test.com",
+                        role="Members",
+                        licence_key=f"RACE-{i % num_licences:04d}-AAAA-BBBB",
+                    )
+                except ValueError:
+                    user_id = None
+                elapsed = time.perf_counter() - started
+            return user_id, elapsed, unit_of_work.round_trips
+        
+        # Act
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(attempt, range(num_attempts)))
+        duration = time.time() - start_time
+        
+        # Assert
+        winners = [(user_id, elapsed, trips) for user_id, elapsed, trips in results if user_id is not None]
+        owners = [doc["owner_id"] for doc in adapter.find_many(LicenceRepository.COLLECTION_NAME, {"key": {"$regex": "^RACE-"}})]
+        avg_latency = sum(elapsed for _, elapsed, _ in winners) / len(winners)
+        
+        print(f"\n{num_attempts} concurrent signups for {num_licences} licences in {duration:.3f}s")
+        print(f"Successful signups: {len(winners)}, average latency {avg_latency * 1000:.1f}ms")
+        
+        # Every licence has exactly one owner, and every owner is a created user
+        assert len(winners) == num_licences
+        assert sorted(owners) == sorted(user_id for user_id, _, _ in winners)
+        assert len(adapter.find_many(UserRepository.COLLECTION_NAME, {"username": {"$regex": "^racer"}})) == num_licences
+        # Successful signups cost two round trips (claim + insert)
+        assert all(trips == 2 for _, _, trips in winners)
+
+    def test_scripted_task_creation_vs_repl(self, adapter, task_repo, sample_boss_user, sample_board, monkeypatch, capsys):
+        """Benchmark a script of add-task lines against the same commands typed into the REPL (set SCRIPT_BENCHMARK_COUNT=10000 for the full run)."""
+        # Arrange
+        count = int(os.getenv("SCRIPT_BENCHMARK_COUNT", "1000"))
+        monkeypatch.setattr(main, "context", AppContext(adapter))
+        monkeypatch.setattr(main, "current_user", sample_boss_user)
+        
+        # Act - one execute_command per line, as the REPL does
+        start_time = time.perf_counter()
+        for i in range(count):
+            main.execute_command(f'add-task --board "{sample_board.name}" --title "Repl {i}"')
+        repl_duration = time.perf_counter() - start_time
+        
+        # Act - the same commands as a script, consecutive add-task lines are coalesced
+        script = [f'add-task --board "{sample_board.name}" --title "Script {i}" --priority high' for i in range(count)]
+        start_time = time.perf_counter()
+        main.run_script(script)
+        script_duration = time.perf_counter() - start_time
+        capsys.readouterr()
+        
+        # Assert
+        print(f"\n{count} add-task commands: REPL path {repl_duration:.2f}s ({count / repl_duration:,.0f}/s), "
+              f"script {script_duration:.2f}s ({count / script_duration:,.0f}/s)")
+        
+        titles = [task.title for task in task_repo.find_task_by_board(sample_board._id)]
+        assert len(titles) == 2 * count
+        assert main.context.failed_commands == 0
+        assert script_duration < repl_duration, "Scripted task creation not faster than the REPL path"
+
+    def test_board_export_throughput(self, adapter, board_repo, task_repo, sample_boss_user, sample_board, tmp_path):
+        """Benchmark streaming a large board to NDJSON and gzip (set EXPORT_BENCHMARK_COUNT=1000000 for the full run)."""
+        # Arrange
+        count = int(os.getenv("EXPORT_BENCHMARK_COUNT", "100000"))
+        transfer_service = BoardTransferService(board_repo, task_repo)
+        for start in range(0, count, 10000):
+            adapter.insert_many(TaskRepository.COLLECTION_NAME, [
+                {"title": f"Task {i}", "board_id": sample_board._id, "column": "TODO", "description": "Benchmark task",
+                 "due_date": None, "priority": "medium", "priority_rank": 2, "assigned_to": None, "rank": f"V{i}"}
+                for i in range(start, min(start + 10000, count))
+            ])
+        
+        # Act
+        timings = {}
+        for compression in ["none", "gzip"]:
+            path = str(tmp_path / f"board{EXTENSIONS[compression]}")
+            start_time = time.perf_counter()
+            exported = transfer_service.export_board(sample_board, path, compression)
+            timings[compression] = (time.perf_counter() - start_time, os.path.getsize(path))
+            assert exported == count
+        start_time = time.perf_counter()
+        _, imported = transfer_service.import_board(str(tmp_path / "board.ndjson.gz"), sample_boss_user._id, "Boss",
+                                                    name="Imported", batch_size=1000)
+        import_duration = time.perf_counter() - start_time
+        
+        # Assert
+        for compression, (duration, size) in timings.items():
+            print(f"\nExported {count} tasks ({compression}) in {duration:.2f}s: {count / duration:,.0f} tasks/s, {size / 1e6:.1f} MB")
+        print(f"Imported {imported} tasks in {import_duration:.2f}s: {imported / import_duration:,.0f} tasks/s")
+        assert imported == count
+
+    def test_raw_dump_restore_vs_mongodump(self, test_db, adapter, sample_board, tmp_path):
+        """Benchmark the raw BSON dump/restore against mongodump/mongorestore when they are installed (DUMP_BENCHMARK_COUNT sets the size)."""
+        # Arrange
+        count = int(os.getenv("DUMP_BENCHMARK_COUNT", "200000"))
+        for start in range(0, count, 10000):
+            adapter.insert_many(TaskRepository.COLLECTION_NAME, [
+                {"title": f"Task {i}", "board_id": sample_board._id, "column": "TODO", "description": "Benchmark task",
+                 "due_date": None, "priority": "medium", "priority_rank": 2, "assigned_to": None, "rank": f"V{i}"}
+                for i in range(start, min(start + 10000, count))
+            ])
+        target = test_db.client[f"{test_db.name}-restore"]
+        path = str(tmp_path / "workspace.kbdump")
+        timings = {}
+        
+        try:
+            # Act
+            start_time = time.perf_counter()
+            dump_workspace(path, db=test_db)
+            timings["raw dump"] = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            restored = restore_workspace(path, db=target)
+            timings["raw restore"] = time.perf_counter() - start_time
+            
+            if shutil.which("mongodump") and shutil.which("mongorestore"):
+                archive = str(tmp_path / "workspace.archive")
+                start_time = time.perf_counter()
+                subprocess.run(["mongodump", f"--uri={MONGO_URI}", f"--db={test_db.name}", f"--archive={archive}", "--quiet"], check=True)
+                timings["mongodump"] = time.perf_counter() - start_time
+                start_time = time.perf_counter()
+                subprocess.run(["mongorestore", f"--uri={MONGO_URI}", f"--archive={archive}", "--drop", "--quiet",
+                                f"--nsFrom={test_db.name}.*", f"--nsTo={target.name}.*"], check=True)
+                timings["mongorestore"] = time.perf_counter() - start_time
+            else:
+                print("\nmongodump/mongorestore not installed, only the raw dump is measured")
+            
+            # Assert
+            print(f"\nWorkspace of {count} tasks, archive {os.path.getsize(path) / 1e6:.1f} MB")
+            for name, duration in timings.items():
+                print(f"{name}: {duration:.2f}s ({count / duration:,.0f} tasks/s)")
+            assert restored["tasks"] == count
+            assert target[TaskRepository.COLLECTION_NAME].count_documents({}) == count
+        finally:
+            test_db.client.drop_database(target.name)
+
+    def test_board_renderer_vs_tabulate(self):
+        """Benchmark render time and peak memory of the streaming renderer against the tabulate grid (RENDER_BENCHMARK_COUNTS=1000,10000,100000)."""
+        # Arrange
+        counts = [int(count) for count in os.getenv("RENDER_BENCHMARK_COUNTS", "1000,10000").split(",")]
+        columns = ["TODO", "DOING", "DONE"]
+        board_id = ObjectId()
+        
+        def tasks(column, count):
+            return (Task(f"{column} task number {i}", board_id, column, priority="high", due_date="2025-01-01") for i in range(count))
+        
+        def tabulate_board(out, tasks_by_column):
+            # The previous print_board_view: a full matrix of cell strings, then tabulate
+            tasks_by_column = {column: list(tasks) for column, tasks in tasks_by_column.items()}
+            table_data = []
+            for row_idx in range(max(len(tasks) for tasks in tasks_by_column.values())):
+                row = []
+                for column in columns:
+                    column_tasks = tasks_by_column[column]
+                    if row_idx < len(column_tasks):
+                        task = column_tasks[row_idx]
+                        row.append(f"• {task.title}\n  [{task.priority.upper()}] | Due: 2025-01-01")
+                    else:
+                        row.append("")
+                table_data.append(row)
+            out.write(tabulate(table_data, headers=columns, tablefmt="grid"))
+        
+        # Timed and traced in separate runs, tracemalloc slows everything down several times
+        def measure(render, count):
+            with open(os.devnull, "w", encoding="utf-8") as out:
+                start_time = time.perf_counter()
+                render(out, {column: tasks(column, count // len(columns)) for column in columns})
+                duration = time.perf_counter() - start_time
+                tracemalloc.start()
+                render(out, {column: tasks(column, count // len(columns)) for column in columns})
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            return duration, peak
+        
+        # Act & Assert
+        for count in counts:
+            streamed = measure(lambda out, tasks_by_column: BoardRenderer(width=120, out=out).render("Bench", columns, tasks_by_column), count)
+            tabulated = measure(tabulate_board, count)
+            print(f"\n{count} tasks: renderer {streamed[0]:.3f}s / {streamed[1] / 1e6:.2f} MB peak, "
+                  f"tabulate {tabulated[0]:.3f}s / {tabulated[1] / 1e6:.1f} MB peak")
+            assert streamed[0] < tabulated[0], "Streaming renderer not faster than tabulate"
+            assert streamed[1] < tabulated[1], "Streaming renderer used more memory than tabulate"
+
+    def test_jsonl_output_starts_immediately(self):
+        """Benchmark time to the first jsonl/csv record against the whole stream for a large board (OUTPUT_BENCHMARK_COUNT)."""
+        # Arrange
+        count = int(os.getenv("OUTPUT_BENCHMARK_COUNT", "100000"))
+        board_id = ObjectId()
+        
+        class TimedSink:
+            # Notes when the first flush happens, i.e. when a reader on a pipe would see output
+            def __init__(self):
+                self.first_flush = None
+                self.size = 0
+            def write(self, text):
+                self.size += len(text)
+            def flush(self):
+                if self.first_flush is None:
+                    self.first_flush = time.perf_counter()
+        
+        def records():
+            for i in range(count):
+                yield task_record(Task(f"Task {i}", board_id, "TODO", due_date="2025-01-01", _id=ObjectId()), "Bench")
+        
+        # Act & Assert
+        for output in ["jsonl", "csv"]:
+            sink = TimedSink()
+            start_time = time.perf_counter()
+            written = RecordWriter(output, TASK_FIELDS, out=sink).write_all(records())
+            duration = time.perf_counter() - start_time
+            first = sink.first_flush - start_time
+            print(f"\n{output}: {written} records in {duration:.2f}s ({written / duration:,.0f}/s), "
+                  f"first record after {first * 1000:.2f}ms, {sink.size / 1e6:.1f} MB")
+            assert written == count
+            assert first < duration / 100, "Output did not start until most of the stream was built"
+    
+    @pytest.mark.benchmark
+    def test_command_stats_overhead(self, monkeypatch):
+        """Benchmark the cost of per-command statistics and of measured reads (set STATS_BENCHMARK_COUNT=100000 for the full run)."""
+        # Arrange
+        count = int(os.getenv("STATS_BENCHMARK_COUNT", "10000"))
+        monkeypatch.setattr(main, "context", AppContext())
+        batches = [
+            b"".join(encode({"_id": ObjectId(), "title": f"Task {i}", "column": "TODO", "rank": "V"}) for i in range(1000))
+            for _ in range(100)
+        ]
+        
+        def run_commands(enabled):
+            monkeypatch.setattr(main, "COMMAND_STATS_ENABLED", enabled)
+            start_time = time.perf_counter()
+            for _ in range(count):
+                main.run_in_unit_of_work("view-board", lambda: None)
+            return time.perf_counter() - start_time
+        
+        # Act
+        without_stats = run_commands(False)
+        with_stats = run_commands(True)
+        start_time = time.perf_counter()
+        plain = sum(len(decode_all(batch)) for batch in batches)
+        plain_duration = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        with UnitOfWork() as unit_of_work:
+            measured = sum(1 for _ in MongoDBAdapter._read_batches(batches, CodecOptions()))
+        measured_duration = time.perf_counter() - start_time
+        
+        # Assert
+        overhead = (with_stats - without_stats) / count * 1e6
+        print(f"\n{count} commands: {without_stats:.2f}s without stats, {with_stats:.2f}s with stats ({overhead:.1f}us per command)")
+        print(f"{plain} documents: decode_all {plain_duration:.3f}s, measured reads {measured_duration:.3f}s")
+        assert main.context.command_stats.snapshot()["view-board"]["count"] == count
+        assert measured == plain == unit_of_work.documents
+        assert unit_of_work.bytes_decoded == sum(len(batch) for batch in batches)
+        # Loose bounds, they catch a regression by a multiple rather than timing noise on a busy machine
+        assert overhead < 100, "Recording statistics costs too much per command"
+        assert measured_duration < plain_duration * 2 + 0.1, "Measuring reads slows down decoding"
@@ -8,7 +8,18 @@ from repositories.board_repository import BoardRepository
 from repositories.task_repository import TaskRepository
 from repositories.user_repository import UserRepository
 from models.entities import Board, Task
+from utils.lru_cache import LRUCache
+from utils.unit_of_work import UnitOfWork
+from utils.view_cache import LocalViewCache
+from services.board_transfer_service import BoardTransferService, open_transfer_file
+from cli.board_renderer import BoardRenderer
+from cli.record_writer import RecordWriter, task_record, board_record, TASK_FIELDS
+from cli.formatter import OutputFormatter
+import csv
+import io
+import json
 from bson import ObjectId
+from datetime import datetime
 
 
 class TestBoardService:
@@ -224,3 +235,343 @@ class TestBoardService:
         
         # Assert
         assert board.columns == ["TODO", "DOING", "DONE"]
+
+    def test_board_lookups_served_from_cache(self, board_repo, sample_board, sample_boss_user):
+        """Test repeated board lookups by id and name hit the cache."""
+        # Act
+        for _ in range(3):
+            board_repo.find_board_by_id(sample_board._id)
+            board_repo.find_board_by_name(sample_board.name, sample_boss_user._id)
+            board_repo.find_boards_by_name(sample_board.name)
+        
+        # Assert
+        stats = board_repo.cache_stats()
+        assert stats["misses"] == 3
+        assert stats["hits"] == 6
+    
+    def test_board_cache_invalidated_on_create_and_delete(self, board_repo, task_repo, user_repo, sample_boss_user, sample_board):
+        """Test creating and deleting boards invalidates cached name lookups."""
+        # Arrange
+        board_service = BoardService(board_repo=board_repo, task_repo=task_repo, user_repo=user_repo)
+        assert len(board_repo.find_boards_by_name("Shared Name")) == 0
+        board_service.create_board("Shared Name", sample_boss_user._id, "Boss")
+        assert len(board_repo.find_boards_by_name("Shared Name")) == 1
+        
+        # Act
+        board_service.delete_board("Shared Name", sample_boss_user._id, "Boss")
+        
+        # Assert
+        assert board_repo.find_boards_by_name("Shared Name") == []
+        assert board_repo.find_board_by_name("Shared Name", sample_boss_user._id) is None
+    
+    def test_board_cache_validation_detects_external_change(self, adapter, sample_board):
+        """Test version validation reloads a board changed by another client."""
+        # Arrange
+        board_repo = BoardRepository(adapter=adapter, cache=LRUCache(max_size=8), validate_cache=True)
+        board_repo.find_board_by_id(sample_board._id)
+        # Another client deletes the board behind the cache's back
+        adapter.db[BoardRepository.COLLECTION_NAME].delete_one({"_id": sample_board._id})
+        
+        # Act
+        board = board_repo.find_board_by_id(sample_board._id)
+        
+        # Assert
+        assert board is None
+
+    def test_unit_of_work_identity_map(self, board_repo, user_repo, task_repo, sample_board, sample_boss_user):
+        """Test repeated loads in one unit of work return the same objects without extra queries."""
+        # Arrange
+        board_service = BoardService(board_repo=board_repo, task_repo=task_repo, user_repo=user_repo)
+        
+        # Act
+        with UnitOfWork() as unit_of_work:
+            board = board_service.get_board_by_name(sample_board.name, sample_boss_user._id)
+            visible = board_service.get_board_visible_to_user(sample_board.name, sample_boss_user._id, "Boss")
+            by_id = board_repo.find_board_by_id(sample_board._id)
+            owner = user_repo.find_user_by_id(sample_boss_user._id)
+            round_trips = unit_of_work.round_trips
+            owner_again = user_repo.find_user_by_id(sample_boss_user._id)
+        
+        # Assert
+        assert board is visible is by_id
+        assert owner is owner_again
+        assert unit_of_work.round_trips == round_trips
+        assert unit_of_work.identity_hits == 3
+        # Outside a unit of work every load builds a new object
+        assert board_repo.find_board_by_id(sample_board._id) is not board
+
+    def test_version_bumps_are_written_immediately(self, adapter, board_repo, sample_board):
+        """Test a version bump inside a unit of work reaches the database before the command ends."""
+        # Arrange
+        board_repo.find_board_by_id(sample_board._id)
+        
+        # Act
+        with UnitOfWork() as unit_of_work:
+            board_repo.bump_version(sample_board._id)
+            version_inside = board_repo.get_version(sample_board._id)
+            board_inside = board_repo.find_board_by_id(sample_board._id)
+        
+        # Assert
+        assert version_inside == 1
+        # The cached board was dropped by the bump
+        assert board_inside.version == 1
+        assert unit_of_work.round_trips == 3
+
+
+class TestLocalViewCache:
+    """Test suite for the on-disk board view cache."""
+
+    @staticmethod
+    def _view(name: str, version: int = 1):
+        board = Board(name=name, owner_id=ObjectId(), version=version, _id=ObjectId())
+        tasks_by_column = {
+            "TODO": [Task(title="Write docs", board_id=board._id, column="TODO", due_date="2025-03-01", rank="V", _id=ObjectId())],
+            "DOING": [],
+            "DONE": [],
+        }
+        return board, tasks_by_column
+
+    def test_view_cache_round_trip(self, tmp_path):
+        """Test a stored view loads back with its board version and tasks."""
+        # Arrange
+        view_cache = LocalViewCache(path=str(tmp_path / "views.sqlite3"))
+        board, tasks_by_column = self._view("Sprint", version=7)
+        
+        # Act
+        view_cache.put(board, "rank", tasks_by_column)
+        cached_board, cached_tasks = view_cache.get(board._id, "rank")
+        
+        # Assert
+        assert cached_board._id == board._id
+        assert cached_board.version == 7
+        assert cached_tasks["TODO"][0].title == "Write docs"
+        assert cached_tasks["TODO"][0].due_date == tasks_by_column["TODO"][0].due_date
+        assert view_cache.get(board._id, "priority") is None
+
+    def test_view_cache_keyed_by_board_id(self, tmp_path):
+        """Test boards of different owners with the same name never share a cached view."""
+        # Arrange
+        view_cache = LocalViewCache(path=str(tmp_path / "views.sqlite3"))
+        board, tasks_by_column = self._view("Sprint")
+        other_board, _ = self._view("Sprint")
+        
+        # Act
+        view_cache.put(board, "rank", tasks_by_column)
+        
+        # Assert
+        assert view_cache.get(other_board._id, "rank") is None
+        assert view_cache.get(board._id, "rank") is not None
+        view_cache.invalidate(board._id)
+        assert view_cache.get(board._id, "rank") is None
+
+    def test_view_cache_evicts_least_recently_viewed(self, tmp_path):
+        """Test boards beyond the size limit are evicted, least recently viewed first."""
+        # Arrange
+        view_cache = LocalViewCache(path=str(tmp_path / "views.sqlite3"), max_boards=2)
+        boards = {}
+        for name in ["A", "B"]:
+            boards[name], tasks_by_column = self._view(name)
+            view_cache.put(boards[name], "rank", tasks_by_column)
+        view_cache.get(boards["A"]._id, "rank")
+        boards["C"], tasks_by_column = self._view("C")
+        
+        # Act
+        view_cache.put(boards["C"], "rank", tasks_by_column)
+        
+        # Assert
+        assert view_cache.get(boards["A"]._id, "rank") is not None
+        assert view_cache.get(boards["B"]._id, "rank") is None
+        assert view_cache.get(boards["C"]._id, "rank") is not None
+
+    def test_view_cache_corrupt_file_is_a_miss(self, tmp_path):
+        """Test an unreadable cache file never fails the command."""
+        # Arrange
+        path = tmp_path / "views.sqlite3"
+        path.write_bytes(b"not a database")
+        view_cache = LocalViewCache(path=str(path))
+        board, tasks_by_column = self._view("Sprint")
+        
+        # Act & Assert
+        assert view_cache.get(board._id, "rank") is None
+        view_cache.put(board, "rank", tasks_by_column)
+
+
+class TestBoardTransfer:
+    """Test suite for board export and import."""
+    
+    def test_export_import_round_trip(self, board_repo, task_repo, sample_boss_user, sample_board, tmp_path):
+        """Test a gzip export imports as a new board with new ids and the same task fields."""
+        # Arrange
+        transfer_service = BoardTransferService(board_repo, task_repo)
+        for i in range(25):
+            task_repo.create_task(Task(f"Task {i}", sample_board._id, ["TODO", "DOING", "DONE"][i % 3],
+                                       due_date=datetime(2025, 3, i + 1), priority="high", rank=f"V{i:02d}"))
+        path = str(tmp_path / "board.ndjson.gz")
+        
+        # Act
+        exported = transfer_service.export_board(sample_board, path)
+        board_id, imported = transfer_service.import_board(path, sample_boss_user._id, "Boss", name="Copy", batch_size=10)
+        
+        # Assert
+        assert exported == imported == 25
+        assert board_id != sample_board._id
+        original = sorted((t.title, t.column, t.due_date, t.rank) for t in task_repo.find_task_by_board(sample_board._id))
+        copies = task_repo.find_task_by_board(board_id)
+        assert sorted((t.title, t.column, t.due_date, t.rank) for t in copies) == original
+        assert not {t._id for t in copies} & {t._id for t in task_repo.find_task_by_board(sample_board._id)}
+        assert board_repo.find_board_by_name("Copy", sample_boss_user._id) is not None
+    
+    def test_import_rejects_bad_files_without_leftovers(self, board_repo, task_repo, sample_boss_user, sample_board, tmp_path):
+        """Test an invalid task line removes the partly imported board and non-Boss users cannot import."""
+        # Arrange
+        transfer_service = BoardTransferService(board_repo, task_repo)
+        task_repo.create_task(Task("Good", sample_board._id, "TODO"))
+        path = str(tmp_path / "board.ndjson")
+        transfer_service.export_board(sample_board, path)
+        with open_transfer_file(path, "a") as f:
+            f.write('{"title": "Bad", "column": "LATER"}\n')
+        
+        # Act & Assert
+        with pytest.raises(PermissionError):
+            transfer_service.import_board(path, sample_boss_user._id, "Hashira", name="Copy")
+        with pytest.raises(ValueError):
+            transfer_service.import_board(path, sample_boss_user._id, "Boss")
+        with pytest.raises(ValueError):
+            transfer_service.import_board(path, sample_boss_user._id, "Boss", name="Copy", batch_size=1)
+        assert board_repo.find_board_by_name("Copy", sample_boss_user._id) is None
+        assert len(task_repo.find_task_by_board(sample_board._id)) == 1
+    
+    def test_import_rejects_unknown_priority(self):
+        """Test an imported task line with an unknown priority is rejected like create_task does."""
+        # Arrange
+        board_id = ObjectId()
+        
+        # Act
+        task = BoardTransferService._imported_task('{"title": "Fine", "column": "TODO", "priority": "low"}', 1, board_id)
+        
+        # Assert
+        assert task.priority_rank == 2
+        with pytest.raises(ValueError, match="line 2.*Priority"):
+            BoardTransferService._imported_task('{"title": "Urgent", "column": "TODO", "priority": "urgent"}', 2, board_id)
+
+
+class TestBoardRenderer:
+    """Test suite for the streaming board renderer."""
+    
+    def test_render_fits_terminal_width(self):
+        """Test every line fits the width and long titles are cut with an ellipsis."""
+        # Arrange
+        board_id = ObjectId()
+        out = io.StringIO()
+        tasks_by_column = {
+            "TODO": [Task("A title much longer than any column of a hundred and twenty character terminal", board_id, "TODO")],
+            "DOING": iter([Task("Short", board_id, "DOING", priority="high", due_date="2025-05-01")]),
+        }
+        
+        # Act
+        rows = BoardRenderer(width=120, out=out).render("Sprint", ["TODO", "DOING", "DONE"], tasks_by_column)
+        
+        # Assert
+        lines = out.getvalue().splitlines()
+        assert rows == 1
+        assert max(len(line) for line in lines) <= 120
+        cells = [cell.strip() for line in lines for cell in line.split("|")]
+        assert any(cell.startswith("• A title much") and cell.endswith("…") for cell in cells)
+        assert any("[HIGH] | Due: 2025-05-01" in line for line in lines)
+    
+    def test_render_max_rows_footer(self):
+        """Test a row cap stops reading the columns and reports the hidden cards per column."""
+        # Arrange
+        board_id = ObjectId()
+        out = io.StringIO()
+        consumed = []
+        def column(name, count):
+            for i in range(count):
+                consumed.append(name)
+                yield Task(f"{name} {i}", board_id, name)
+        
+        # Act
+        rows = BoardRenderer(width=100, max_rows=3, out=out).render(
+            "Sprint", ["TODO", "DONE"], {"TODO": column("TODO", 10), "DONE": column("DONE", 2)}, totals={"TODO": 10, "DONE": 2}
+        )
+        
+        # Assert
+        assert rows == 3
+        assert "… 7 more" in out.getvalue()
+        assert "TODO 3" not in out.getvalue()
+        assert consumed.count("TODO") == 3
+
+
+class TestRecordWriter:
+    """Test suite for machine-readable output."""
+    
+    def _tasks(self):
+        board_id = ObjectId()
+        return [
+            Task('Quote "this", please', board_id, "TODO", due_date="2025-06-01", _id=ObjectId()),
+            Task("Ünïcode", board_id, "DONE", priority="high", _id=ObjectId()),
+        ]
+    
+    def test_json_and_jsonl_round_trip(self):
+        """Test json and jsonl output parse back to the same plain records, with ids and dates as strings."""
+        # Arrange
+        tasks = self._tasks()
+        records = [task_record(task, "Sprint") for task in tasks]
+        json_out, jsonl_out = io.StringIO(), io.StringIO()
+        
+        # Act
+        RecordWriter("json", out=json_out).write_all(iter(records))
+        count = RecordWriter("jsonl", out=jsonl_out).write_all(iter(records))
+        
+        # Assert
+        assert count == 2
+        assert json.loads(json_out.getvalue()) == records
+        assert [json.loads(line) for line in jsonl_out.getvalue().splitlines()] == records
+        assert records[0]["due_date"] == "2025-06-01"
+        assert records[0]["id"] == str(tasks[0]._id)
+    
+    def test_csv_output_and_empty_results(self):
+        """Test csv quotes values and writes the header even without records; an empty json list is valid JSON."""
+        # Arrange
+        tasks = self._tasks()
+        csv_out, empty_csv, empty_json = io.StringIO(), io.StringIO(), io.StringIO()
+        board = Board(name="Sprint", owner_id=ObjectId(), _id=ObjectId())
+        
+        # Act
+        RecordWriter("csv", TASK_FIELDS, out=csv_out).write_all(task_record(task, "Sprint") for task in tasks)
+        RecordWriter("csv", TASK_FIELDS, out=empty_csv).write_all([])
+        RecordWriter("json", out=empty_json).write_all([])
+        
+        # Assert
+        rows = list(csv.DictReader(io.StringIO(csv_out.getvalue())))
+        assert [row["title"] for row in rows] == ['Quote "this", please', "Ünïcode"]
+        assert rows[1]["due_date"] == ""
+        assert empty_csv.getvalue().strip() == ",".join(TASK_FIELDS)
+        assert json.loads(empty_json.getvalue()) == []
+        assert board_record(board)["columns"] == ["TODO", "DOING", "DONE"]
+        with pytest.raises(ValueError):
+            RecordWriter("table")
+    
+    def test_json_array_closed_when_records_fail(self, capsys):
+        """Test a failure mid-stream still leaves a valid JSON array, and the error goes to stderr."""
+        # Arrange
+        records = [task_record(task, "Sprint") for task in self._tasks()]
+        def failing_records():
+            yield records[0]
+            raise RuntimeError("cursor lost")
+        json_out = io.StringIO()
+        
+        # Act
+        with pytest.raises(RuntimeError):
+            RecordWriter("json", out=json_out).write_all(failing_records())
+        OutputFormatter.errors_to_stderr = True
+        try:
+            OutputFormatter.print_error("cursor lost")
+        finally:
+            OutputFormatter.errors_to_stderr = False
+        
+        # Assert
+        assert json.loads(json_out.getvalue()) == records[:1]
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert "cursor lost" in captured.err
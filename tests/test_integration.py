@@ -12,7 +12,12 @@ from repositories.user_repository import UserRepository
 from repositories.board_repository import BoardRepository
 from repositories.task_repository import TaskRepository
 from repositories.licence_repository import LicenceRepository
-from models.entities import Licence
+from models.entities import Licence, Task
+from setup_schema import ensure_schema, COLLECTION_SCHEMAS
+from workspace_dump import dump_workspace, restore_workspace
+from utils.command_stats import Histogram, CommandStats
+from utils.unit_of_work import UnitOfWork
+from cli.formatter import OutputFormatter
 from bson import ObjectId
 
 
@@ -313,3 +318,96 @@ class TestIntegrationWorkflows:
         # Boss can delete
         result = board_service.delete_board("Permission Test", boss_id, "Boss")
         assert result is True
+
+    def test_workspace_dump_and_restore(self, test_db, task_repo, sample_board, sample_task, licence_repo, tmp_path):
+        """Test a raw BSON dump restores every document, validator and index into another database."""
+        # Arrange
+        ensure_schema()
+        licence_repo.create_licence(Licence(key="DUMP-1111-2222-3333", owner_id=None, role="Hashira"))
+        for i in range(2500):
+            task_repo.create_task(Task(f"Dumped {i}", sample_board._id, "DOING"))
+        path = str(tmp_path / "workspace.kbdump")
+        target = test_db.client[f"{test_db.name}-restore"]
+        
+        try:
+            # Act
+            dumped = dump_workspace(path, db=test_db, batch_size=500)
+            restored = restore_workspace(path, db=target)
+            
+            # Assert
+            assert restored == dumped
+            assert dumped["tasks"] == 2501
+            for name in COLLECTION_SCHEMAS:
+                assert list(target[name].find().sort("_id", 1)) == list(test_db[name].find().sort("_id", 1))
+                assert set(target[name].index_information()) == set(test_db[name].index_information())
+                assert target.get_collection(name).options().get("validator") == test_db[name].options().get("validator")
+            # Restoring over existing data needs drop
+            with pytest.raises(ValueError):
+                restore_workspace(path, db=target)
+            assert restore_workspace(path, db=target, drop=True) == dumped
+        finally:
+            test_db.client.drop_database(target.name)
+    
+    def test_workspace_archive_corruption_detected(self, test_db, sample_task, tmp_path):
+        """Test a damaged archive is rejected before anything is written."""
+        # Arrange
+        path = tmp_path / "workspace.kbdump"
+        dump_workspace(str(path), db=test_db)
+        data = bytearray(path.read_bytes())
+        data[-10] ^= 0xFF
+        path.write_bytes(bytes(data))
+        target = test_db.client[f"{test_db.name}-restore"]
+        
+        try:
+            # Act & Assert
+            with pytest.raises(ValueError):
+                restore_workspace(str(path), db=target)
+            assert target.list_collection_names() == []
+        finally:
+            test_db.client.drop_database(target.name)
+
+
+class TestCommandStats:
+    """Test suite for per-command latency and round-trip statistics."""
+    
+    def test_histogram_percentiles_within_bucket_error(self):
+        """Test percentiles read from the log buckets stay within one bucket of the exact values."""
+        # Arrange
+        histogram = Histogram(smallest=0.01)
+        values = [i / 10 for i in range(1, 10001)]
+        
+        # Act
+        for value in values:
+            histogram.record(value)
+        summary = histogram.summary()
+        
+        # Assert
+        assert summary["count"] == 10000
+        assert summary["max"] == 1000.0
+        for percent, exact in [(50, 500.0), (95, 950.0), (99, 990.0)]:
+            assert exact <= summary[f"p{percent}"] <= exact * 2 ** (1 / Histogram.PER_OCTAVE)
+        assert sum(count for _, count in summary["buckets"]) == 10000
+        assert Histogram().percentile(99) == 0
+    
+    def test_adapter_reads_and_output_are_measured(self, adapter, sample_board, sample_task):
+        """Test a command records round trips, documents, bytes and output time, and reaches the stats."""
+        # Arrange
+        command_stats = CommandStats()
+        
+        # Act
+        with UnitOfWork() as unit_of_work:
+            documents = adapter.find_many("tasks", {"board_id": sample_board._id})
+            board = adapter.find_one("boards", {"_id": sample_board._id})
+            OutputFormatter.print_success(f"{len(documents)} tasks on {board['name']}")
+        command_stats.record("view-board", unit_of_work.measurements(0.005))
+        stats = command_stats.snapshot()
+        
+        # Assert
+        assert unit_of_work.round_trips == 2
+        assert unit_of_work.documents == len(documents) + 1
+        assert unit_of_work.bytes_decoded > 0
+        assert unit_of_work.database_seconds > 0
+        assert unit_of_work.output_seconds > 0
+        assert stats["view-board"]["count"] == 1
+        assert stats["view-board"]["documents"]["max"] == len(documents) + 1
+        assert command_stats.snapshot("search") == {}
@@ -7,6 +7,12 @@ from services.licence_service import LicenceService
 from repositories.licence_repository import LicenceRepository
 from models.entities import Licence
 from bson import ObjectId
+from datetime import datetime, timezone
+import setup_license_keys
+import generate_licences
+from utils.bloom_filter import BloomFilter
+from utils.unit_of_work import UnitOfWork
+from services.licence_key_filter import LicenceKeyFilter
 
 
 class TestLicenceService:
@@ -219,3 +225,302 @@ class TestLicenceService:
         # Cannot redeem again
         with pytest.raises(ValueError):
             licence_service.get_redeemable_licence("LIFE-1111-2222-3333")
+
+
+class TestLicenceSeeding:
+    """Test suite for streaming, batched licence seeding."""
+
+    def test_iter_json_items_streams_array_and_ndjson(self, tmp_path, monkeypatch):
+        """Test JSON arrays split across read chunks and NDJSON files yield the same items."""
+        # Arrange
+        monkeypatch.setattr(setup_license_keys, "READ_CHUNK_SIZE", 5)
+        array_path = tmp_path / "keys.json"
+        array_path.write_text(' [ "AAAA-1111-BBBB-2222",\n {"key": "CCCC-3333-DDDD-4444", "role": "Boss"} ] ')
+        ndjson_path = tmp_path / "keys.ndjson"
+        ndjson_path.write_text('"AAAA-1111-BBBB-2222"\n\n{"key": "CCCC-3333-DDDD-4444", "role": "Boss"}\n')
+        expected = [
+            {"key": "AAAA-1111-BBBB-2222", "role": "Members"},
+            {"key": "CCCC-3333-DDDD-4444", "role": "Boss"},
+        ]
+        
+        # Act & Assert
+        assert setup_license_keys.load_from_json(str(array_path)) == expected
+        assert setup_license_keys.load_from_json(str(ndjson_path)) == expected
+
+    def test_iter_json_items_rejects_unclosed_array(self, tmp_path):
+        """Test a truncated JSON array raises instead of silently stopping."""
+        path = tmp_path / "keys.json"
+        path.write_text('["AAAA-1111-BBBB-2222", "CCCC')
+        
+        with pytest.raises(ValueError):
+            list(setup_license_keys.iter_json_items(str(path)))
+
+    def test_iter_json_items_rejects_trailing_comma(self, tmp_path):
+        """Test a trailing comma in the array is rejected like json.loads does, an empty array is not."""
+        path = tmp_path / "keys.json"
+        path.write_text('["AAAA-1111-BBBB-2222", ]')
+        empty_path = tmp_path / "empty.json"
+        empty_path.write_text('[ ]')
+        
+        with pytest.raises(ValueError, match="Trailing"):
+            list(setup_license_keys.iter_json_items(str(path)))
+        assert list(setup_license_keys.iter_json_items(str(empty_path))) == []
+
+    def test_seed_keys_dry_run_validates_without_database(self):
+        """Test a dry run counts valid and invalid records without touching the database."""
+        records = ["AAAA-1111-BBBB-2222", {"key": "BAD"}, {"key": "CCCC-3333-DDDD-4444", "role": "King"}, 42]
+        
+        summary = setup_license_keys.seed_keys(records, dry_run=True, batch_size=2, progress_every=0)
+        
+        assert summary == {"inserted": 1, "skipped": 0, "errors": 3}
+
+    def test_create_licences_skips_duplicates(self, licence_repo, sample_licence):
+        """Test batched inserts count existing and repeated keys as duplicates."""
+        # Arrange
+        licence_service = LicenceService(licence_repo)
+        licences = [
+            licence_service.build_licence(key)
+            for key in [sample_licence.key, "NEWL-1111-2222-3333", "NEWL-1111-2222-3333", "NEWL-4444-5555-6666"]
+        ]
+        
+        # Act
+        result = licence_service.create_licences(licences)
+        
+        # Assert
+        assert result["inserted"] == 2
+        assert result["duplicates"] == 2
+        assert result["duplicate_indexes"] == [0, 2]
+        assert licence_repo.validate_licence("NEWL-4444-5555-6666") is True
+
+
+class TestLicenceKeyFilter:
+    """Test suite for the Bloom filter pre-check on licence keys."""
+
+    def test_unknown_key_rejected_without_query(self, licence_repo, sample_licence, tmp_path):
+        """Test keys missing from the filter are rejected without a database round trip."""
+        # Arrange
+        key_filter = LicenceKeyFilter(licence_repo, capacity=1000, snapshot_path=str(tmp_path / "keys.bloom"))
+        licence_service = LicenceService(licence_repo, key_filter=key_filter)
+        key_filter.warm_up()
+        
+        # Act
+        with UnitOfWork() as unit_of_work:
+            valid = licence_service.validate_licence("ZZZZ-0000-0000-0000")
+            with pytest.raises(ValueError, match="not found"):
+                licence_service.get_redeemable_licence("ZZZZ-0000-0000-0001")
+        
+        # Assert
+        assert valid is False
+        assert unit_of_work.round_trips == 0
+        assert licence_service.validate_licence(sample_licence.key) is True
+        stats = licence_service.key_filter_stats()
+        assert stats["rejected"] == 2
+        assert stats["passed"] == 1
+        assert stats["items"] == 1
+
+    def test_filter_snapshot_catches_up_on_new_keys(self, licence_repo, sample_licence, tmp_path):
+        """Test a filter loaded from a snapshot also knows keys created after the snapshot."""
+        # Arrange
+        snapshot_path = str(tmp_path / "keys.bloom")
+        LicenceKeyFilter(licence_repo, capacity=1000, snapshot_path=snapshot_path).warm_up()
+        # Created by another process after the snapshot was saved
+        licence_repo.create_licence(Licence(key="LATE-1111-2222-3333", owner_id=None, role="Members"))
+        
+        # Act
+        key_filter = LicenceKeyFilter(licence_repo, capacity=1000, snapshot_path=snapshot_path)
+        
+        # Assert
+        assert key_filter.might_contain(sample_licence.key) is True
+        assert key_filter.might_contain("LATE-1111-2222-3333") is True
+        assert key_filter.might_contain("NONE-1111-2222-3333") is False
+
+    def test_reset_filter_finds_keys_with_old_ids(self, licence_repo, sample_licence, tmp_path):
+        """Test a reset drops the snapshot and the rebuilt filter knows keys inserted with old ids, as a restore does."""
+        # Arrange
+        snapshot_path = tmp_path / "keys.bloom"
+        key_filter = LicenceKeyFilter(licence_repo, capacity=1000, refresh_seconds=0, snapshot_path=str(snapshot_path))
+        key_filter.warm_up()
+        restored = Licence(key="REST-1111-2222-3333", owner_id=None, role="Members")
+        restored._id = ObjectId.from_datetime(datetime(2020, 1, 1, tzinfo=timezone.utc))
+        licence_repo.create_licence(restored)
+        
+        # Act
+        missed_before_reset = key_filter.might_contain(restored.key)
+        key_filter.reset()
+        
+        # Assert
+        assert missed_before_reset is False
+        assert not snapshot_path.exists()
+        assert key_filter.might_contain(restored.key) is True
+
+    def test_key_created_by_another_process_not_rejected(self, licence_repo, sample_licence, tmp_path):
+        """Test a miss catches up before rejecting, so a key created elsewhere passes without waiting for the refresh."""
+        # Arrange
+        key_filter = LicenceKeyFilter(licence_repo, capacity=1000, refresh_seconds=3600, snapshot_path=str(tmp_path / "keys.bloom"))
+        key_filter.warm_up()
+        key_filter._refreshed_at -= LicenceKeyFilter.MISS_CATCH_UP_SECONDS
+        # Inserted straight into the collection, as setup_license_keys.py or another CLI would
+        licence_repo.create_licence(Licence(key="ELSE-1111-2222-3333", owner_id=None, role="Members"))
+        
+        # Act
+        found = key_filter.might_contain("ELSE-1111-2222-3333")
+        
+        # Assert
+        assert found is True
+        assert LicenceService(licence_repo, key_filter=key_filter).validate_licence("ELSE-1111-2222-3333") is True
+
+    def test_repeated_misses_read_only_new_licences(self, licence_repo, sample_licence, tmp_path, monkeypatch):
+        """Test misses after a bulk seed catch up from the newest licence read and only save a changed filter."""
+        # Arrange
+        key_filter = LicenceKeyFilter(licence_repo, capacity=1000, refresh_seconds=3600, snapshot_path=str(tmp_path / "keys.bloom"))
+        key_filter.warm_up()
+        licence_repo.create_licences([Licence(key=f"SEED-0000-0000-{i:04d}", owner_id=None, role="Members") for i in range(50)])
+        saves = []
+        monkeypatch.setattr(key_filter, "_save_snapshot", lambda: saves.append(1))
+        
+        # Act
+        key_filter._refreshed_at -= LicenceKeyFilter.MISS_CATCH_UP_SECONDS
+        first_miss = key_filter.might_contain("SEED-0000-0000-0007")
+        key_filter._refreshed_at -= LicenceKeyFilter.MISS_CATCH_UP_SECONDS
+        with UnitOfWork() as unit_of_work:
+            second_miss = key_filter.might_contain("NONE-1111-2222-3333")
+        
+        # Assert
+        assert first_miss is True
+        assert second_miss is False
+        assert unit_of_work.documents <= 1
+        assert len(saves) == 1
+
+    def test_created_licences_added_to_filter(self, licence_repo, tmp_path):
+        """Test licences created through the service pass the filter before any refresh."""
+        # Arrange
+        key_filter = LicenceKeyFilter(licence_repo, capacity=1000, refresh_seconds=3600, snapshot_path=str(tmp_path / "keys.bloom"))
+        licence_service = LicenceService(licence_repo, key_filter=key_filter)
+        key_filter.warm_up()
+        
+        # Act
+        licence_service.create_licence("NEWL-1111-2222-3333", role="Boss")
+        
+        # Assert
+        assert licence_service.validate_licence("NEWL-1111-2222-3333") is True
+
+class TestLicenceGeneration:
+    """Test suite for minting licence keys."""
+
+    def test_bloom_filter_membership_and_snapshot(self):
+        """Test added keys are always found, absent keys rarely, and snapshots round-trip."""
+        # Arrange
+        bloom = BloomFilter(capacity=5000, error_rate=0.01)
+        keys = [f"KEY{i:05d}" for i in range(5000)]
+        
+        # Act
+        added = [bloom.add(key) for key in keys]
+        false_positives = sum(f"MISS{i:05d}" in bloom for i in range(5000))
+        restored = BloomFilter.from_bytes(bloom.to_bytes())
+        
+        # Assert
+        assert sum(added) >= 4950
+        assert all(key in bloom for key in keys)
+        assert false_positives < 5000 * 0.03
+        assert all(key in restored for key in keys)
+        assert restored.stats() == bloom.stats()
+
+    def test_generated_keys_are_valid_and_unique(self, tmp_path):
+        """Test minted keys pass the licence format check and the manifest has no duplicates."""
+        # Arrange
+        manifest = tmp_path / "keys.ndjson"
+        
+        # Act
+        summary = generate_licences.generate_licences(2500, role="Hashira", workers=2, manifest_path=str(manifest), insert=False)
+        records = setup_license_keys.load_from_json(str(manifest))
+        
+        # Assert
+        assert summary["stored"] == 2500
+        assert len(records) == 2500
+        assert len({record["key"] for record in records}) == 2500
+        assert all(LicenceService._is_valid_format(record["key"]) for record in records)
+        assert all(record["role"] == "Hashira" for record in records)
+
+    def test_generated_keys_are_inserted(self, licence_repo, tmp_path):
+        """Test minted keys are stored in batches and can be redeemed."""
+        # Arrange
+        manifest = tmp_path / "keys.ndjson"
+        
+        # Act
+        summary = generate_licences.generate_licences(1200, role="Boss", workers=1, batch_size=500, manifest_path=str(manifest))
+        records = setup_license_keys.load_from_json(str(manifest))
+        
+        # Assert
+        assert summary["stored"] == 1200
+        licence = licence_repo.find_licence_by_key(records[-1]["key"])
+        assert licence.role == "Boss"
+        assert licence.owner_id is None
+
+
+class TestLicenceAllocation:
+    """Test suite for reserving free licences and per-role licence statistics."""
+
+    def test_reserve_next_licence_hands_out_oldest_free_key(self, licence_repo):
+        """Test reservations go to the oldest free key of the role and never repeat."""
+        # Arrange
+        licence_service = LicenceService(licence_repo=licence_repo)
+        licence_repo.create_licence(Licence(key="RSRV-0000-0000-0001", role="Hashira"))
+        licence_repo.create_licence(Licence(key="RSRV-0000-0000-0002", role="Members"))
+        licence_repo.create_licence(Licence(key="RSRV-0000-0000-0003", role="Hashira"))
+        licence_repo.assign_owner("RSRV-0000-0000-0001", ObjectId())
+        
+        # Act
+        with UnitOfWork() as unit_of_work:
+            first = licence_service.reserve_licence("Hashira", reserved_for="ticket-42")
+        
+        # Assert
+        assert unit_of_work.round_trips == 1
+        assert first.key == "RSRV-0000-0000-0003"
+        assert first.reserved_for == "ticket-42"
+        assert licence_repo.find_licence_by_key(first.key).reserved_at is not None
+        with pytest.raises(ValueError, match="No free 'Hashira' licences left"):
+            licence_service.reserve_licence("Hashira")
+
+    def test_reserved_licence_can_still_be_claimed(self, licence_repo):
+        """Test a reserved key is redeemed like any other unclaimed key."""
+        # Arrange
+        licence_service = LicenceService(licence_repo=licence_repo)
+        licence_repo.create_licence(Licence(key="RSRV-1111-1111-1111", role="Members"))
+        reserved = licence_service.reserve_licence("Members")
+        owner_id = ObjectId()
+        
+        # Act
+        claimed = licence_service.claim_licence(reserved.key, owner_id, "Members")
+        
+        # Assert
+        assert claimed.owner_id == owner_id
+
+    def test_licence_stats_counts_per_role_in_one_round_trip(self, licence_repo):
+        """Test claimed, unclaimed and reserved counts come from a single aggregation."""
+        # Arrange
+        licence_service = LicenceService(licence_repo=licence_repo)
+        licence_repo.create_licence(Licence(key="STAT-0000-0000-0001", role="Members"))
+        licence_repo.create_licence(Licence(key="STAT-0000-0000-0002", role="Members"))
+        licence_repo.create_licence(Licence(key="STAT-0000-0000-0003", role="Members"))
+        licence_repo.create_licence(Licence(key="STAT-0000-0000-0004", role="Boss"))
+        licence_repo.assign_owner("STAT-0000-0000-0001", ObjectId())
+        licence_service.reserve_licence("Members")
+        
+        # Act
+        with UnitOfWork() as unit_of_work:
+            stats = licence_service.licence_stats("Boss")
+        
+        # Assert
+        assert unit_of_work.round_trips == 1
+        assert stats["Members"] == {"claimed": 1, "unclaimed": 2, "reserved": 1}
+        assert stats["Boss"] == {"claimed": 0, "unclaimed": 1, "reserved": 0}
+        assert stats["Hashira"] == {"claimed": 0, "unclaimed": 0, "reserved": 0}
+
+    def test_licence_stats_requires_boss(self, licence_repo):
+        """Test only the Boss may view licence statistics."""
+        # Arrange
+        licence_service = LicenceService(licence_repo=licence_repo)
+        
+        # Act & Assert
+        with pytest.raises(PermissionError):
+            licence_service.licence_stats("Members")
@@ -4,9 +4,22 @@ Tests task searching functionality.
 """
 import pytest
 from services.search_service import SearchService
+from services.task_service import TaskService
 from repositories.task_repository import TaskRepository
+from utils.lru_cache import LRUCache
 from models.entities import Task
 from bson import ObjectId
+from itertools import product
+
+
+def plan_stages(plan) -> list:
+    """Collect the stage names of an explain plan, walking every nested input stage."""
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in plan_stages(item)]
+    if not isinstance(plan, dict):
+        return []
+    stages = [plan["stage"]] if "stage" in plan else []
+    return stages + [stage for value in plan.values() for stage in plan_stages(value)]
 
 
 class TestSearchService:
@@ -105,4 +118,227 @@ class TestSearchService:
         
         # Assert
         assert len(results) == 0
+
+    def test_search_repeated_keyword_hits_cache(self, task_repo, board_repo, sample_board):
+        """Test repeating a search is served from the cache."""
+        # Arrange
+        search_service = SearchService(task_repo=task_repo, board_repo=board_repo, cache=LRUCache(max_size=8))
+        task_repo.create_task(Task(title="Cached Task", board_id=sample_board._id, column="TODO"))
+        
+        # Act
+        first = search_service.search_tasks(sample_board._id, "cached")
+        second = search_service.search_tasks(sample_board._id, "CACHED")
+        
+        # Assert
+        assert len(first) == len(second) == 1
+        stats = search_service.cache_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+    
+    def test_search_cache_hits_are_fresh_tasks(self, task_repo, board_repo, sample_board):
+        """Test changing a returned task does not change what later cached searches return."""
+        # Arrange
+        search_service = SearchService(task_repo=task_repo, board_repo=board_repo, cache=LRUCache(max_size=8))
+        task_repo.create_task(Task(title="Shared Task", board_id=sample_board._id, column="TODO"))
+        first = search_service.search_tasks(sample_board._id, "shared")
+        
+        # Act
+        first[0].title = "Changed by caller"
+        second = search_service.search_tasks(sample_board._id, "shared")
+        second[0].column = "DONE"
+        third = search_service.search_tasks(sample_board._id, "shared")
+        
+        # Assert
+        assert search_service.cache_stats()["hits"] == 2
+        assert third[0].title == "Shared Task"
+        assert third[0].column == "TODO"
+        assert third[0] is not second[0]
+    
+    def test_search_cache_invalidated_by_task_write(self, task_repo, board_repo, sample_board):
+        """Test task writes through TaskService bump the board version so cached results are not stale."""
+        # Arrange
+        search_service = SearchService(task_repo=task_repo, board_repo=board_repo, cache=LRUCache(max_size=8))
+        task_service = TaskService(task_repo=task_repo, board_repo=board_repo)
+        task_id = task_service.create_task("Deploy service", sample_board._id, "TODO", "Boss")
+        assert len(search_service.search_tasks(sample_board._id, "Deploy")) == 1
+        
+        # Act
+        task_service.create_task("Deploy docs", sample_board._id, "TODO", "Boss")
+        after_create = search_service.search_tasks(sample_board._id, "Deploy")
+        task_service.delete_task(task_id, "Boss")
+        after_delete = search_service.search_tasks(sample_board._id, "Deploy")
+        
+        # Assert
+        assert len(after_create) == 2
+        assert len(after_delete) == 1
+        assert search_service.cache_stats()["hits"] == 0
     
+    def test_search_cache_evicts_least_recently_used(self):
+        """Test the cache stays bounded and counts evictions."""
+        # Arrange
+        cache = LRUCache(max_size=2)
+        
+        # Act
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        
+        # Assert
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.stats()["evictions"] == 1
+
+    def test_search_literal_mode_matches_punctuation(self, task_repo, sample_board):
+        """Test literal search treats regex metacharacters as plain text."""
+        # Arrange
+        search_service = SearchService(task_repo=task_repo, cache=LRUCache(max_size=8))
+        task_repo.create_task(Task(title="Upgrade C++ toolchain", board_id=sample_board._id, column="TODO"))
+        task_repo.create_task(Task(title="Upgrade C toolchain", board_id=sample_board._id, column="TODO"))
+        
+        # Act
+        results = search_service.search_tasks(sample_board._id, "C++")
+        dotted = search_service.search_tasks(sample_board._id, "C.")
+        
+        # Assert
+        assert [t.title for t in results] == ["Upgrade C++ toolchain"]
+        assert len(dotted) == 0
+    
+    def test_search_regex_mode_opt_in(self, task_repo, sample_board):
+        """Test regex mode interprets the keyword as a pattern."""
+        # Arrange
+        search_service = SearchService(task_repo=task_repo, cache=LRUCache(max_size=8))
+        task_repo.create_task(Task(title="Bug 101", board_id=sample_board._id, column="TODO"))
+        task_repo.create_task(Task(title="Bug report", board_id=sample_board._id, column="TODO"))
+        
+        # Act
+        results = search_service.search_tasks(sample_board._id, r"^bug \d+$", mode="regex")
+        
+        # Assert
+        assert [t.title for t in results] == ["Bug 101"]
+    
+    def test_search_regex_mode_invalid_pattern(self, task_repo, sample_board):
+        """Test an invalid regular expression is rejected before reaching the database."""
+        # Arrange
+        search_service = SearchService(task_repo=task_repo, cache=LRUCache(max_size=8))
+        
+        # Act & Assert
+        with pytest.raises(ValueError, match="Invalid regular expression"):
+            search_service.search_tasks(sample_board._id, "(unclosed", mode="regex")
+    
+    def test_search_prefix_mode(self, task_repo, sample_board):
+        """Test prefix search matches titles starting with the keyword, ignoring case."""
+        # Arrange
+        search_service = SearchService(task_repo=task_repo, cache=LRUCache(max_size=8))
+        task_repo.create_task(Task(title="Release v2", board_id=sample_board._id, column="TODO"))
+        task_repo.create_task(Task(title="Prepare release", board_id=sample_board._id, column="TODO"))
+        
+        # Act
+        results = search_service.search_tasks(sample_board._id, "release", mode="prefix")
+        
+        # Assert
+        assert [t.title for t in results] == ["Release v2"]
+    
+    def test_search_prefix_mode_uses_index(self, adapter, task_repo, sample_board):
+        """Test prefix search is answered from the board/title index instead of a collection scan."""
+        # Arrange
+        collection = adapter.db[TaskRepository.COLLECTION_NAME]
+        
+        # Act
+        plan = collection.find(
+            {"board_id": sample_board._id, "title": {"$gte": "rel", "$lt": "rel\uffff"}},
+            collation=TaskRepository.TITLE_COLLATION,
+        ).explain()
+        
+        # Assert
+        assert "IXSCAN" in str(plan["queryPlanner"]["winningPlan"])
+        assert "COLLSCAN" not in str(plan["queryPlanner"]["winningPlan"])
+
+    def test_filter_tasks_combined_criteria(self, task_repo, sample_board, sample_hashira_user):
+        """Test filtering on column, priority, assignee and due-date range together."""
+        # Arrange
+        search_service = SearchService(task_repo=task_repo)
+        task_repo.create_task(Task(title="Match", board_id=sample_board._id, column="TODO", priority="high",
+                                   due_date="2025-03-10", assigned_to=sample_hashira_user._id))
+        task_repo.create_task(Task(title="Wrong column", board_id=sample_board._id, column="DONE", priority="high",
+                                   due_date="2025-03-10", assigned_to=sample_hashira_user._id))
+        task_repo.create_task(Task(title="Too late", board_id=sample_board._id, column="TODO", priority="high",
+                                   due_date="2025-04-01", assigned_to=sample_hashira_user._id))
+        task_repo.create_task(Task(title="Unassigned", board_id=sample_board._id, column="TODO", priority="high",
+                                   due_date="2025-03-10"))
+        
+        # Act
+        results = search_service.filter_tasks(
+            sample_board._id,
+            column="todo",
+            priority="high",
+            assignee_id=sample_hashira_user._id,
+            due_from="2025-03-01",
+            due_to="2025-03-31",
+        )
+        
+        # Assert
+        assert [t.title for t in results] == ["Match"]
+    
+    def test_filter_tasks_sorted_and_paginated(self, task_repo, sample_board):
+        """Test filter results are sorted and split into pages."""
+        # Arrange
+        search_service = SearchService(task_repo=task_repo)
+        for day in [5, 1, 4, 2, 3]:
+            task_repo.create_task(Task(title=f"Due {day}", board_id=sample_board._id, column="TODO",
+                                       due_date=f"2025-01-0{day}"))
+        
+        # Act
+        first_page = search_service.filter_tasks(sample_board._id, sort="due", page=1, page_size=2)
+        last_page = search_service.filter_tasks(sample_board._id, sort="due", page=3, page_size=2)
+        
+        # Assert
+        assert [t.title for t in first_page] == ["Due 1", "Due 2"]
+        assert [t.title for t in last_page] == ["Due 5"]
+    
+    def test_filter_tasks_invalid_date(self, task_repo, sample_board):
+        """Test filter rejects malformed due dates."""
+        # Arrange
+        search_service = SearchService(task_repo=task_repo)
+        
+        # Act & Assert
+        with pytest.raises(ValueError, match="YYYY-MM-DD"):
+            search_service.filter_tasks(sample_board._id, due_from="March 1st")
+    
+    def test_filter_never_scans_collection(self, task_repo, sample_board, sample_hashira_user):
+        """Test every filter combination uses an index, and the index-sorted ones have no SORT stage."""
+        # Arrange
+        for i in range(30):
+            task_repo.create_task(Task(title=f"Task {i}", board_id=sample_board._id, column=["TODO", "DOING", "DONE"][i % 3],
+                                       priority=["high", "medium", "low"][i % 3], due_date=f"2025-01-{i % 28 + 1:02d}"))
+        options = {
+            "column": [None, "TODO"],
+            "priority": [None, "high"],
+            "assigned_to": [None, sample_hashira_user._id],
+            "due_from": [None, "2025-01-05"],
+            "due_to": [None, "2025-01-20"],
+            "sort": ["created", "due", "title"],
+        }
+        
+        # Act & Assert
+        for values in product(*options.values()):
+            criteria = dict(zip(options.keys(), values))
+            plan = task_repo.explain_filter(sample_board._id, **criteria)
+            stages = plan_stages(plan)
+            assert "COLLSCAN" not in stages, f"Collection scan for filter {criteria}"
+            sorted_by_index = task_repo.sorted_filter_index(criteria["column"], criteria["priority"],
+                                                            criteria["assigned_to"], criteria["sort"])
+            if sorted_by_index:
+                assert "SORT" not in stages, f"Blocking sort for filter {criteria}"
+    
+    def test_due_sort_served_by_index(self, task_repo, sample_board):
+        """Test the unfiltered due-date sort streams from board_due_id."""
+        # Act
+        plan = task_repo.explain_filter(sample_board._id, sort="due")
+        
+        # Assert
+        assert task_repo.sorted_filter_index(sort="due") == "board_due_id"
+        assert "SORT" not in plan_stages(plan)
+        assert "board_due_id" in str(plan)
+
+
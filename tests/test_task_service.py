@@ -3,10 +3,14 @@ Tests for TaskService.
 Tests task creation, editing, moving, and deletion with role-based permissions.
 """
 import pytest
+import services.task_service as task_service_module
 from services.task_service import TaskService
 from repositories.task_repository import TaskRepository
 from models.entities import Task
 from bson import ObjectId
+from datetime import datetime, timedelta
+from setup_schema import migrate_due_dates
+from utils.unit_of_work import UnitOfWork
 
 
 class TestTaskService:
@@ -307,3 +311,314 @@ class TestTaskService:
         assert result is True
         task = task_repo.find_task_by_id(task_id)
         assert task is None
+
+    def test_create_task_stores_due_date_as_date(self, task_repo, sample_board):
+        """Test due dates given as YYYY-MM-DD are stored as BSON dates."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        
+        # Act
+        task_id = task_service.create_task("Dated Task", sample_board._id, "TODO", "Boss", due_date="2025-06-30")
+        
+        # Assert
+        raw = task_repo.adapter.find_one(TaskRepository.COLLECTION_NAME, {"_id": task_id})
+        assert raw["due_date"] == datetime(2025, 6, 30)
+    
+    def test_edit_task_invalid_due_date(self, task_repo, sample_task):
+        """Test editing a task with a malformed due date fails."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        
+        # Act & Assert
+        with pytest.raises(ValueError, match="YYYY-MM-DD"):
+            task_service.edit_task(sample_task._id, {"due_date": "30/06/2025"}, "Boss")
+    
+    def test_overdue_and_due_soon(self, task_repo, sample_board):
+        """Test overdue and due-soon listings across boards, skipping DONE tasks."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        today = datetime.now()
+        task_service.create_task("Late", sample_board._id, "TODO", "Boss", due_date=today - timedelta(days=3))
+        task_service.create_task("Late but done", sample_board._id, "DONE", "Boss", due_date=today - timedelta(days=3))
+        task_service.create_task("Today", sample_board._id, "DOING", "Boss", due_date=today)
+        task_service.create_task("Next week", sample_board._id, "TODO", "Boss", due_date=today + timedelta(days=7))
+        task_service.create_task("Next month", sample_board._id, "TODO", "Boss", due_date=today + timedelta(days=30))
+        task_service.create_task("No date", sample_board._id, "TODO", "Boss")
+        
+        # Act
+        overdue = task_service.list_overdue_tasks([sample_board._id])
+        due_soon = task_service.list_tasks_due_soon([sample_board._id], days=7)
+        
+        # Assert
+        assert [t.title for t in overdue] == ["Late"]
+        assert [t.title for t in due_soon] == ["Today", "Next week"]
+    
+    def test_migrate_string_due_dates(self, test_db, task_repo, sample_board):
+        """Test the migration converts legacy string due dates in bulk."""
+        # Arrange
+        test_db["tasks"].insert_many([
+            {"title": "Legacy", "board_id": sample_board._id, "column": "TODO", "due_date": "2024-12-01"},
+            {"title": "Broken", "board_id": sample_board._id, "column": "TODO", "due_date": "soon"},
+        ])
+        
+        # Act
+        migrated, unparseable = migrate_due_dates(test_db)
+        
+        # Assert
+        assert migrated == 2
+        assert [(doc["title"], doc["due_date"]) for doc in unparseable] == [("Broken", "soon")]
+        assert test_db["tasks"].find_one({"title": "Legacy"})["due_date"] == datetime(2024, 12, 1)
+        assert test_db["tasks"].find_one({"title": "Broken"})["due_date"] is None
+
+    def test_list_tasks_in_column_sorted_by_priority(self, task_repo, sample_board):
+        """Test column listing can be ordered by priority rank, ties broken by creation order."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        task_service.create_task("Low", sample_board._id, "TODO", "Boss", priority="low")
+        task_service.create_task("High", sample_board._id, "TODO", "Boss", priority="high")
+        task_service.create_task("Medium", sample_board._id, "TODO", "Boss", priority="medium")
+        task_service.create_task("High again", sample_board._id, "TODO", "Boss", priority="high")
+        
+        # Act
+        tasks = task_service.list_tasks_in_column(sample_board._id, "TODO", sort="priority")
+        
+        # Assert
+        assert [t.title for t in tasks] == ["High", "High again", "Medium", "Low"]
+    
+    def test_edit_task_priority_updates_rank(self, task_repo, sample_task):
+        """Test editing the priority keeps the stored rank in step."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        
+        # Act
+        task_service.edit_task(sample_task._id, {"priority": "high"}, "Boss")
+        
+        # Assert
+        raw = task_repo.adapter.find_one(TaskRepository.COLLECTION_NAME, {"_id": sample_task._id})
+        assert raw["priority_rank"] == 0
+    
+    def test_column_sorts_served_by_index(self, task_repo, sample_board):
+        """Test every board view order is read from an index without an in-memory SORT stage."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        for i in range(20):
+            task_service.create_task(f"Task {i}", sample_board._id, "TODO", "Boss", priority=["high", "medium", "low"][i % 3])
+        
+        # Act & Assert
+        for sort in TaskRepository.VIEW_SORTS:
+            plan = str(task_repo.explain_column(sample_board._id, "TODO", sort))
+            assert "IXSCAN" in plan
+            assert "'SORT'" not in plan, f"In-memory sort for view order '{sort}'"
+
+    def test_reorder_task_before_and_after(self, task_repo, sample_board):
+        """Test manual reordering places a task before or after another one."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        a = task_service.create_task("A", sample_board._id, "TODO", "Boss")
+        b = task_service.create_task("B", sample_board._id, "TODO", "Boss")
+        c = task_service.create_task("C", sample_board._id, "TODO", "Boss")
+        
+        # Act
+        task_service.reorder_task(c, "Boss", before_id=a)
+        task_service.reorder_task(a, "Hashira", after_id=b)
+        
+        # Assert
+        tasks = task_service.list_tasks_in_column(sample_board._id, "TODO", sort="rank")
+        assert [t.title for t in tasks] == ["C", "B", "A"]
+    
+    def test_reorder_task_across_columns(self, task_repo, sample_board):
+        """Test placing a task next to a task in another column moves it there."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        todo = task_service.create_task("Todo", sample_board._id, "TODO", "Boss")
+        doing = task_service.create_task("Doing", sample_board._id, "DOING", "Boss")
+        
+        # Act
+        task_service.reorder_task(todo, "Boss", before_id=doing)
+        
+        # Assert
+        tasks = task_service.list_tasks_in_column(sample_board._id, "DOING", sort="rank")
+        assert [t.title for t in tasks] == ["Todo", "Doing"]
+    
+    def test_reorder_task_fail_member(self, task_repo, sample_board):
+        """Test Members cannot reorder tasks."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        a = task_service.create_task("A", sample_board._id, "TODO", "Boss")
+        b = task_service.create_task("B", sample_board._id, "TODO", "Boss")
+        
+        # Act & Assert
+        with pytest.raises(PermissionError, match="cannot move tasks"):
+            task_service.reorder_task(a, "Members", after_id=b)
+    
+    def test_rebalance_column_keeps_order(self, task_repo, sample_board):
+        """Test rebalancing shortens rank keys without changing the order."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        first = task_service.create_task("First", sample_board._id, "TODO", "Boss")
+        last = task_service.create_task("Last", sample_board._id, "TODO", "Boss")
+        # Repeatedly inserting at the same spot makes keys grow
+        for i in range(40):
+            task_id = task_service.create_task(f"Middle {i}", sample_board._id, "TODO", "Boss")
+            task_service.reorder_task(task_id, "Boss", before_id=last)
+        before = [t.title for t in task_service.list_tasks_in_column(sample_board._id, "TODO", sort="rank")]
+        
+        # Act
+        task_repo.rebalance_column(sample_board._id, "TODO")
+        
+        # Assert
+        after = task_service.list_tasks_in_column(sample_board._id, "TODO", sort="rank")
+        assert [t.title for t in after] == before
+        assert max(len(t.rank) for t in after) <= 2
+    
+    def test_reorder_rebalances_long_keys_before_returning(self, task_repo, sample_board, monkeypatch):
+        """Test a reorder that makes a long key rebalances the column within the same call."""
+        # Arrange
+        monkeypatch.setattr(task_service_module, "RANK_REBALANCE_LENGTH", 1)
+        task_service = TaskService(task_repo=task_repo)
+        first = task_service.create_task("First", sample_board._id, "TODO", "Boss")
+        last = task_service.create_task("Last", sample_board._id, "TODO", "Boss")
+        middle = task_service.create_task("Middle", sample_board._id, "TODO", "Boss")
+        
+        # Act
+        task_service.reorder_task(middle, "Boss", before_id=last)
+        
+        # Assert
+        tasks = task_service.list_tasks_in_column(sample_board._id, "TODO", sort="rank")
+        assert [t.title for t in tasks] == ["First", "Middle", "Last"]
+        assert max(len(t.rank) for t in tasks) == 1
+    
+    def test_rebalance_keeps_task_reordered_meanwhile(self, task_repo, sample_board, monkeypatch):
+        """Test rebalancing leaves alone a task whose rank changed after the column was read."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        first = task_service.create_task("First", sample_board._id, "TODO", "Boss")
+        task_service.create_task("Last", sample_board._id, "TODO", "Boss")
+        iter_many = task_repo.adapter.iter_many
+        def iter_then_reorder(*args, **kwargs):
+            docs = list(iter_many(*args, **kwargs))
+            # Another process moves First to the bottom once the column has been read
+            task_repo.update_task(first, {"rank": "zz"})
+            return iter(docs)
+        monkeypatch.setattr(task_repo.adapter, "iter_many", iter_then_reorder)
+        
+        # Act
+        task_repo.rebalance_column(sample_board._id, "TODO")
+        
+        # Assert
+        assert task_repo.find_task_by_id(first).rank == "zz"
+    
+    def test_create_tasks_in_bulk_keeps_order(self, task_repo, sample_board):
+        """Test a batch of tasks is appended below existing cards in list order with one insert."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        task_service.create_task("Existing", sample_board._id, "TODO", "Boss")
+        specs = [{"title": f"Bulk {i}", "column": "TODO" if i % 2 else "DONE", "priority": "high"} for i in range(10)]
+        
+        # Act
+        with UnitOfWork() as unit_of_work:
+            task_ids = task_service.create_tasks(sample_board._id, specs, "Hashira")
+        
+        # Assert
+        assert len(task_ids) == 10
+        # One rank lookup per column, one insert and the version bump
+        assert unit_of_work.round_trips == 4
+        todo = [t.title for t in task_service.list_tasks_in_column(sample_board._id, "TODO", sort="rank")]
+        done = [t.title for t in task_service.list_tasks_in_column(sample_board._id, "DONE", sort="rank")]
+        assert todo == ["Existing", "Bulk 1", "Bulk 3", "Bulk 5", "Bulk 7", "Bulk 9"]
+        assert done == ["Bulk 0", "Bulk 2", "Bulk 4", "Bulk 6", "Bulk 8"]
+    
+    def test_create_tasks_validates_before_writing(self, task_repo, sample_board):
+        """Test an invalid task in a batch stores none of them."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        specs = [{"title": "Good"}, {"title": "Bad", "priority": "urgent"}]
+        
+        # Act & Assert
+        with pytest.raises(ValueError):
+            task_service.create_tasks(sample_board._id, specs, "Boss")
+        with pytest.raises(PermissionError):
+            task_service.create_tasks(sample_board._id, [{"title": "Good"}], "Members")
+        assert task_service.list_tasks_in_column(sample_board._id, "TODO") == []
+    
+    def test_move_tasks_by_filter_in_one_update(self, task_repo, sample_board):
+        """Test a bulk move puts matching tasks below the target column in their old order."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        task_service.create_task("Done already", sample_board._id, "DONE", "Boss")
+        for i in range(5):
+            task_service.create_task(f"Bug {i}", sample_board._id, "TODO", "Boss", priority="high" if i % 2 else "low")
+        task_service.create_task("Feature", sample_board._id, "DOING", "Boss", priority="high")
+        filters = {"priority": "high", "title": "BUG"}
+        
+        # Act
+        matched = task_service.move_tasks(sample_board._id, filters, "DONE", "Hashira", dry_run=True)
+        with UnitOfWork() as unit_of_work:
+            moved = task_service.move_tasks(sample_board._id, filters, "done", "Hashira")
+        
+        # Assert
+        assert matched == moved == 2
+        # Rank lookup, reading the matching ids, one bulk write and the version bump
+        assert unit_of_work.round_trips == 4
+        done = [t.title for t in task_service.list_tasks_in_column(sample_board._id, "DONE", sort="rank")]
+        assert done == ["Done already", "Bug 1", "Bug 3"]
+        assert len(task_service.list_tasks_in_column(sample_board._id, "TODO")) == 3
+    
+    def test_move_tasks_from_several_columns_get_unique_ranks(self, task_repo, sample_board):
+        """Test tasks moved from TODO and DOING together get distinct ranks and can be reordered between."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        task_service.create_task("Done already", sample_board._id, "DONE", "Boss")
+        for column in ["TODO", "DOING"]:
+            for i in range(2):
+                task_service.create_task(f"{column} {i}", sample_board._id, column, "Boss", priority="high")
+        
+        # Act
+        moved = task_service.move_tasks(sample_board._id, {"priority": "high"}, "DONE", "Hashira")
+        done = task_service.list_tasks_in_column(sample_board._id, "DONE", sort="rank")
+        task_service.reorder_task(done[-1]._id, "Boss", after_id=done[1]._id)
+        reordered = task_service.list_tasks_in_column(sample_board._id, "DONE", sort="rank")
+        
+        # Assert
+        assert moved == 4
+        ranks = [t.rank for t in done]
+        assert len(set(ranks)) == len(ranks) == 5
+        assert ranks == sorted(ranks)
+        assert [t.title for t in done] == ["Done already", "DOING 0", "DOING 1", "TODO 0", "TODO 1"]
+        assert [t.title for t in reordered] == ["Done already", "DOING 0", "TODO 1", "DOING 1", "TODO 0"]
+    
+    def test_edit_and_delete_tasks_by_filter(self, task_repo, sample_board):
+        """Test bulk edits and deletes only touch matching tasks and dry runs change nothing."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        for i in range(4):
+            task_service.create_task(f"Task {i}", sample_board._id, "TODO", "Boss", due_date=f"2025-01-0{i + 1}")
+        due_filter = {"due_from": "2025-01-02", "due_to": "2025-01-03"}
+        
+        # Act
+        edited = task_service.edit_tasks(sample_board._id, due_filter, {"priority": "high", "due_date": "2025-02-01"}, "Boss")
+        would_delete = task_service.delete_tasks(sample_board._id, {"priority": "high"}, "Boss", dry_run=True)
+        deleted = task_service.delete_tasks(sample_board._id, {"priority": "high"}, "Boss")
+        
+        # Assert
+        assert edited == would_delete == deleted == 2
+        remaining = task_service.list_tasks_in_column(sample_board._id, "TODO")
+        assert sorted(t.title for t in remaining) == ["Task 0", "Task 3"]
+        assert all(t.priority == "medium" for t in remaining)
+    
+    def test_bulk_changes_check_permissions_and_filters(self, task_repo, sample_board):
+        """Test bulk changes reject Members, empty filters and fields that cannot be bulk edited."""
+        # Arrange
+        task_service = TaskService(task_repo=task_repo)
+        task_service.create_task("Keep", sample_board._id, "TODO", "Boss")
+        
+        # Act & Assert
+        with pytest.raises(PermissionError):
+            task_service.delete_tasks(sample_board._id, {"column": "TODO"}, "Members")
+        with pytest.raises(ValueError):
+            task_service.delete_tasks(sample_board._id, {}, "Boss")
+        with pytest.raises(ValueError):
+            task_service.edit_tasks(sample_board._id, {"column": "TODO"}, {"title": "Same"}, "Boss")
+        with pytest.raises(ValueError):
+            task_service.move_tasks(sample_board._id, {"column": "TODO"}, "LATER", "Boss")
+        assert [t.title for t in task_service.list_tasks_in_column(sample_board._id, "TODO")] == ["Keep"]